@@ -2,13 +2,19 @@
 macOS Claude Overlay - A macOS overlay app for Anthropic Claude.
 """
 
-import os
-DIRECTORY = os.path.dirname(os.path.abspath(__file__))
-ABOUT_DIR = os.path.join(DIRECTORY, "about")
-with open(os.path.join(ABOUT_DIR,"version.txt")) as f:
-    __version__ = f.read().strip()
-with open(os.path.join(ABOUT_DIR,"author.txt")) as f:
-    __author__ = f.read().strip()
+from .profiling import RECORDER, profiling_requested
+# Start timing before anything else is imported when profiling the startup.
+if profiling_requested():
+    RECORDER.start()
+    RECORDER.begin("imports")
+
+# Version metadata, generated from the "about" directory by setup.py (read from that
+# directory in a source checkout where setup.py has not run).
+try:
+    from ._about import __version__, __author__
+except ImportError:
+    from ._version import read_about
+    __version__, __author__ = read_about()
 
 __all__ = ["main"]
 
@@ -0,0 +1,13 @@
+# Python libraries
+import os
+
+ABOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "about")
+
+
+# Version and author from the "about" directory (what setup.py bakes into "_about.py").
+def read_about(directory=ABOUT_DIR):
+    with open(os.path.join(directory, "version.txt")) as f:
+        version = f.read().strip()
+    with open(os.path.join(directory, "author.txt")) as f:
+        author = "\n".join(line.strip() for line in f if line.strip())
+    return version, author
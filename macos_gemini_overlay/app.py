@@ -1,6 +1,8 @@
 # Python libraries
+import base64
 import os
 import sys
+import time
 
 # Apple libraries
 import objc
@@ -8,28 +10,111 @@ from AppKit import *
 from WebKit import *
 from Quartz import *
 from Foundation import NSObject, NSURL, NSURLRequest, NSDate, NSTimer
+from PyObjCTools.AppHelper import callAfter, callLater
 
 # Local libraries
+from .commands import COMMANDS
 from .constants import (
     APP_TITLE,
     CORNER_RADIUS,
+    DOWNLOAD_MENU_LINES,
     DRAG_AREA_HEIGHT,
     LOGO_BLACK_PATH,
     LOGO_WHITE_PATH,
     FRAME_SAVE_NAME,
+    LAUNCHER_TRIGGER,
+    SCREENSHOT_TRIGGER,
+    SETTINGS,
     STATUS_ITEM_CONTEXT,
+    USER_AGENT,
     WEBSITE,
 )
+from .bridge import (
+    BUS_HANDLER,
+    BUS_SCRIPT,
+    MessageBus,
+)
+from .downloads import (
+    CANCEL,
+    DONE,
+    FAILED,
+    PAUSE,
+    RESUME,
+    DownloadManager,
+    RecentUrls,
+    can_refetch,
+    cookie_header,
+    sanitize_filename,
+    unique_path,
+)
+from .hotkey_backends import create_hotkey_manager
+from .keyboard_layout import (
+    KEYMAP,
+    LAYOUT_CHANGED_NOTIFICATION,
+)
 from .launcher import (
     install_startup,
     uninstall_startup,
 )
 from .listener import (
-    global_show_hide_listener,
     load_custom_launcher_trigger,
     set_custom_launcher_trigger,
 )
-
+from .page import (
+    NEW_CHAT_SELECTORS,
+    PAGE_SCRIPT,
+    SETTINGS_SELECTORS,
+    SIDEBAR_SELECTORS,
+    website_url,
+)
+from .picker import Picker
+from .profiling import RECORDER
+from .quick_ask import (
+    READY_MESSAGE,
+    QuickAsk,
+    prefill_url,
+)
+from .rendering import (
+    RENDERING_SCRIPT,
+    STATS_MESSAGE,
+    LongConversationMode,
+    render_config,
+)
+from .replay import TraceWriter
+from .resources import (
+    ResourceSampler,
+    default_backend,
+    process_cpu_seconds,
+    process_rss_bytes,
+)
+from .screenshot import ScreenshotWorker
+from .search_index import (
+    CAPTURE_MESSAGE,
+    CAPTURE_SCRIPT,
+    BackgroundIndexer,
+    ConversationIndex,
+)
+from .standby import StandbyBuffer
+from .state import (
+    LOG_DIR,
+    STATE,
+    ensure_log_dir,
+)
+from .streaming import (
+    STREAM_MESSAGE,
+    STREAM_SCRIPT,
+    StreamExporter,
+    create_sinks,
+)
+from .templates import (
+    TemplateStore,
+    render_template,
+)
+from .throttle import (
+    HIDDEN_MESSAGE,
+    VISIBILITY_SCRIPT,
+    HiddenModeController,
+)
 
 # Custom window (contains entire application).
 class AppWindow(NSWindow):
@@ -62,6 +147,10 @@ class DragArea(NSView):
 class AppDelegate(NSObject):
     # The main application setup.
     def applicationDidFinishLaunching_(self, notification):
+        RECORDER.end("NSApplication setup")
+        # Results of background commands are handled on the main thread.
+        COMMANDS.deliver = callAfter
+        RECORDER.begin("window/webview creation")
         # Run as accessory app
         NSApp.setActivationPolicy_(NSApplicationActivationPolicyAccessory)
         # Create a borderless, floating, resizable window
@@ -76,9 +165,15 @@ class AppDelegate(NSObject):
             NSWindowCollectionBehaviorCanJoinAllSpaces
             | NSWindowCollectionBehaviorStationary
         )
-        # Save the last position and size
-        self.window.setFrameAutosaveName_(FRAME_SAVE_NAME)
+        # Restore the last position and size (kept in the state file, falling back to the
+        # frame autosaved by earlier versions).
+        frame = STATE.get("window_frame")
+        if frame:
+            self.window.setFrameFromString_(frame)
+        else:
+            self.window.setFrameUsingName_(FRAME_SAVE_NAME)
         # Create the webview for the main application.
+        self.website = website_url(SETTINGS["website"], WEBSITE)
         config = WKWebViewConfiguration.alloc().init()
         config.preferences().setJavaScriptCanOpenWindowsAutomatically_(True)
         # Initialize the WebView with a frame
@@ -88,8 +183,7 @@ class AppDelegate(NSObject):
         )
         self.webview.setAutoresizingMask_(NSViewWidthSizable | NSViewHeightSizable)  # Resizes with window
         # Set a custom user agent
-        safari_user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
-        self.webview.setCustomUserAgent_(safari_user_agent)
+        self.webview.setCustomUserAgent_(USER_AGENT)
         # Make window transparent so that the corners can be rounded
         self.window.setOpaque_(False)
         self.window.setBackgroundColor_(NSColor.clearColor())
@@ -116,26 +210,121 @@ class AppDelegate(NSObject):
         content_view.addSubview_(self.webview)
         self.webview.setFrame_(NSMakeRect(0, 0, content_bounds.size.width, content_bounds.size.height - DRAG_AREA_HEIGHT))
         # Contact the target website.
-        url = NSURL.URLWithString_(WEBSITE)
+        url = NSURL.URLWithString_(self.website)
         request = NSURLRequest.requestWithURL_(url)
+        RECORDER.begin("first navigation")
         self.webview.loadRequest_(request)
         # Set self as navigation delegate to know when page loads
         self.webview.setNavigationDelegate_(self)
-        # Set up script message handler for background color changes
+        # Set up the message bus shared by everything that talks to the page.
         configuration = self.webview.configuration()
         user_content_controller = configuration.userContentController()
-        user_content_controller.addScriptMessageHandler_name_(self, "backgroundColorHandler")
-        # Inject JavaScript to monitor background color changes
-        script = """
-            function sendBackgroundColor() {
-                var bgColor = window.getComputedStyle(document.body).backgroundColor;
-                window.webkit.messageHandlers.backgroundColorHandler.postMessage(bgColor);
-            }
-            window.addEventListener('load', sendBackgroundColor);
-            new MutationObserver(sendBackgroundColor).observe(document.body, { attributes: true, attributeFilter: ['style'] });
-        """
-        user_script = WKUserScript.alloc().initWithSource_injectionTime_forMainFrameOnly_(script, WKUserScriptInjectionTimeAtDocumentEnd, True)
-        user_content_controller.addUserScript_(user_script)
+        user_content_controller.addScriptMessageHandler_name_(self, BUS_HANDLER)
+        self.bus = MessageBus(
+            lambda script: self.webview.evaluateJavaScript_completionHandler_(script, None),
+            callAfter,
+            callLater,
+        )
+        self.bus.on("page.background", self._page_background_changed)
+        # Set once the page reports its prompt area (cleared when the page is replaced).
+        self.page_ready = False
+        self.bus.on(READY_MESSAGE, self._page_ready)
+        self._add_user_script(BUS_SCRIPT, WKUserScriptInjectionTimeAtDocumentStart)
+        # Inject page handlers for the prompt and JavaScript to monitor background color changes
+        self._add_user_script(PAGE_SCRIPT, WKUserScriptInjectionTimeAtDocumentEnd)
+        # Capture conversations into the local search index (opt-in).
+        self.conversation_indexer = None
+        if SETTINGS["conversation_index"]:
+            index = ConversationIndex(ensure_log_dir() / "macos_claude_overlay_conversations.sqlite3")
+            self.conversation_indexer = BackgroundIndexer(index)
+            self.bus.on(CAPTURE_MESSAGE, self.conversation_indexer.submit)
+            self._add_user_script(CAPTURE_SCRIPT, WKUserScriptInjectionTimeAtDocumentEnd)
+        # Lighten the page of long conversations (opt-in, see rendering.py).
+        self.long_conversations = None
+        if SETTINGS["long_conversation_mode"]:
+            self.long_conversations = LongConversationMode(
+                self.bus.request,
+                callLater,
+                SETTINGS["long_conversation_threshold"],
+                render_config(SETTINGS["long_conversation_selector"], SETTINGS["long_conversation_keep"]),
+                measure_scroll=SETTINGS["long_conversation_measure_scroll"],
+            )
+            self.bus.on(STATS_MESSAGE, self.long_conversations.page_stats)
+            self._add_user_script(RENDERING_SCRIPT, WKUserScriptInjectionTimeAtDocumentEnd)
+        # Export responses to local files, pipes or sockets as they are generated.
+        self.stream_exporter = None
+        sinks = create_sinks(SETTINGS["stream_export"] or [])
+        if sinks:
+            self.stream_exporter = StreamExporter(sinks, SETTINGS["stream_export_format"])
+            self.bus.on(STREAM_MESSAGE, lambda event: self.stream_exporter.feed([event]))
+            self._add_user_script(STREAM_SCRIPT, WKUserScriptInjectionTimeAtDocumentEnd)
+        # Native field in the drag area that takes typing until the page prompt exists (opt-in).
+        self.quick_ask = None
+        if SETTINGS["quick_ask"]:
+            self.quick_ask_field = NSTextField.alloc().initWithFrame_(
+                NSMakeRect(30, 4, content_bounds.size.width - 60, DRAG_AREA_HEIGHT - 8)
+            )
+            self.quick_ask_field.setAutoresizingMask_(NSViewWidthSizable)
+            self.quick_ask_field.setPlaceholderString_(f"Ask {APP_TITLE}…")
+            self.quick_ask_field.setFont_(NSFont.systemFontOfSize_(13))
+            self.quick_ask_field.setDelegate_(self)
+            self.quick_ask_field.setHidden_(True)
+            self.drag_area.addSubview_(self.quick_ask_field)
+            self.quick_ask = QuickAsk(
+                self._quick_ask_insert,
+                self._quick_ask_fallback,
+                self._quick_ask_close,
+                callLater,
+                SETTINGS["quick_ask_timeout"],
+            )
+        # Throttle the page while the overlay is hidden.
+        self.web_pids = ()
+        self.hidden_mode = None
+        if SETTINGS["hidden_mode"]:
+            self.hidden_mode = HiddenModeController(
+                self._suspend_page,
+                self._resume_page,
+                callLater,
+                self._cpu_seconds,
+                grace=SETTINGS["hidden_mode_grace"],
+            )
+            self._add_user_script(VISIBILITY_SCRIPT, WKUserScriptInjectionTimeAtDocumentStart)
+        # Files produced by the site are downloaded in the background (see downloads.py).
+        self.downloads = DownloadManager(
+            os.path.expanduser(SETTINGS["downloads_dir"] or "~/Downloads"),
+            max_concurrent=SETTINGS["download_concurrency"],
+            on_change=self._download_changed,
+        )
+        self.download_unsafe_urls = RecentUrls()
+        self.webkit_downloads = {}
+        # Prompt templates (scanned and indexed when the picker opens).
+        self.template_store = TemplateStore(SETTINGS["templates_dir"] or (LOG_DIR / "templates"))
+        # Start sampling resource usage of the overlay and its web processes.
+        self.resource_sampler = None
+        if SETTINGS["resource_sampler"]:
+            metrics_path = SETTINGS["resource_metrics_file"] or (LOG_DIR / "macos_claude_overlay_metrics.prom")
+            self.resource_sampler = ResourceSampler(
+                default_backend(),
+                interval=SETTINGS["resource_sample_interval"],
+                capacity=SETTINGS["resource_sample_capacity"],
+                metrics_path=metrics_path,
+            )
+            self.resource_sampler.start()
+        self.process_backend = self.resource_sampler.backend if self.resource_sampler else default_backend()
+        if (self.resource_sampler is not None) and (self.hidden_mode is not None):
+            self.resource_sampler.add_metrics(self._hidden_mode_metrics)
+        # Second web view with a new chat loaded (started after the first page load).
+        self.standby = None
+        if SETTINGS["standby_new_chat"]:
+            self.standby = StandbyBuffer(
+                self._create_standby_view,
+                self._load_website,
+                self._discard_standby_view,
+                self._install_standby_view,
+                self._standby_memory_ok,
+                callLater,
+            )
+        self.standby_started = False
         # Create status bar item with logo
         self.status_item = NSStatusBar.systemStatusBar().statusItemWithLength_(NSSquareStatusItemLength)
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -153,6 +342,42 @@ class AppDelegate(NSObject):
         )
         # Create status bar menu
         menu = NSMenu.alloc().init()
+        # Resource usage and hidden mode lines (disabled items, refreshed whenever the menu opens)
+        self.resource_items = []
+        status_line_count = (3 if self.resource_sampler is not None else 0) + sum(
+            1 for feature in (self.hidden_mode, self.standby, self.long_conversations) if feature is not None)
+        if status_line_count:
+            for _ in range(status_line_count):
+                item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("", None, "")
+                menu.addItem_(item)
+                self.resource_items.append(item)
+            menu.addItem_(NSMenuItem.separatorItem())
+        # Download progress lines (hidden while there are no downloads), each with a submenu
+        # to pause, resume or cancel that download.
+        self.download_items = []
+        self.download_controls = []
+        for _ in range(DOWNLOAD_MENU_LINES):
+            item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("", None, "")
+            submenu = NSMenu.alloc().init()
+            submenu.setAutoenablesItems_(False)
+            controls = {}
+            for (action, title, selector) in ((PAUSE, "Pause", "pauseDownload:"), (RESUME, "Resume", "resumeDownload:"), (CANCEL, "Cancel", "cancelDownload:")):
+                control = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_(title, selector, "")
+                control.setTarget_(self)
+                submenu.addItem_(control)
+                controls[action] = control
+            item.setSubmenu_(submenu)
+            menu.addItem_(item)
+            self.download_items.append(item)
+            self.download_controls.append(controls)
+        open_downloads_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Open Downloads Folder", "openDownloads:", "")
+        open_downloads_item.setTarget_(self)
+        menu.addItem_(open_downloads_item)
+        self.download_items.append(open_downloads_item)
+        self.download_items.append(NSMenuItem.separatorItem())
+        menu.addItem_(self.download_items[-1])
+        self.menu_timer = None
+        menu.setDelegate_(self)
         # Create and configure menu items with explicit targets
         show_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Show "+APP_TITLE, "showWindow:", "")
         show_item.setTarget_(self)
@@ -166,9 +391,13 @@ class AppDelegate(NSObject):
         clear_data_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Clear Web Cache", "clearWebViewData:", "")
         clear_data_item.setTarget_(self)
         menu.addItem_(clear_data_item)
-        set_trigger_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Set New Trigger", "setTrigger:", "")
-        set_trigger_item.setTarget_(self)
-        menu.addItem_(set_trigger_item)
+        self.set_trigger_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Set New Trigger", "setTrigger:", "")
+        self.set_trigger_item.setTarget_(self)
+        menu.addItem_(self.set_trigger_item)
+        # Key labels follow the keyboard layout.
+        NSDistributedNotificationCenter.defaultCenter().addObserver_selector_name_object_(
+            self, "keyboardLayoutChanged:", LAYOUT_CHANGED_NOTIFICATION, None
+        )
         install_item = NSMenuItem.alloc().initWithTitle_action_keyEquivalent_("Install Autolauncher", "install:", "")
         install_item.setTarget_(self)
         menu.addItem_(install_item)
@@ -189,43 +418,67 @@ class AppDelegate(NSObject):
             NSEventMaskLeftMouseDown,  # Monitor left mouse-down events
             self.handleLocalMouseEvent  # Handler method
         )
-        # Create the event tap for key-down events
-        tap = CGEventTapCreate(
-            kCGSessionEventTap, # Tap at the session level
-            kCGHeadInsertEventTap, # Insert at the head of the event queue
-            kCGEventTapOptionDefault, # Actively filter events
-            CGEventMaskBit(kCGEventKeyDown), # Capture key-down events
-            global_show_hide_listener(self), # Your callback function
-            None # Optional user info (refcon)
-        )
-        if tap:
-            # Integrate the tap into the run loop
-            source = CFMachPortCreateRunLoopSource(None, tap, 0)
-            CFRunLoopAddSource(CFRunLoopGetCurrent(), source, kCFRunLoopCommonModes)
-            CGEventTapEnable(tap, True)
-            CFRunLoopRun() # Start the run loop
-        else:
-            print("Failed to create event tap. Check Accessibility permissions.")
+        RECORDER.end("window/webview creation")
         # Load the custom launch trigger if the user set it.
         load_custom_launcher_trigger()
+        # Register the global hotkeys (only our chords wake us up unless the tap is needed).
+        with RECORDER.phase("hotkey registration"):
+            self.hotkeys = create_hotkey_manager(SETTINGS["hotkey_backend"])
+            self.bind_launcher_trigger()
+            # Record anonymized key presses for replaying through the dispatcher (opt-in).
+            self.key_trace = None
+            if SETTINGS["keystroke_trace"]:
+                self.key_trace = TraceWriter(os.path.expanduser(SETTINGS["keystroke_trace"]))
+                self.hotkeys.recorder = self.key_trace.record
+                print(f"Recording key presses (without characters) to:\n  {self.key_trace.path}", flush=True)
+            self.screenshots = None
+            if SETTINGS["screenshot_hotkey"]:
+                self.screenshots = ScreenshotWorker(
+                    lambda result: callAfter(self._attach_screenshot, result),
+                    SETTINGS["screenshot_max_bytes"],
+                    SETTINGS["screenshot_max_dimension"],
+                )
+                self.hotkeys.bind("screenshot", SCREENSHOT_TRIGGER, self._capture_screenshot)
+            self.hotkeys.start()
         # Set the delegate of the window to this parent application.
         self.window.setDelegate_(self)
         # Make sure this window is shown and focused.
         self.showWindow_(None)
 
+    # Bind the launcher trigger (again, after it was changed) to showing / hiding the overlay.
+    @objc.python_method
+    def bind_launcher_trigger(self):
+        self.hotkeys.bind("launcher", LAUNCHER_TRIGGER, self._toggle_window)
+
+    @objc.python_method
+    def _toggle_window(self):
+        if self.window.isKeyWindow():
+            self.hideWindow_(None)
+        else:
+            self.showWindow_(None)
+
     # Logic to show the overlay, make it the key window, and focus on the typing area.
     def showWindow_(self, sender):
+        if self.hidden_mode is not None:
+            self.hidden_mode.show()
         self.window.makeKeyAndOrderFront_(None)
         NSApp.activateIgnoringOtherApps_(True)
-        self._focus_prompt_area()
+        # Take typing natively until the page prompt exists.
+        if (self.quick_ask is not None) and self.quick_ask.summon():
+            self.quick_ask_field.setHidden_(False)
+            self.window.makeFirstResponder_(self.quick_ask_field)
+        else:
+            self._focus_prompt_area()
 
     # Hide the overlay and allow focus to return to the next visible application.
     def hideWindow_(self, sender):
         NSApp.hide_(None)
+        if self.hidden_mode is not None:
+            self.hidden_mode.hide()
 
     # Go to the default landing website for the overlay (in case accidentally navigated away).
     def goToWebsite_(self, sender):
-        url = NSURL.URLWithString_(WEBSITE)
+        url = NSURL.URLWithString_(self.website)
         request = NSURLRequest.requestWithURL_(url)
         self.webview.loadRequest_(request)
 
@@ -241,17 +494,21 @@ class AppDelegate(NSObject):
 
     # Go to the default landing website for the overlay (in case accidentally navigated away).
     def install_(self, sender):
-        if install_startup():
-            # Exit the current process since a new one will launch.
-            print("Installation successful, exiting.", flush=True)
-            NSApp.terminate_(None)
-        else:
-            print("Installation unsuccessful.", flush=True)
+        def installed(ok):
+            if ok:
+                # Exit the current process since a new one will launch.
+                print("Installation successful, exiting.", flush=True)
+                NSApp.terminate_(None)
+            else:
+                print("Installation unsuccessful.", flush=True)
+        install_startup(installed)
 
     # Go to the default landing website for the overlay (in case accidentally navigated away).
     def uninstall_(self, sender):
-        if uninstall_startup():
-            NSApp.hide_(None)
+        def uninstalled(ok):
+            if ok:
+                NSApp.hide_(None)
+        uninstall_startup(uninstalled)
 
     # Handle the 'Set Trigger' menu item click.
     def setTrigger_(self, sender):
@@ -284,58 +541,32 @@ class AppDelegate(NSObject):
                 self.hideWindow_(None)
             # New Chat (Command+N)
             elif key == 'n':
-                # Try to click Claude's "New chat" button (falls back to reload)
-                js = """
-                (function(){
-                  const sel = '[aria-label="New chat"], [aria-label="New conversation"], [data-command="new-conversation"]';
-                  const btn = document.querySelector(sel);
-                  if(btn){ btn.click(); } else { location.href='https://claude.ai/new?referrer=macos-claude-overlay'; }
-                })();
-                """
-                self.webview.evaluateJavaScript_completionHandler_(js, None)
+                # Swap in the preloaded new chat if one is ready, otherwise try to click
+                # Claude's "New chat" button (falls back to loading the website, right away
+                # when the page has not reported ready, as the bus may not be on it)
+                if (self.standby is None) or not self.standby.take():
+                    def clicked(found, error):
+                        if not found:
+                            self.goToWebsite_(None)
+                    if self.page_ready:
+                        self.bus.request("page.click", {"selectors": NEW_CHAT_SELECTORS}, clicked)
+                    else:
+                        self.goToWebsite_(None)
+            # Search indexed conversations (Command+Shift+F)
+            elif key == 'F' and key_shift and key_command:
+                self._show_conversation_search()
+            # Insert a prompt template (Command+Shift+P)
+            elif key == 'P' and key_shift and key_command:
+                self._show_template_picker()
             # Toggle Sidebar (Ctrl+Cmd+S)
             elif key == 's' and key_control and key_command:
-                js = """
-                (function(){
-                  const selectors=[
-                    '[aria-label="Main menu"]',
-                    '[data-test-id="side-nav-menu-button"]'
-                  ];
-                  let btn=null;
-                  for(const sel of selectors){ btn=document.querySelector(sel); if(btn) break; }
-                  if(btn){ btn.click(); }
-                })();
-                """
-                self.webview.evaluateJavaScript_completionHandler_(js, None)
+                self.bus.request("page.click", {"selectors": SIDEBAR_SELECTORS})
             # Quit
             elif key == 'q':
                 NSApp.terminate_(None)
             # Open Saved Info (Cmd + ,)
             elif key == ',' and key_command and not key_control and not key_alt:
-                js = """
-                (function(){
-                  function clickSettings(){
-                    const btn=document.querySelector('[aria-label="Settings & help"], [data-test-id="settings-and-help-button"]');
-                    if(btn){ btn.click(); return true; }
-                    return false;
-                  }
-                  function clickSaved(){
-                    let link=document.querySelector('a[href*="/saved-info"]');
-                    if(!link){
-                      // fallback: find menu item whose text includes "Saved info"
-                      const items=document.querySelectorAll('a[role="menuitem"], button[role="menuitem"]');
-                      for(const el of items){
-                        if(el.textContent && el.textContent.trim().toLowerCase().includes('saved info')){ link=el; break; }
-                      }
-                    }
-                    if(link){ link.click(); }
-                  }
-                  if(clickSettings()){
-                    setTimeout(clickSaved, 50);
-                  }
-                })();
-                """
-                self.webview.evaluateJavaScript_completionHandler_(js, None)
+                self.bus.request("page.saved_info", {"selectors": SETTINGS_SELECTORS})
             # # Undo (causes crash for some reason)
             # elif key == 'z':
             #     self.window.firstResponder().undo_(None)
@@ -363,17 +594,152 @@ class AppDelegate(NSObject):
         w, h = bounds.size.width, bounds.size.height
         self.drag_area.setFrame_(NSMakeRect(0, h - DRAG_AREA_HEIGHT, w, DRAG_AREA_HEIGHT))
         self.webview.setFrame_(NSMakeRect(0, 0, w, h - DRAG_AREA_HEIGHT))
+        self._save_window_frame()
 
-    # Handler for setting the background color based on the web page background color.
+    # Window delegate: remember the new position.
+    def windowDidMove_(self, notification):
+        self._save_window_frame()
+
+    # Keep the window frame in the state file (written lazily).
+    @objc.python_method
+    def _save_window_frame(self):
+        STATE.set("window_frame", self.window.stringWithSavedFrame())
+
+    # Write pending state before quitting.
+    def applicationWillTerminate_(self, notification):
+        STATE.flush()
+        if self.key_trace is not None:
+            self.key_trace.close()
+
+    # Every message from the page arrives through the bus.
+    # (the standby view shares the scripts, but only the visible page may talk).
     def userContentController_didReceiveScriptMessage_(self, userContentController, message):
-        if message.name() == "backgroundColorHandler":
-            bg_color_str = message.body()
-            # Convert CSS color to NSColor (assuming RGB for simplicity)
-            if bg_color_str.startswith("rgb") and ("(" in bg_color_str) and (")" in bg_color_str):
-                rgb_values = [float(val) for val in bg_color_str[bg_color_str.index("(")+1:bg_color_str.index(")")].split(",")]
-                r, g, b = [val / 255.0 for val in rgb_values[:3]]
-                color = NSColor.colorWithCalibratedRed_green_blue_alpha_(r, g, b, 1.0)
-                self.drag_area.setBackgroundColor_(color)
+        if (message.name() == BUS_HANDLER) and (message.webView() == self.webview):
+            self.bus.receive(message.body())
+
+    # Handler for setting the background color based on the web page background color.
+    @objc.python_method
+    def _page_background_changed(self, bg_color_str):
+        # Convert CSS color to NSColor (assuming RGB for simplicity)
+        if bg_color_str.startswith("rgb") and ("(" in bg_color_str) and (")" in bg_color_str):
+            rgb_values = [float(val) for val in bg_color_str[bg_color_str.index("(")+1:bg_color_str.index(")")].split(",")]
+            r, g, b = [val / 255.0 for val in rgb_values[:3]]
+            color = NSColor.colorWithCalibratedRed_green_blue_alpha_(r, g, b, 1.0)
+            self.drag_area.setBackgroundColor_(color)
+
+    # Add a script to every page load of the webview.
+    @objc.python_method
+    def _add_user_script(self, source, injection_time):
+        user_script = WKUserScript.alloc().initWithSource_injectionTime_forMainFrameOnly_(source, injection_time, True)
+        self.webview.configuration().userContentController().addUserScript_(user_script)
+
+    # Show a picker that searches the local conversation index and opens the chosen conversation.
+    @objc.python_method
+    def _show_conversation_search(self):
+        if self.conversation_indexer is None:
+            print("Conversation index is disabled. Enable it with \"conversation_index\" in settings.json.", flush=True)
+            return
+        index = self.conversation_indexer.index
+        def query(text):
+            return [(hit.title or hit.url, hit.snippet or hit.url, hit.url) for hit in index.search(text)]
+        def choose(url):
+            self.webview.loadRequest_(NSURLRequest.requestWithURL_(NSURL.URLWithString_(url)))
+        self.picker = Picker.alloc().init().setup(self, "Search conversations", query, choose)
+        self.picker.show()
+
+    # Show a fuzzy finder over the prompt templates and insert the chosen one into the prompt.
+    @objc.python_method
+    def _show_template_picker(self):
+        store = self.template_store.refresh()
+        if not len(store.index):
+            print(f"No prompt templates found. Add one file per template to:\n  {store.directory}", flush=True)
+        def query(text):
+            return [(name, "", name) for name in store.search(text)]
+        def choose(name):
+            pasteboard = NSPasteboard.generalPasteboard().stringForType_(NSPasteboardTypeString)
+            values = {
+                "date": time.strftime("%Y-%m-%d"),
+                "time": time.strftime("%H:%M"),
+                "clipboard": pasteboard or "",
+            }
+            self._insert_prompt_text(render_template(store.load(name), values))
+        self.picker = Picker.alloc().init().setup(self, "Insert prompt template", query, choose)
+        self.picker.show()
+
+    # Insert text at the cursor of the prompt area.
+    @objc.python_method
+    def _insert_prompt_text(self, text):
+        def inserted(found, error):
+            if not found:
+                print("Could not insert text, the prompt area was not found.", error or "", flush=True)
+        self.bus.request("prompt.insert", {"text": text}, inserted)
+
+    # Let the user select a screen region (with the overlay out of the way) to attach to the prompt.
+    @objc.python_method
+    def _capture_screenshot(self):
+        visible = self.window.isVisible()
+        if self.screenshots.start():
+            self.screenshot_restore = visible
+            if visible:
+                self.hideWindow_(None)
+
+    # Attach a finished screenshot (png, width, height) to the prompt and bring the overlay back.
+    @objc.python_method
+    def _attach_screenshot(self, result):
+        if result is None:
+            if self.screenshot_restore:
+                self.showWindow_(None)
+            return
+        self.showWindow_(None)
+        png, width, height = result
+        def attached(found, error):
+            if not found:
+                print("Could not attach the screenshot, the prompt area was not found.", error or "", flush=True)
+        payload = {
+            "name": time.strftime("Screenshot %Y-%m-%d at %H.%M.%S.png"),
+            "type": "image/png",
+            "data": base64.b64encode(png).decode("ascii"),
+        }
+        self.bus.request("prompt.attach", payload, attached)
+
+    # NSTextField delegate: the quick-ask field was edited.
+    def controlTextDidChange_(self, notification):
+        if (self.quick_ask is not None) and (notification.object() == self.quick_ask_field):
+            self.quick_ask.typed(self.quick_ask_field.stringValue())
+
+    # NSTextField delegate: Enter submits the quick-ask buffer and Escape drops it.
+    def control_textView_doCommandBySelector_(self, control, text_view, selector):
+        if (self.quick_ask is None) or (control != self.quick_ask_field):
+            return False
+        name = selector.decode() if isinstance(selector, bytes) else str(selector)
+        if name == "insertNewline:":
+            self.quick_ask.submit()
+            return True
+        if name == "cancelOperation:":
+            self.quick_ask.cancel()
+            return True
+        return False
+
+    # Move buffered quick-ask text into the page prompt (one bus request per round).
+    @objc.python_method
+    def _quick_ask_insert(self, text, submit, done):
+        self.bus.request("prompt.insert", {"text": text, "submit": submit}, lambda found, error: done(bool(found)))
+
+    # The page could not take the quick-ask text: start a new chat with it prefilled instead.
+    @objc.python_method
+    def _quick_ask_fallback(self, text, submit):
+        print("Prompt area not available, opening a new chat with the quick-ask text.", flush=True)
+        self.webview.loadRequest_(NSURLRequest.requestWithURL_(NSURL.URLWithString_(prefill_url(self.website, text))))
+
+    # Hide the quick-ask field and hand the keyboard to the page.
+    @objc.python_method
+    def _quick_ask_close(self, handed_off):
+        self.quick_ask_field.setStringValue_("")
+        self.quick_ask_field.setHidden_(True)
+        if self.window.firstResponder() == self.quick_ask_field.currentEditor():
+            self.window.makeFirstResponder_(self.webview)
+        if not handed_off:
+            self._focus_prompt_area()
 
     # Logic for checking what color the logo in the status bar should be, and setting appropriate logo.
     def updateStatusItemImage(self):
@@ -393,25 +759,307 @@ class AppDelegate(NSObject):
         # Update the logo image when the system appearance changes
         self.updateStatusItemImage()
 
+    # NSMenuDelegate – refresh the resource usage and download lines right before the menu is shown.
+    def menuNeedsUpdate_(self, menu):
+        lines = self.resource_sampler.summary_lines() if (self.resource_sampler is not None) else []
+        if self.hidden_mode is not None:
+            lines.append(self.hidden_mode.summary_line())
+        if self.standby is not None:
+            lines.append(self.standby.summary_line())
+        if self.long_conversations is not None:
+            lines.append(self.long_conversations.summary_line())
+        for (i, item) in enumerate(self.resource_items):
+            item.setHidden_(i >= len(lines))
+            if i < len(lines):
+                item.setTitle_(lines[i])
+        downloads = self.downloads.recent(DOWNLOAD_MENU_LINES)
+        for (i, item) in enumerate(self.download_items[:DOWNLOAD_MENU_LINES]):
+            item.setHidden_(i >= len(downloads))
+            if i < len(downloads):
+                item.setTitle_(downloads[i].describe())
+                actions = downloads[i].actions()
+                for (action, control) in self.download_controls[i].items():
+                    control.setTag_(downloads[i].id)
+                    control.setHidden_(action not in actions)
+                item.setEnabled_(bool(actions))
+        for item in self.download_items[DOWNLOAD_MENU_LINES:]:
+            item.setHidden_(not downloads)
+        self.set_trigger_item.setTitle_(f"Set New Trigger (now {KEYMAP.format(LAUNCHER_TRIGGER)})")
+
+    # The user switched keyboard layouts: key labels come from the new layout's table.
+    def keyboardLayoutChanged_(self, notification):
+        KEYMAP.invalidate()
+
+    # NSMenuDelegate – keep the progress lines moving while the menu is open.
+    def menuWillOpen_(self, menu):
+        self.menu_timer = NSTimer.timerWithTimeInterval_target_selector_userInfo_repeats_(
+            0.5, self, "menuTimerFired:", None, True)
+        NSRunLoop.currentRunLoop().addTimer_forMode_(self.menu_timer, NSRunLoopCommonModes)
+
+    def menuDidClose_(self, menu):
+        if self.menu_timer is not None:
+            self.menu_timer.invalidate()
+            self.menu_timer = None
+
+    def menuTimerFired_(self, timer):
+        self.menuNeedsUpdate_(self.status_item.menu())
+
+    # Reveal the downloads folder in the Finder.
+    def openDownloads_(self, sender):
+        NSWorkspace.sharedWorkspace().openURL_(NSURL.fileURLWithPath_(self.downloads.directory))
+
+    # Controls in the submenu of a download line (the tag is the download's id).
+    def pauseDownload_(self, sender):
+        self.downloads.pause(sender.tag())
+
+    def resumeDownload_(self, sender):
+        self.downloads.resume(sender.tag())
+
+    def cancelDownload_(self, sender):
+        self.downloads.cancel(sender.tag())
+
+    # Download "url" with the cookies of the web view (so that signed-in downloads work).
+    @objc.python_method
+    def _start_download(self, url, filename):
+        headers = {"User-Agent": USER_AGENT}
+        page_url = self.webview.URL()
+        if page_url is not None:
+            headers["Referer"] = page_url.absoluteString()
+        def got_cookies(cookies):
+            cookies = [
+                {"name": c.name(), "value": c.value(), "domain": c.domain(), "path": c.path(), "secure": c.isSecure()}
+                for c in cookies
+            ]
+            headers["Cookie"] = cookie_header(cookies, url)
+            self.downloads.add(url, filename, headers)
+        self.webview.configuration().websiteDataStore().httpCookieStore().getAllCookies_(got_cookies)
+
+    # Report finished downloads (called from download threads).
+    @objc.python_method
+    def _download_changed(self, download):
+        if download.state == DONE:
+            print(f"Downloaded {download.url}\n  to {download.path}", flush=True)
+        elif download.state == FAILED:
+            print(f"Warning: Download of {download.url} failed:", download.error, flush=True)
+
+    # WKNavigationDelegate – links that ask to be downloaded (<a download>), and remember
+    # navigations that cannot simply be requested again (e.g. form posts).
+    def webView_decidePolicyForNavigationAction_decisionHandler_(self, webview, action, decisionHandler):
+        request = action.request()
+        if request.HTTPMethod() != "GET":
+            self.download_unsafe_urls.add(request.URL().absoluteString())
+        if action.respondsToSelector_("shouldPerformDownload") and action.shouldPerformDownload():
+            if (request.URL().scheme() in ("http", "https")) and (request.HTTPMethod() == "GET"):
+                decisionHandler(WKNavigationActionPolicyCancel)
+                self._start_download(request.URL().absoluteString(), None)
+            else:
+                decisionHandler(WKNavigationActionPolicyDownload)
+            return
+        decisionHandler(WKNavigationActionPolicyAllow)
+
+    # WKNavigationDelegate – attachments and content the web view cannot show are downloaded
+    # by the download manager, or by WebKit itself when they cannot be requested again
+    # (blob: and data: addresses, posted forms).
+    def webView_decidePolicyForNavigationResponse_decisionHandler_(self, webview, navigation_response, decisionHandler):
+        response = navigation_response.response()
+        disposition = None
+        if response.respondsToSelector_("valueForHTTPHeaderField:"):
+            disposition = response.valueForHTTPHeaderField_("Content-Disposition")
+        attachment = bool(disposition) and disposition.strip().lower().startswith("attachment")
+        if attachment or (navigation_response.isForMainFrame() and not navigation_response.canShowMIMEType()):
+            url = response.URL().absoluteString()
+            if can_refetch(url, self.download_unsafe_urls):
+                decisionHandler(WKNavigationResponsePolicyCancel)
+                self._start_download(url, response.suggestedFilename())
+            else:
+                decisionHandler(WKNavigationResponsePolicyDownload)
+            return
+        decisionHandler(WKNavigationResponsePolicyAllow)
+
+    # WKNavigationDelegate – WebKit took over a download, track it with the others.
+    def webView_navigationAction_didBecomeDownload_(self, webview, action, download):
+        download.setDelegate_(self)
+
+    def webView_navigationResponse_didBecomeDownload_(self, webview, navigation_response, download):
+        download.setDelegate_(self)
+
+    # WKDownloadDelegate – choose where WebKit writes the file.
+    def download_decideDestinationUsingResponse_suggestedFilename_completionHandler_(self, download, response, filename, completionHandler):
+        os.makedirs(self.downloads.directory, exist_ok=True)
+        path = unique_path(os.path.join(self.downloads.directory, sanitize_filename(filename or "")))
+        progress = download.progress()
+        def counts():
+            total = progress.totalUnitCount()
+            return progress.completedUnitCount(), (total if total > 0 else None)
+        url = response.URL().absoluteString() if response.URL() is not None else ""
+        self.webkit_downloads[download] = (self.downloads.add_external(url, os.path.basename(path), counts), path)
+        completionHandler(NSURL.fileURLWithPath_(path))
+
+    # WKDownloadDelegate
+    def downloadDidFinish_(self, download):
+        entry, path = self.webkit_downloads.pop(download, (None, None))
+        if entry is not None:
+            self.downloads.finish_external(entry, path)
+
+    # WKDownloadDelegate
+    def download_didFailWithError_resumeData_(self, download, error, resume_data):
+        entry, path = self.webkit_downloads.pop(download, (None, None))
+        if entry is not None:
+            self.downloads.finish_external(entry, error=error.localizedDescription())
+
+    # Report the web content process to the resource sampler (it is not a child of this process).
+    @objc.python_method
+    def _watch_web_processes(self):
+        if self.webview.respondsToSelector_("_webProcessIdentifier"):
+            views = [self.webview]
+            if (self.standby is not None) and (self.standby.view is not None):
+                views.append(self.standby.view)
+            self.web_pids = tuple(view._webProcessIdentifier() for view in views)
+            if self.resource_sampler is not None:
+                self.resource_sampler.set_extra_pids(self.web_pids)
+
+    # CPU seconds used so far by the overlay and its web processes.
+    @objc.python_method
+    def _cpu_seconds(self):
+        return process_cpu_seconds(self.process_backend, (os.getpid(),) + tuple(pid for pid in self.web_pids if pid))
+
+    # Load the target website into "webview".
+    @objc.python_method
+    def _load_website(self, webview):
+        webview.loadRequest_(NSURLRequest.requestWithURL_(NSURL.URLWithString_(self.website)))
+
+    # A hidden web view for the standby new chat. It shares the configuration of the main
+    # view: the same web process pool, website data (logins) and injected scripts.
+    @objc.python_method
+    def _create_standby_view(self):
+        webview = WKWebView.alloc().initWithFrame_configuration_(self.webview.frame(), self.webview.configuration())
+        webview.setAutoresizingMask_(NSViewWidthSizable | NSViewHeightSizable)
+        webview.setCustomUserAgent_(USER_AGENT)
+        webview.setNavigationDelegate_(self)
+        return webview
+
+    @objc.python_method
+    def _discard_standby_view(self, webview):
+        webview.stopLoading()
+        webview.setNavigationDelegate_(None)
+        self._watch_web_processes()
+
+    # Put the standby view on screen in place of the main view (in one step, so there is
+    # no blank frame), returning the replaced view.
+    @objc.python_method
+    def _install_standby_view(self, webview):
+        previous = self.webview
+        webview.setFrame_(previous.frame())
+        previous.superview().replaceSubview_with_(previous, webview)
+        self.webview = webview
+        self.window.makeFirstResponder_(webview)
+        # The standby page reported "ready" while it could not talk; the focus reply tells again.
+        self._page_unloaded()
+        self._watch_web_processes()
+        self._focus_prompt_area()
+        return previous
+
+    # Whether the overlay and its web processes stay below the standby memory limit.
+    @objc.python_method
+    def _standby_memory_ok(self):
+        rss = process_rss_bytes(self.process_backend, (os.getpid(),) + tuple(pid for pid in self.web_pids if pid))
+        return rss <= SETTINGS["standby_memory_limit_mb"] * 1024 * 1024
+
+    # Tell the page it is hidden and lower WebKit's activity for it (see throttle.py).
+    @objc.python_method
+    def _suspend_page(self):
+        self.bus.emit(HIDDEN_MESSAGE, True)
+        self.webview.setHidden_(True)
+        if self.webview.respondsToSelector_("setAllMediaPlaybackSuspended:completionHandler:"):
+            self.webview.setAllMediaPlaybackSuspended_completionHandler_(True, None)
+
+    # Undo everything done by "_suspend_page".
+    @objc.python_method
+    def _resume_page(self):
+        if self.webview.respondsToSelector_("setAllMediaPlaybackSuspended:completionHandler:"):
+            self.webview.setAllMediaPlaybackSuspended_completionHandler_(False, None)
+        self.webview.setHidden_(False)
+        self.bus.emit(HIDDEN_MESSAGE, False)
+
+    # Hidden mode totals for the metrics file.
+    @objc.python_method
+    def _hidden_mode_metrics(self):
+        stats = self.hidden_mode.stats()
+        return [
+            ("overlay_hidden_seconds_total", "Time spent in hidden mode.", stats["hidden_seconds"]),
+            ("overlay_hidden_cpu_seconds_total", "CPU time used while in hidden mode.", stats["hidden_cpu_seconds"]),
+            ("overlay_hidden_saved_cpu_seconds_total", "Estimated CPU time saved by hidden mode.", stats["saved_cpu_seconds"]),
+        ]
+
+    # Stop startup profiling (if enabled) and write out the results.
+    @objc.python_method
+    def _finish_startup_profile(self):
+        if RECORDER.finish():
+            directory = LOG_DIR / "startup-profile"
+            paths = RECORDER.write(directory)
+            print(f"Startup profile:\n{RECORDER.table()}\n\nWritten to:\n  " + "\n  ".join(paths), flush=True)
+
     # WKNavigationDelegate – called when navigation finishes
     def webView_didFinishNavigation_(self, webview, navigation):
+        if (self.standby is not None) and (webview != self.webview):
+            self.standby.loaded(webview)
+            self._watch_web_processes()
+            return
+        RECORDER.end("first navigation")
+        self._finish_startup_profile()
+        # The web content process may have been (re)launched by this navigation.
+        self._watch_web_processes()
         # Page loaded, focus prompt area after small delay to ensure textarea exists
         # Delay 0.1 s, then focus prompt (use NSTimer – PyObjC provides selector call)
         NSTimer.scheduledTimerWithTimeInterval_target_selector_userInfo_repeats_(
             0.1, self, '_focusPromptTimerFired:', None, False)
+        # Preload the standby new chat once the visible page no longer competes for the network.
+        if (self.standby is not None) and not self.standby_started:
+            self.standby_started = True
+            self.standby.start()
+
+    # WKNavigationDelegate – called when a new page replaces the current one
+    def webView_didCommitNavigation_(self, webview, navigation):
+        if webview != self.webview:
+            return
+        self._page_unloaded()
+
+    # The page reported that its prompt area exists (so the bus is on it, too).
+    @objc.python_method
+    def _page_ready(self, payload):
+        self.page_ready = True
+        if self.quick_ask is not None:
+            self.quick_ask.page_ready()
+
+    # The page was replaced: features that keep state about it start over.
+    @objc.python_method
+    def _page_unloaded(self):
+        self.page_ready = False
+        if self.quick_ask is not None:
+            self.quick_ask.page_unloaded()
+        if self.long_conversations is not None:
+            self.long_conversations.page_unloaded()
+
+    # WKNavigationDelegate – called when a navigation fails before the page starts loading
+    def webView_didFailProvisionalNavigation_withError_(self, webview, navigation, error):
+        if (self.standby is not None) and (webview != self.webview):
+            self.standby.failed(webview)
+            return
+        self._finish_startup_profile()
+
+    # WKNavigationDelegate – called when a navigation fails after the page started loading
+    def webView_didFailNavigation_withError_(self, webview, navigation, error):
+        if (self.standby is not None) and (webview != self.webview):
+            self.standby.failed(webview)
 
     # Helper called by timer
     def _focusPromptTimerFired_(self, timer):
         self._focus_prompt_area()
 
-    # Python method to call JS that focuses the Claude textarea / prompt
+    # Ask the page to focus the Claude textarea / prompt (finding it also means the page is ready)
     @objc.python_method
     def _focus_prompt_area(self):
-        js_focus = """
-        (function(){
-          const sel='[aria-label="Enter a prompt here"], [data-placeholder="Message Claude"]';
-          const el=document.querySelector(sel) || document.querySelector('textarea');
-          if(el){ el.focus(); }
-        })();
-        """
-        self.webview.evaluateJavaScript_completionHandler_(js_focus, None)
+        def focused(found, error):
+            if found and not self.page_ready:
+                self._page_ready(None)
+        self.bus.request("prompt.focus", None, focused)
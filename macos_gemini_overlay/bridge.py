@@ -0,0 +1,230 @@
+# Python libraries
+import itertools
+import json
+import time
+from collections import namedtuple
+
+
+# Name of the single script message handler shared by all features.
+BUS_HANDLER = "overlayBus"
+# Injected at document start: the page side of the bus. Messages in both directions are
+# JSON envelopes {"type", "seq", "payload"}; a request also carries "reply": true and its
+# response carries "reply_to" (and "error" on failure). Outgoing messages are batched
+# per animation frame (or on a zero timeout while the page is hidden). Injected scripts
+# create their mutation observers through the bus so that they can be paused together.
+BUS_SCRIPT = """
+(function(){
+  if (window.__overlayBus) { return; }
+  let seq = 0, outbox = [], scheduled = false, paused = false;
+  const handlers = {}, pending = new Map(), observers = [];
+  function flush(){
+    scheduled = false;
+    if (!outbox.length) { return; }
+    const batch = outbox;
+    outbox = [];
+    window.webkit.messageHandlers.%s.postMessage(JSON.stringify(batch));
+  }
+  function queue(envelope){
+    outbox.push(envelope);
+    if (!scheduled) {
+      scheduled = true;
+      if (document.hidden) { setTimeout(flush, 0); } else { requestAnimationFrame(flush); }
+    }
+  }
+  function reply(envelope, payload, error){
+    const response = {type: envelope.type, seq: seq++, reply_to: envelope.seq, payload: payload === undefined ? null : payload};
+    if (error) { response.error = String(error); }
+    queue(response);
+  }
+  window.__overlayBus = {
+    send: function(type, payload){ queue({type: type, seq: seq++, payload: payload === undefined ? null : payload}); },
+    request: function(type, payload, timeout){
+      const id = seq++;
+      return new Promise(function(resolve, reject){
+        const timer = setTimeout(function(){ pending.delete(id); reject(new Error('Timed out waiting for ' + type)); }, timeout || 5000);
+        pending.set(id, {resolve: resolve, reject: reject, timer: timer});
+        queue({type: type, seq: id, payload: payload === undefined ? null : payload, reply: true});
+      });
+    },
+    on: function(type, handler){ handlers[type] = handler; },
+    // Mutation observers of injected scripts, disconnected while paused. On resume each
+    // callback runs once (with no records) to catch up with what changed meanwhile.
+    // Observers that must keep running while the overlay is hidden pass "pausable" false.
+    observe: function(target, options, callback, pausable){
+      const entry = {observer: new MutationObserver(callback), target: target, options: options, callback: callback};
+      if (pausable === false) {
+        entry.observer.observe(target, options);
+        return entry.observer;
+      }
+      observers.push(entry);
+      if (!paused) { entry.observer.observe(target, options); }
+      return entry.observer;
+    },
+    pause: function(){
+      if (paused) { return; }
+      paused = true;
+      observers.forEach(function(entry){ entry.observer.disconnect(); });
+    },
+    resume: function(){
+      if (!paused) { return; }
+      paused = false;
+      observers.forEach(function(entry){ entry.observer.observe(entry.target, entry.options); entry.callback([], entry.observer); });
+    },
+    receive: function(batch){
+      batch.forEach(function(envelope){
+        if (envelope.reply_to !== undefined && envelope.reply_to !== null) {
+          const waiting = pending.get(envelope.reply_to);
+          if (!waiting) { return; }
+          pending.delete(envelope.reply_to);
+          clearTimeout(waiting.timer);
+          if (envelope.error) { waiting.reject(new Error(envelope.error)); } else { waiting.resolve(envelope.payload); }
+          return;
+        }
+        const handler = handlers[envelope.type];
+        if (!handler) {
+          if (envelope.reply) { reply(envelope, null, 'No page handler for ' + envelope.type); }
+          return;
+        }
+        Promise.resolve().then(function(){ return handler(envelope.payload); }).then(
+          function(result){ if (envelope.reply) { reply(envelope, result); } },
+          function(error){ if (envelope.reply) { reply(envelope, null, error && error.message || error); } }
+        );
+      });
+    }
+  };
+})();
+""" % BUS_HANDLER
+# Script that delivers a batch from Python (ignored if the bus is not on the page yet).
+RECEIVE_SCRIPT = "window.__overlayBus && window.__overlayBus.receive(%s);"
+
+Envelope = namedtuple("Envelope", ["type", "seq", "payload", "reply", "reply_to", "error"])
+
+
+# Raised for batches that are not valid JSON envelopes.
+class BusError(ValueError):
+    pass
+
+
+# Encode envelopes into the JSON batch format understood by the page.
+def encode_batch(envelopes):
+    batch = []
+    for envelope in envelopes:
+        data = {"type": envelope.type, "seq": envelope.seq, "payload": envelope.payload}
+        if envelope.reply:
+            data["reply"] = True
+        if envelope.reply_to is not None:
+            data["reply_to"] = envelope.reply_to
+        if envelope.error is not None:
+            data["error"] = envelope.error
+        batch.append(data)
+    return json.dumps(batch, separators=(",", ":"))
+
+
+# Decode a JSON batch (as posted by the page) into envelopes.
+def decode_batch(body):
+    try:
+        batch = json.loads(body)
+    except (TypeError, ValueError) as e:
+        raise BusError(f"Malformed message batch: {e}")
+    if not isinstance(batch, list):
+        raise BusError("Message batch must be a list of envelopes")
+    envelopes = []
+    for data in batch:
+        if not (isinstance(data, dict) and isinstance(data.get("type"), str) and isinstance(data.get("seq"), int)):
+            raise BusError(f"Malformed envelope: {data!r}")
+        envelopes.append(Envelope(
+            data["type"], data["seq"], data.get("payload"), bool(data.get("reply")),
+            data.get("reply_to"), data.get("error"),
+        ))
+    return envelopes
+
+
+# Python side of the bus. "send(script)" evaluates JavaScript in the page, "call_soon(fn)"
+# runs fn at the end of the current run loop turn (so messages queued together go out as
+# one batch) and "call_later(delay, fn)" schedules request timeouts. Handlers are called
+# with the payload and their return value answers requests from the page.
+class MessageBus:
+    def __init__(self, send, call_soon, call_later, default_timeout=5.0, clock=time.monotonic):
+        self.send = send
+        self.call_soon = call_soon
+        self.call_later = call_later
+        self.default_timeout = default_timeout
+        self.clock = clock
+        self.handlers = {}
+        self.pending = {}
+        self.outbox = []
+        self.counter = itertools.count()
+
+    # Register the handler for messages of "type" (replacing any previous one).
+    def on(self, type, handler):
+        self.handlers[type] = handler
+
+    # Send a message that expects no reply.
+    def emit(self, type, payload=None):
+        self._queue(Envelope(type, next(self.counter), payload, False, None, None))
+
+    # Send a request; "callback(result, error)" runs once with the reply, or with an
+    # error after "timeout" seconds.
+    def request(self, type, payload=None, callback=None, timeout=None):
+        seq = next(self.counter)
+        timeout = self.default_timeout if timeout is None else timeout
+        self.pending[seq] = (type, callback, self.clock() + timeout)
+        self._queue(Envelope(type, seq, payload, True, None, None))
+        self.call_later(timeout, self.expire)
+        return seq
+
+    def _queue(self, envelope):
+        if not self.outbox:
+            self.call_soon(self.flush)
+        self.outbox.append(envelope)
+
+    # Send everything queued as one batch.
+    def flush(self):
+        if self.outbox:
+            batch, self.outbox = self.outbox, []
+            self.send(RECEIVE_SCRIPT % encode_batch(batch))
+
+    # Fail requests whose deadline has passed.
+    def expire(self, now=None):
+        now = self.clock() if now is None else now
+        for seq in [seq for (seq, (_, _, deadline)) in self.pending.items() if deadline <= now]:
+            message_type, callback, _ = self.pending.pop(seq)
+            self._call(callback, None, f"Timed out waiting for a reply to {message_type!r}")
+
+    # Handle a batch posted by the page: resolve replies and dispatch everything else.
+    def receive(self, body):
+        try:
+            envelopes = decode_batch(body)
+        except BusError as e:
+            print("Warning:", e, flush=True)
+            return
+        for envelope in envelopes:
+            if envelope.reply_to is not None:
+                waiting = self.pending.pop(envelope.reply_to, None)
+                if waiting is not None:
+                    self._call(waiting[1], envelope.payload, envelope.error)
+                continue
+            handler = self.handlers.get(envelope.type)
+            result, error = None, None
+            if handler is None:
+                error = f"No handler for message type {envelope.type!r}"
+                if not envelope.reply:
+                    print("Warning:", error, flush=True)
+            else:
+                try:
+                    result = handler(envelope.payload)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    print(f"Warning: Handler for {envelope.type!r} failed: {error}", flush=True)
+            if envelope.reply:
+                self._queue(Envelope(envelope.type, next(self.counter), result, False, envelope.seq, error))
+
+    def _call(self, callback, result, error):
+        if callback is None:
+            if error:
+                print("Warning:", error, flush=True)
+            return
+        try:
+            callback(result, error)
+        except Exception as e:
+            print("Warning: Reply callback failed:", e, flush=True)
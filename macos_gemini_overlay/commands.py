@@ -0,0 +1,95 @@
+# Python libraries
+import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Seconds a command may run before it is killed.
+DEFAULT_TIMEOUT = 30.0
+# Commands running at the same time (more are queued).
+MAX_WORKERS = 2
+
+
+# Outcome of a command. "returncode" is None when it timed out or could not be started
+# ("error" then says why).
+class CommandResult(namedtuple("CommandResult", ["args", "returncode", "stdout", "stderr", "duration", "timed_out", "error"])):
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    # One line description for logs.
+    def describe(self):
+        command = " ".join(self.args)
+        if self.timed_out:
+            return f"`{command}` timed out after {self.duration:.1f} s"
+        if self.error:
+            return f"`{command}` could not be run: {self.error}"
+        output = (self.stderr or self.stdout).strip().splitlines()
+        detail = f": {output[-1]}" if output else ""
+        return f"`{command}` exited with code {self.returncode} in {self.duration:.2f} s{detail}"
+
+
+# Run "args" (an argument list, never a shell string) and capture its output. Never raises.
+def run_command(args, timeout=DEFAULT_TIMEOUT, env=None, cwd=None):
+    args = [str(a) for a in args]
+    start = time.monotonic()
+    try:
+        completed = subprocess.run(
+            args, capture_output=True, text=True, timeout=timeout,
+            env=env, cwd=cwd, stdin=subprocess.DEVNULL,
+        )
+    except subprocess.TimeoutExpired as e:
+        return CommandResult(args, None, as_text(e.stdout), as_text(e.stderr), time.monotonic() - start, True, None)
+    except (OSError, ValueError) as e:
+        return CommandResult(args, None, "", "", time.monotonic() - start, False, str(e))
+    return CommandResult(args, completed.returncode, completed.stdout, completed.stderr, time.monotonic() - start, False, None)
+
+
+# Output captured before a timeout may be bytes (or missing).
+def as_text(output):
+    if isinstance(output, bytes):
+        return output.decode(errors="replace")
+    return output or ""
+
+
+# Runs commands on worker threads so the caller's run loop keeps going. Results are handed
+# to "deliver(callback, result)", which the application points at the main thread
+# (PyObjCTools.AppHelper.callAfter); by default the callback runs on the worker thread.
+class CommandRunner:
+    def __init__(self, deliver=None, max_workers=MAX_WORKERS, runner=run_command):
+        self.deliver = deliver
+        self.max_workers = max_workers
+        self.runner = runner
+        self.executor = None
+
+    # Run a command in the background and call "callback(result)" when it finishes.
+    # Returns the future of the result.
+    def start(self, args, callback=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="command")
+        def job():
+            result = self.runner(args, timeout=timeout, **kwargs)
+            if callback is not None:
+                try:
+                    if self.deliver is None:
+                        callback(result)
+                    else:
+                        self.deliver(callback, result)
+                except Exception as e:
+                    print("Warning: Command callback failed:", e, flush=True)
+            return result
+        return self.executor.submit(job)
+
+    # Run a command and wait for it (for the command line, never the main run loop).
+    def run(self, args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        return self.runner(args, timeout=timeout, **kwargs)
+
+    # Wait for running commands and stop the worker threads.
+    def shutdown(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+
+# Shared runner for the application.
+COMMANDS = CommandRunner()
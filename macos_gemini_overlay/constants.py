@@ -8,6 +8,7 @@ from Quartz import (
 
 
 WEBSITE = "https://claude.ai/new?referrer=macos-claude-overlay"
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
 LOGO_WHITE_PATH = "logo/claude_logo_white.png"
 LOGO_BLACK_PATH = "logo/claude_logo_black.png"
 FRAME_SAVE_NAME = "ClaudeWindowFrame"
@@ -16,6 +17,7 @@ PERMISSION_CHECK_EXIT = 1
 CORNER_RADIUS = 15.0
 DRAG_AREA_HEIGHT = 30
 STATUS_ITEM_CONTEXT = 1
+DOWNLOAD_MENU_LINES = 3
 LAUNCHER_TRIGGER_MASK = (
     kCGEventFlagMaskShift |
     kCGEventFlagMaskControl |
@@ -27,3 +29,69 @@ LAUNCHER_TRIGGER = {
     "flags": kCGEventFlagMaskAlternate,
     "key": 49
 }
+# Trigger for capturing a screen region into the prompt, "Control + Option + S".
+SCREENSHOT_TRIGGER = {
+    "flags": kCGEventFlagMaskControl | kCGEventFlagMaskAlternate,
+    "key": 1
+}
+# Optional feature settings, overridden by "settings.json" in the log directory.
+SETTINGS = {
+    # Page to load instead of WEBSITE, for example a local stand-in for benchmarks
+    # ("python -m macos_gemini_overlay.standin"); "" loads WEBSITE.
+    "website": "",
+    # Background sampling of memory / CPU / threads for the overlay and its web processes.
+    "resource_sampler": True,
+    "resource_sample_interval": 10.0,
+    "resource_sample_capacity": 360,
+    # Prometheus text file for the node exporter ("" for the default in the log directory).
+    "resource_metrics_file": "",
+    # Capture conversations as they render into a local full-text index (Command+Shift+F searches it).
+    "conversation_index": False,
+    # Directory of prompt templates for Command+Shift+P ("" for "templates" in the log directory).
+    "templates_dir": "",
+    # Export assistant responses while they are generated to "file:<path>", "fifo:<path>"
+    # or "unix:<path>" targets, formatted as "text" or "jsonl".
+    "stream_export": [],
+    "stream_export_format": "text",
+    # Global hotkeys: "carbon" registers only our chords with the system (no Accessibility
+    # permission needed), "tap" sees every key press, "auto" prefers "carbon".
+    "hotkey_backend": "auto",
+    # Pause injected observers, report the page as hidden and lower WebKit's activity
+    # once the overlay has been hidden for "hidden_mode_grace" seconds (the stream export
+    # observer keeps running, so responses are still exported as they are generated).
+    "hidden_mode": True,
+    "hidden_mode_grace": 5.0,
+    # Where files produced by the site are saved ("" for ~/Downloads), and how many
+    # downloads may run at the same time.
+    "downloads_dir": "",
+    "download_concurrency": 3,
+    # Attach a screen region to the prompt with the screenshot trigger, scaled down to at
+    # most "screenshot_max_dimension" pixels per side and "screenshot_max_bytes" as PNG.
+    "screenshot_hotkey": True,
+    "screenshot_max_bytes": 1000000,
+    "screenshot_max_dimension": 1568,
+    # Show a native field in the drag area on summon that takes typing until the page
+    # prompt exists, then moves it there; a submitted buffer still waiting after
+    # "quick_ask_timeout" seconds opens a new chat with the text prefilled instead.
+    "quick_ask": False,
+    "quick_ask_timeout": 10.0,
+    # Record every key press seen by the hotkey backend (time, key code and modifiers, no
+    # characters) to this file for "python -m macos_gemini_overlay.replay" ("" disables).
+    "keystroke_trace": "",
+    # Keep a second web view with a new chat loaded in the background, so Command+N swaps
+    # it in instead of loading a page. It is dropped (and restored later) while the overlay
+    # and its web processes use more than "standby_memory_limit_mb" megabytes.
+    "standby_new_chat": False,
+    "standby_memory_limit_mb": 1500,
+    # Lighten conversations with at least "long_conversation_threshold" messages: all but
+    # the newest "long_conversation_keep" messages skip rendering while off-screen, and
+    # those far off-screen are collapsed into placeholders until scrolled back to.
+    # "long_conversation_selector" overrides the CSS selector of a message ("" for the
+    # default) and "long_conversation_measure_scroll" measures frame times by scrolling
+    # through the conversation for a second before and after the mode is first applied.
+    "long_conversation_mode": False,
+    "long_conversation_threshold": 40,
+    "long_conversation_keep": 10,
+    "long_conversation_selector": "",
+    "long_conversation_measure_scroll": False,
+}
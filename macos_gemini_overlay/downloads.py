@@ -0,0 +1,444 @@
+# Python libraries
+import collections
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from email.message import Message
+from urllib.parse import unquote, urlsplit
+
+
+# States of a download.
+QUEUED, RUNNING, PAUSED, DONE, FAILED, CANCELLED = "queued", "running", "paused", "done", "failed", "cancelled"
+# Suffixes of the partial file and of its sidecar (with the validators needed to resume).
+PART_SUFFIX = ".part"
+META_SUFFIX = ".part.json"
+# Name used when neither the response nor the address suggests one.
+DEFAULT_FILENAME = "download"
+# Addresses of recent non-GET navigations remembered (they must not be requested again).
+UNSAFE_URL_LIMIT = 256
+# Controls a download can offer, depending on its state.
+PAUSE, RESUME, CANCEL = "pause", "resume", "cancel"
+
+
+# Safe file name for "name" (no directories, no leading dots or control characters).
+def sanitize_filename(name):
+    name = os.path.basename(name.replace("\\", "/"))
+    name = re.sub(r"[\x00-\x1f/:]", "_", name).strip().lstrip(".")
+    return name[:255] or DEFAULT_FILENAME
+
+
+# File name from a Content-Disposition header, falling back to the last part of the URL.
+def filename_from_response(url, content_disposition=None):
+    if content_disposition:
+        message = Message()
+        message["content-disposition"] = content_disposition
+        name = message.get_filename()
+        if name:
+            return sanitize_filename(name)
+    name = unquote(urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1])
+    return sanitize_filename(name) if name else DEFAULT_FILENAME
+
+
+# "path", or "name (1).ext", "name (2).ext", ... if it (or its partial file) already exists.
+def unique_path(path):
+    root, extension = os.path.splitext(path)
+    candidate = path
+    for n in itertools.count(1):
+        if not (os.path.exists(candidate) or os.path.exists(candidate + PART_SUFFIX)):
+            return candidate
+        candidate = f"{root} ({n}){extension}"
+
+
+# Cookie header for "url" from cookies given as dicts {"name", "value", "domain", "path", "secure"}.
+def cookie_header(cookies, url):
+    parts = urlsplit(url)
+    host, path = (parts.hostname or "").lower(), parts.path or "/"
+    pairs = []
+    for cookie in cookies:
+        domain = (cookie.get("domain") or "").lower()
+        if domain.startswith("."):
+            domain_matches = (host == domain[1:]) or host.endswith(domain)
+        else:
+            domain_matches = host == domain
+        cookie_path = cookie.get("path") or "/"
+        path_matches = path.startswith(cookie_path)
+        secure_matches = (parts.scheme == "https") or not cookie.get("secure")
+        if domain_matches and path_matches and secure_matches:
+            pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+# Follows redirects like urllib does, but drops credentials (the cookies of the web view,
+# authorization) when a redirect leads to another host: they were chosen for the first one.
+class CredentialRedirectHandler(urllib.request.HTTPRedirectHandler):
+    CREDENTIAL_HEADERS = ("cookie", "authorization")
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        new = super().redirect_request(req, fp, code, msg, headers, newurl)
+        if (new is not None) and (urlsplit(new.full_url).hostname != urlsplit(req.full_url).hostname):
+            for name in list(new.headers):
+                if name.lower() in self.CREDENTIAL_HEADERS:
+                    del new.headers[name]
+        return new
+
+
+# The most recent "limit" addresses, oldest forgotten first.
+class RecentUrls:
+    def __init__(self, limit=UNSAFE_URL_LIMIT):
+        self.limit = limit
+        self.urls = collections.OrderedDict()
+
+    def add(self, url):
+        self.urls[url] = None
+        self.urls.move_to_end(url)
+        while len(self.urls) > self.limit:
+            self.urls.popitem(last=False)
+
+    def __contains__(self, url):
+        return url in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+
+# Whether the download manager may fetch "url" again itself: only http(s) addresses that
+# were not reached by a form post or another non-GET request (those are left to WebKit).
+def can_refetch(url, unsafe_urls):
+    return (urlsplit(url).scheme in ("http", "https")) and (url not in unsafe_urls)
+
+
+# Writes a response body to "<path>.part" through a bounded in-memory buffer, keeping the
+# validators of the response in a sidecar file so that an interrupted download can be
+# resumed with a range request. "finish" moves the completed file into place.
+class ChunkedWriter:
+    def __init__(self, path, max_buffer=1 << 20):
+        self.path = os.fspath(path)
+        self.part_path = self.path + PART_SUFFIX
+        self.meta_path = self.path + META_SUFFIX
+        self.max_buffer = max_buffer
+        self.buffer = bytearray()
+        self.file = None
+        self.size = 0
+
+    # Validators and size of an existing partial file (None if there is nothing to resume).
+    def saved_state(self):
+        try:
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            meta["size"] = os.path.getsize(self.part_path)
+        except (OSError, ValueError):
+            return None
+        if not (meta.get("etag") or meta.get("last_modified")):
+            return None
+        return meta
+
+    # Start writing at "offset" (an existing partial file is truncated to it).
+    def open(self, offset=0, meta=None):
+        if offset:
+            self.file = open(self.part_path, "r+b")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+        else:
+            self.file = open(self.part_path, "wb")
+        self.size = offset
+        temporary = self.meta_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(meta or {}, f)
+        os.replace(temporary, self.meta_path)
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        if len(self.buffer) >= self.max_buffer:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    # Flush and close, keeping the partial file for a later resume.
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    # Flush, close and move the completed file into place. Returns its path.
+    def finish(self):
+        self.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.close()
+        os.replace(self.part_path, self.path)
+        try:
+            os.remove(self.meta_path)
+        except OSError:
+            pass
+        return self.path
+
+    # Close and delete the partial file and its sidecar.
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.buffer.clear()
+        for path in (self.part_path, self.meta_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# One download and its progress. "progress" may be set to a callable returning
+# (received, total) for downloads performed elsewhere (e.g. by WebKit).
+class Download:
+    def __init__(self, id, url, filename=None, headers=None):
+        self.id = id
+        self.url = url
+        self.filename = filename
+        self.headers = dict(headers or {})
+        self.path = None
+        self.state = QUEUED
+        self.received = 0
+        self.total = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.progress = None
+        self.external = False
+        self.stop_requested = None
+
+    # Received and total bytes (total is None when unknown).
+    def counts(self):
+        if self.progress is not None:
+            return self.progress()
+        return self.received, self.total
+
+    # Controls that apply in the current state (none for downloads performed elsewhere).
+    def actions(self):
+        if self.external:
+            return ()
+        if self.state in (QUEUED, RUNNING):
+            return (PAUSE, CANCEL)
+        if self.state in (PAUSED, FAILED):
+            return (RESUME, CANCEL)
+        return ()
+
+    # One line description for the status menu.
+    def describe(self):
+        name = self.filename or self.url
+        received, total = self.counts()
+        mb = 1024 * 1024
+        if self.state in (QUEUED, RUNNING, PAUSED):
+            if total:
+                progress = f"{100 * received / total:.0f}% of {total / mb:.1f} MB"
+            else:
+                progress = f"{received / mb:.1f} MB"
+            label = {QUEUED: "Waiting", RUNNING: "Downloading", PAUSED: "Paused"}[self.state]
+            return f"{label}: {name} ({progress})"
+        if self.state == DONE:
+            return f"Downloaded: {name}"
+        if self.state == FAILED:
+            return f"Failed: {name} ({self.error})"
+        return f"Cancelled: {name}"
+
+
+# Runs downloads into "directory" with at most "max_concurrent" at a time. Each runs on its
+# own thread, reading "chunk_size" bytes at a time into a ChunkedWriter, and resumes from a
+# partial file left by an earlier attempt when the server supports range requests.
+# "on_change(download)" is called (from download threads) whenever a download changes state.
+# Requests go through "opener" (by default one that keeps cookies from leaking on redirects).
+class DownloadManager:
+    def __init__(self, directory, max_concurrent=3, chunk_size=64 * 1024, max_buffer=1 << 20,
+                 timeout=30.0, opener=None, on_change=None):
+        self.directory = os.fspath(directory)
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.chunk_size = chunk_size
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+        self.opener = opener or urllib.request.build_opener(CredentialRedirectHandler).open
+        self.on_change = on_change
+        self.downloads = collections.OrderedDict()
+        self.queue = collections.deque()
+        self.running = set()
+        self.ids = itertools.count(1)
+        self.condition = threading.Condition()
+
+    # Queue a download of "url" (with extra request headers such as cookies).
+    def add(self, url, filename=None, headers=None):
+        download = Download(next(self.ids), url, sanitize_filename(filename) if filename else None, headers)
+        with self.condition:
+            self.downloads[download.id] = download
+            self.queue.append(download)
+        self._schedule()
+        return download
+
+    # Track a download performed elsewhere, so that it appears with the others.
+    def add_external(self, url, filename, progress=None):
+        download = Download(next(self.ids), url, filename)
+        download.state = RUNNING
+        download.started = time.time()
+        download.progress = progress
+        download.external = True
+        with self.condition:
+            self.downloads[download.id] = download
+        return download
+
+    # Mark an external download as complete (or failed with "error").
+    def finish_external(self, download, path=None, error=None):
+        download.progress = None
+        download.path = path
+        self._set_state(download, FAILED if error else DONE, error)
+
+    # Stop a running or queued download, keeping its partial file for "resume".
+    def pause(self, id):
+        self._stop(id, PAUSED)
+
+    # Stop a download and delete its partial file.
+    def cancel(self, id):
+        self._stop(id, CANCELLED)
+
+    def _stop(self, id, state):
+        with self.condition:
+            download = self.downloads[id]
+            if download in self.queue:
+                self.queue.remove(download)
+                download.state = state
+            elif download.state == RUNNING:
+                download.stop_requested = state
+            elif (download.state in (PAUSED, FAILED)) and (state == CANCELLED):
+                download.state = state
+                if download.path:
+                    ChunkedWriter(download.path).discard()
+
+    # Queue a paused or failed download again (continuing from its partial file if possible).
+    def resume(self, id):
+        with self.condition:
+            download = self.downloads[id]
+            if download.state not in (PAUSED, FAILED):
+                return
+            download.state, download.error, download.stop_requested = QUEUED, None, None
+            self.queue.append(download)
+        self._schedule()
+
+    # Start queued downloads while below the concurrency limit.
+    def _schedule(self):
+        with self.condition:
+            while self.queue and (len(self.running) < self.max_concurrent):
+                download = self.queue.popleft()
+                self.running.add(download.id)
+                download.state = RUNNING
+                threading.Thread(target=self._worker, args=(download,), name="download", daemon=True).start()
+
+    def _worker(self, download):
+        try:
+            self._download(download)
+        except Exception as e:
+            self._set_state(download, FAILED, str(e) or type(e).__name__)
+        finally:
+            with self.condition:
+                self.running.discard(download.id)
+                self.condition.notify_all()
+            self._schedule()
+
+    def _set_state(self, download, state, error=None):
+        with self.condition:
+            download.state, download.error = state, error
+            if state in (DONE, FAILED, CANCELLED):
+                download.finished = time.time()
+            self.condition.notify_all()
+        if self.on_change is not None:
+            self.on_change(download)
+
+    def _download(self, download):
+        download.started = time.time()
+        self._set_state(download, RUNNING)
+        headers = dict(download.headers)
+        # Resume from the partial file of an earlier attempt (or of an earlier run, for a
+        # download whose file name was suggested up front).
+        candidate = download.path
+        if (candidate is None) and download.filename:
+            candidate = os.path.join(self.directory, download.filename)
+        saved = ChunkedWriter(candidate).saved_state() if candidate else None
+        if saved and (saved.get("url") == download.url):
+            headers["Range"] = f"bytes={saved['size']}-"
+            headers["If-Range"] = saved.get("etag") or saved["last_modified"]
+        else:
+            saved = None
+        request = urllib.request.Request(download.url, headers=headers)
+        try:
+            response = self.opener(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            # The partial file no longer fits the resource, start over.
+            if saved and (e.code == 416):
+                ChunkedWriter(candidate).discard()
+                return self._download(download)
+            raise
+        with response:
+            offset = 0
+            if response.status == 206:
+                match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+                if not (saved and match and (int(match.group(1)) == saved["size"])):
+                    raise ValueError("unexpected partial response")
+                offset = saved["size"]
+            if saved:
+                download.path = candidate
+            elif download.path is None:
+                name = download.filename or filename_from_response(download.url, response.headers.get("Content-Disposition"))
+                os.makedirs(self.directory, exist_ok=True)
+                download.path = unique_path(os.path.join(self.directory, name))
+            download.filename = os.path.basename(download.path)
+            length = response.headers.get("Content-Length")
+            download.total = (offset + int(length)) if (length and length.isdigit()) else None
+            download.received = offset
+            writer = ChunkedWriter(download.path, self.max_buffer)
+            writer.open(offset, {
+                "url": download.url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            })
+            try:
+                while True:
+                    if download.stop_requested:
+                        break
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    download.received = writer.size
+            except BaseException:
+                writer.close()
+                raise
+        if download.stop_requested == CANCELLED:
+            writer.discard()
+            self._set_state(download, CANCELLED)
+        elif download.stop_requested == PAUSED:
+            writer.close()
+            self._set_state(download, PAUSED)
+        elif (download.total is not None) and (download.received < download.total):
+            writer.close()
+            raise ValueError(f"connection closed after {download.received} of {download.total} bytes")
+        else:
+            writer.finish()
+            self._set_state(download, DONE)
+
+    # Block until no download is queued or running (or "timeout" seconds passed).
+    def wait(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.queue and not self.running, timeout)
+
+    # The most recent downloads, newest first.
+    def recent(self, limit=3):
+        with self.condition:
+            downloads = list(self.downloads.values())[-limit:]
+        return list(reversed(downloads))
+
+    # The most recent downloads, newest first, as lines for the status menu.
+    def summary_lines(self, limit=3):
+        return [download.describe() for download in self.recent(limit)]
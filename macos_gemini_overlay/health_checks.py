@@ -1,4 +1,3 @@
-import os
 import sys
 import time
 import tempfile
@@ -6,23 +5,19 @@ import traceback
 import functools
 import platform
 import objc
-from pathlib import Path
 
+# Local libraries
+from .profiling import RECORDER
+from .state import (
+    LOG_DIR,
+    STATE,
+    STATE_FILE,
+    ensure_log_dir,
+)
 
-# Get a path for logging errors that is persistent.
-def get_log_dir():
-    # Set a persistent log directory in the user's home folder
-    log_dir = Path.home() / "Library" / "Logs" / "macos-claude-overlay"
-    # Create the directory if it doesn't exist
-    log_dir.mkdir(parents=True, exist_ok=True)
-    # Return a persistent path name (same file for error logs).
-    return log_dir
 
-
-# Settings for crash loop detection.
-LOG_DIR = get_log_dir()
+# Settings for crash loop detection (the counter is the "crash" entry of the state file).
 LOG_PATH = LOG_DIR / "macos_claude_overlay_error_log.txt"
-CRASH_COUNTER_FILE = LOG_DIR / "macos_claude_overlay_crash_counter.txt"
 CRASH_THRESHOLD = 3    # Maximum allowed crashes within the time window.
 CRASH_TIME_WINDOW = 60 # Time window in seconds.
 
@@ -47,47 +42,35 @@ def check_crash_loop():
     count = 0
     last_time = 0
     # Read previous crash info if it exists.
-    if os.path.exists(CRASH_COUNTER_FILE):
-        try:
-            with open(CRASH_COUNTER_FILE, "r") as f:
-                line = f.read().strip()
-                if line:
-                    last_time_str, count_str = line.split(",")
-                    last_time = float(last_time_str)
-                    count = int(count_str)
-        except Exception:
-            # On any error, reset the counter.
-            count = 0
+    crash = STATE.get("crash", {})
+    try:
+        last_time = float(crash.get("time", 0))
+        count = int(crash.get("count", 0))
+    except Exception:
+        # On any error, reset the counter.
+        count = 0
     # If the last crash was within the time window, increment; otherwise, reset.
     if current_time - last_time < CRASH_TIME_WINDOW:
         count += 1
     else:
         count = 1
-    # Write the updated crash info back to the file.
-    try:
-        with open(CRASH_COUNTER_FILE, "w") as f:
-            f.write(f"{current_time},{count}")
-    except Exception as e:
-        print("Warning: Could not update crash counter file:", e)
+    # Write the updated crash info back right away (it has to survive a crash).
+    STATE.set("crash", {"time": current_time, "count": count}, flush=True)
 
     # If the count exceeds the threshold, abort further restarts.
     if count > CRASH_THRESHOLD:
-        print("ERROR: Crash loop detected (more than {} crashes within {} seconds). Crash counter file (for reference) at:\n  {}\n\nAborting further restarts. To resume attempts to launch, delete the counter file with:\n  rm {}\n\nError log (most recent) at:\n  {}".format(
+        print("ERROR: Crash loop detected (more than {} crashes within {} seconds). Crash counter (the \"crash\" entry) in:\n  {}\n\nAborting further restarts. To resume attempts to launch, remove the \"crash\" entry from that file, or delete it (this also forgets a custom trigger and the window position) with:\n  rm {}\n\nError log (most recent) at:\n  {}".format(
             CRASH_THRESHOLD,
             CRASH_TIME_WINDOW,
-            CRASH_COUNTER_FILE,
-            CRASH_COUNTER_FILE,
+            STATE_FILE,
+            STATE_FILE,
             LOG_PATH
         ))
         sys.exit(1)
 
 # Resets the crash counter after a successful run.
 def reset_crash_counter():
-    if os.path.exists(CRASH_COUNTER_FILE):
-        try:
-            os.remove(CRASH_COUNTER_FILE)
-        except Exception as e:
-            print("Warning: Could not reset crash counter file:", e)
+    STATE.set("crash", None, flush=True)
 
 # Decorator to wrap the main function with crash loop detection and error logging.
 # If the wrapped function raises an exception, the error is logged (with system info)
@@ -95,7 +78,9 @@ def reset_crash_counter():
 def health_check_decorator(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        check_crash_loop()
+        RECORDER.end("imports")
+        with RECORDER.phase("crash-loop check"):
+            check_crash_loop()
         try:
             result = func(*args, **kwargs)
             reset_crash_counter()
@@ -104,6 +89,7 @@ def health_check_decorator(func):
         except Exception:
             system_info = get_system_info()
             error_trace = traceback.format_exc()
+            ensure_log_dir()
             with open(LOG_PATH, "w") as log_file:
                 log_file.write("An unhandled exception occurred:\n")
                 log_file.write(system_info)
@@ -0,0 +1,246 @@
+# Python libraries
+import ctypes
+import itertools
+import sys
+
+# Apple libraries
+from Quartz import (
+    CFMachPortCreateRunLoopSource,
+    CFMachPortInvalidate,
+    CFRunLoopAddSource,
+    CFRunLoopGetMain,
+    CFRunLoopRemoveSource,
+    CGEventGetFlags,
+    CGEventGetIntegerValueField,
+    CGEventMaskBit,
+    CGEventTapCreate,
+    CGEventTapEnable,
+    kCFRunLoopCommonModes,
+    kCGEventKeyDown,
+    kCGEventTapDisabledByTimeout,
+    kCGEventTapDisabledByUserInput,
+    kCGEventTapOptionDefault,
+    kCGHeadInsertEventTap,
+    kCGKeyboardEventKeycode,
+    kCGSessionEventTap,
+)
+
+# Local libraries
+from .constants import LAUNCHER_TRIGGER_MASK
+from .hotkeys import (
+    HotkeyManager,
+    carbon_modifiers,
+)
+
+CARBON_PATH = "/System/Library/Frameworks/Carbon.framework/Carbon"
+
+
+# Four character code as used by the Carbon Event Manager.
+def four_char_code(text):
+    return int.from_bytes(text.encode("ascii"), "big")
+
+
+# Signature of our hotkey ids, and the Carbon constants needed to receive hotkey presses.
+HOTKEY_SIGNATURE = four_char_code("MCOv")
+kEventClassKeyboard = four_char_code("keyb")
+kEventHotKeyPressed = 5
+kEventParamDirectObject = four_char_code("----")
+typeEventHotKeyID = four_char_code("hkid")
+noErr = 0
+eventNotHandledErr = -9874
+
+
+class EventHotKeyID(ctypes.Structure):
+    _fields_ = [("signature", ctypes.c_uint32), ("id", ctypes.c_uint32)]
+
+
+class EventTypeSpec(ctypes.Structure):
+    _fields_ = [("eventClass", ctypes.c_uint32), ("eventKind", ctypes.c_uint32)]
+
+
+EventHandlerProcPtr = ctypes.CFUNCTYPE(ctypes.c_int32, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p)
+
+
+# Load the Carbon Event Manager functions (None if unavailable).
+def load_carbon():
+    if sys.platform != "darwin":
+        return None
+    try:
+        carbon = ctypes.cdll.LoadLibrary(CARBON_PATH)
+    except OSError:
+        return None
+    carbon.GetEventDispatcherTarget.restype = ctypes.c_void_p
+    carbon.GetEventDispatcherTarget.argtypes = []
+    carbon.InstallEventHandler.restype = ctypes.c_int32
+    carbon.InstallEventHandler.argtypes = [
+        ctypes.c_void_p, EventHandlerProcPtr, ctypes.c_ulong,
+        ctypes.POINTER(EventTypeSpec), ctypes.c_void_p, ctypes.POINTER(ctypes.c_void_p),
+    ]
+    carbon.RemoveEventHandler.restype = ctypes.c_int32
+    carbon.RemoveEventHandler.argtypes = [ctypes.c_void_p]
+    carbon.RegisterEventHotKey.restype = ctypes.c_int32
+    carbon.RegisterEventHotKey.argtypes = [
+        ctypes.c_uint32, ctypes.c_uint32, EventHotKeyID,
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_void_p),
+    ]
+    carbon.UnregisterEventHotKey.restype = ctypes.c_int32
+    carbon.UnregisterEventHotKey.argtypes = [ctypes.c_void_p]
+    carbon.GetEventParameter.restype = ctypes.c_int32
+    carbon.GetEventParameter.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_void_p,
+        ctypes.c_ulong, ctypes.c_void_p, ctypes.c_void_p,
+    ]
+    return carbon
+
+
+# Registered hotkeys (RegisterEventHotKey). The system matches the chords itself and only
+# calls into Python when one of ours is pressed; no Accessibility permission is needed.
+class CarbonHotkeyBackend:
+    name = "carbon"
+    needs_accessibility = False
+    receives_all_keys = False
+
+    def __init__(self):
+        self.carbon = load_carbon()
+        self.handler = None
+        self.handler_ref = None
+        self.callback = None
+        self.refs = {}
+        self.chords = {}
+        self.ids = itertools.count(1)
+
+    def available(self):
+        return self.carbon is not None
+
+    def start(self, handler):
+        self.handler = handler
+        # Keep a reference to the callback for as long as it is installed.
+        self.callback = EventHandlerProcPtr(self._pressed)
+        spec = EventTypeSpec(kEventClassKeyboard, kEventHotKeyPressed)
+        handler_ref = ctypes.c_void_p()
+        status = self.carbon.InstallEventHandler(
+            self.carbon.GetEventDispatcherTarget(), self.callback, 1,
+            ctypes.byref(spec), None, ctypes.byref(handler_ref),
+        )
+        if status != noErr:
+            print("Warning: InstallEventHandler failed with status", status, flush=True)
+            self.callback = None
+            return False
+        self.handler_ref = handler_ref
+        return True
+
+    def stop(self):
+        for chord in list(self.refs):
+            self.unregister(chord)
+        if self.handler_ref is not None:
+            self.carbon.RemoveEventHandler(self.handler_ref)
+            self.handler_ref = None
+        self.callback = None
+        self.handler = None
+
+    def register(self, chord):
+        if chord in self.refs:
+            return True
+        hotkey_id = next(self.ids)
+        ref = ctypes.c_void_p()
+        status = self.carbon.RegisterEventHotKey(
+            chord.key, carbon_modifiers(chord.flags), EventHotKeyID(HOTKEY_SIGNATURE, hotkey_id),
+            self.carbon.GetEventDispatcherTarget(), 0, ctypes.byref(ref),
+        )
+        if status != noErr:
+            return False
+        self.refs[chord] = (hotkey_id, ref)
+        self.chords[hotkey_id] = chord
+        return True
+
+    def unregister(self, chord):
+        if chord in self.refs:
+            hotkey_id, ref = self.refs.pop(chord)
+            self.chords.pop(hotkey_id, None)
+            self.carbon.UnregisterEventHotKey(ref)
+
+    # Carbon event handler for kEventHotKeyPressed.
+    def _pressed(self, call_ref, event, user_data):
+        hotkey_id = EventHotKeyID()
+        status = self.carbon.GetEventParameter(
+            event, kEventParamDirectObject, typeEventHotKeyID, None,
+            ctypes.sizeof(hotkey_id), None, ctypes.byref(hotkey_id),
+        )
+        chord = self.chords.get(hotkey_id.id)
+        if (status != noErr) or (hotkey_id.signature != HOTKEY_SIGNATURE) or (chord is None):
+            return eventNotHandledErr
+        try:
+            self.handler(chord.flags, chord.key, None)
+        except Exception as e:
+            print("Warning: Hotkey handler failed:", e, flush=True)
+        return noErr
+
+
+# Session event tap that sees every key press on the system (needs Accessibility). Used
+# for sequence triggers and for capturing a new trigger, or when selected explicitly.
+class EventTapBackend:
+    name = "tap"
+    needs_accessibility = True
+    receives_all_keys = True
+
+    def __init__(self):
+        self.tap = None
+        self.source = None
+        self.callback = None
+
+    def available(self):
+        return True
+
+    def start(self, handler):
+        def callback(proxy, event_type, event, refcon):
+            # The system disables slow taps; turn it back on.
+            if event_type in (kCGEventTapDisabledByTimeout, kCGEventTapDisabledByUserInput):
+                if self.tap is not None:
+                    CGEventTapEnable(self.tap, True)
+            elif event_type == kCGEventKeyDown:
+                keycode = CGEventGetIntegerValueField(event, kCGKeyboardEventKeycode)
+                flags = CGEventGetFlags(event) & LAUNCHER_TRIGGER_MASK
+                if handler(flags, keycode, event):
+                    return None
+            return event
+        # Create the event tap for key-down events
+        tap = CGEventTapCreate(
+            kCGSessionEventTap, # Tap at the session level
+            kCGHeadInsertEventTap, # Insert at the head of the event queue
+            kCGEventTapOptionDefault, # Actively filter events
+            CGEventMaskBit(kCGEventKeyDown), # Capture key-down events
+            callback,
+            None # Optional user info (refcon)
+        )
+        if not tap:
+            print("Failed to create event tap. Check Accessibility permissions.", flush=True)
+            return False
+        # Integrate the tap into the main run loop (run by the application).
+        self.tap, self.callback = tap, callback
+        self.source = CFMachPortCreateRunLoopSource(None, tap, 0)
+        CFRunLoopAddSource(CFRunLoopGetMain(), self.source, kCFRunLoopCommonModes)
+        CGEventTapEnable(tap, True)
+        return True
+
+    def stop(self):
+        if self.tap is not None:
+            CGEventTapEnable(self.tap, False)
+            CFRunLoopRemoveSource(CFRunLoopGetMain(), self.source, kCFRunLoopCommonModes)
+            CFMachPortInvalidate(self.tap)
+            self.tap, self.source, self.callback = None, None, None
+
+    def register(self, chord):
+        return True
+
+    def unregister(self, chord):
+        pass
+
+
+# The backends in order of preference for "auto".
+def default_backends():
+    return [CarbonHotkeyBackend(), EventTapBackend()]
+
+
+# Hotkey manager over the default backends, honouring the "hotkey_backend" setting.
+def create_hotkey_manager(preference="auto"):
+    return HotkeyManager(default_backends(), preference)
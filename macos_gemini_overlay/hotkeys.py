@@ -0,0 +1,199 @@
+# Python libraries
+import time
+from collections import namedtuple
+
+# This module only holds the backend selection and key matching logic (no Apple libraries),
+# the backends themselves are in "hotkey_backends.py". A backend provides:
+#   name                 setting value that selects it ("carbon", "tap", ...)
+#   needs_accessibility  whether it needs the Accessibility permission
+#   receives_all_keys    whether it sees every key press (needed for sequences and capture)
+#   available()          whether it can be used on this system
+#   start(handler)       begin delivering key presses as handler(flags, key, event), where a
+#                        True return value swallows the key; returns False on failure
+#   stop()
+#   register(chord)      ask to be woken for "chord" (returns False if it was refused)
+#   unregister(chord)
+
+# Accepted values of the "hotkey_backend" setting.
+BACKEND_CHOICES = ("auto", "carbon", "tap")
+# Seconds allowed between the chords of a sequence trigger.
+SEQUENCE_TIMEOUT = 1.5
+# Modifier bits of CGEventFlags (as stored in triggers) and the Carbon equivalents.
+MODIFIER_BITS = (
+    (1 << 17, 1 << 9),   # Shift
+    (1 << 18, 1 << 12),  # Control
+    (1 << 19, 1 << 11),  # Option
+    (1 << 20, 1 << 8),   # Command
+)
+
+# A key code pressed together with modifier flags.
+Chord = namedtuple("Chord", ["flags", "key"])
+
+
+# Carbon modifier bits for CGEventFlags modifier bits.
+def carbon_modifiers(flags):
+    return sum(carbon for (cg, carbon) in MODIFIER_BITS if flags & cg)
+
+
+# Convert a trigger ({"flags", "key"}, a Chord, or a list of either for a sequence)
+# into a tuple of chords.
+def as_chords(trigger):
+    if isinstance(trigger, dict) or isinstance(trigger, Chord):
+        trigger = [trigger]
+    chords = []
+    for chord in trigger:
+        if isinstance(chord, dict):
+            chord = Chord(chord["flags"], chord["key"])
+        chords.append(Chord(int(chord.flags), int(chord.key)))
+    return tuple(chords)
+
+
+# Pick the backend for "preference" ("auto" or a backend name). "auto" takes the first
+# available backend in the given order, skipping those that do not see every key when
+# "needs_all_keys" is set. An explicit preference falls back the same way if unusable, and
+# an unknown one is treated as "auto" (a typo in the settings must not stop the app).
+def select_backend(backends, preference="auto", needs_all_keys=False):
+    if preference not in BACKEND_CHOICES:
+        print(f"Warning: Unknown hotkey backend {preference!r}, expected one of {', '.join(BACKEND_CHOICES)}; choosing automatically.", flush=True)
+        preference = "auto"
+    usable = [b for b in backends if (b.receives_all_keys or not needs_all_keys) and b.available()]
+    if preference != "auto":
+        chosen = [b for b in usable if b.name == preference]
+        if chosen:
+            return chosen[0]
+        print(f"Warning: Hotkey backend {preference!r} cannot be used here, choosing automatically.", flush=True)
+    if not usable:
+        raise RuntimeError("No hotkey backend is available.")
+    return usable[0]
+
+
+# Keeps the global key bindings and drives the selected backend. Single chords are
+# registered with the backend, so a registered-hotkey backend only wakes us for them.
+# Sequences (several chords in a row) and capturing a new trigger need a backend that
+# sees every key, which is started only while it is needed.
+class HotkeyManager:
+    def __init__(self, backends, preference="auto", clock=time.monotonic):
+        self.backends = list(backends)
+        self.preference = preference
+        self.clock = clock
+        self.bindings = {}
+        self.backend = None
+        self.registered = set()
+        self.capturing = None
+        self.capture_backend = None
+        # Called with (flags, key) for every key press the backend delivers (see replay.py).
+        self.recorder = None
+        self._rebuild()
+
+    # Bind "trigger" to "callback()" under "name" (replacing an earlier binding of that name).
+    def bind(self, name, trigger, callback):
+        self.bindings[name] = (as_chords(trigger), callback)
+        self._rebuild()
+        if self.backend is not None:
+            self.start()
+
+    def unbind(self, name):
+        if self.bindings.pop(name, None) is not None:
+            self._rebuild()
+            if self.backend is not None:
+                self.start()
+
+    # Lookup tables for dispatch: complete sequences and every proper prefix of one.
+    def _rebuild(self):
+        self.sequences = {chords: name for (name, (chords, _)) in self.bindings.items()}
+        self.prefixes = {chords[:i] for chords in self.sequences for i in range(1, len(chords))}
+        self.prefix = ()
+        self.prefix_deadline = 0.0
+
+    # Whether any binding (or recording) needs a backend that sees every key.
+    def needs_all_keys(self):
+        return bool(self.prefixes) or (self.recorder is not None)
+
+    # Select and start a backend (restarting if the bindings now need a different one).
+    def start(self):
+        backend = select_backend(self.backends, self.preference, self.needs_all_keys())
+        if backend is self.backend:
+            self._sync()
+            return True
+        self.stop()
+        if not backend.start(self.dispatch):
+            print(f"Warning: Failed to start the {backend.name!r} hotkey backend.", flush=True)
+            return False
+        print(f"Using the {backend.name!r} hotkey backend.", flush=True)
+        self.backend = backend
+        self._sync()
+        return True
+
+    def stop(self):
+        if self.backend is not None:
+            for chord in list(self.registered):
+                self.backend.unregister(chord)
+            self.registered.clear()
+            self.backend.stop()
+            self.backend = None
+
+    # Register exactly the first chords of the current bindings with the active backend.
+    def _sync(self):
+        wanted = {chords[0] for chords in self.sequences}
+        for chord in self.registered - wanted:
+            self.backend.unregister(chord)
+        for chord in wanted - self.registered:
+            if not self.backend.register(chord):
+                print(f"Warning: Could not register hotkey {chord} (it may be taken by another application).", flush=True)
+        self.registered = wanted
+
+    # Call "callback(event, flags, key)" with the next key press instead of dispatching it.
+    # Returns False if no backend that sees every key could be started.
+    def capture(self, callback):
+        if (self.backend is None) or not self.backend.receives_all_keys:
+            try:
+                backend = select_backend(self.backends, "auto", needs_all_keys=True)
+            except RuntimeError:
+                return False
+            # Registered hotkeys would swallow their chords before they could be captured.
+            for chord in list(self.registered):
+                self.backend.unregister(chord)
+            self.registered.clear()
+            if not backend.start(self.dispatch):
+                if self.backend is not None:
+                    self._sync()
+                return False
+            self.capture_backend = backend
+        self.capturing = callback
+        return True
+
+    # Stop capturing, returning to the normal backend and registrations.
+    def end_capture(self):
+        self.capturing = None
+        if self.capture_backend is not None:
+            self.capture_backend.stop()
+            self.capture_backend = None
+            if self.backend is not None:
+                self._sync()
+
+    # Handle a key press from a backend, returning True if it was consumed.
+    def dispatch(self, flags, key, event=None):
+        if self.recorder is not None:
+            self.recorder(flags, key)
+        if self.capturing is not None:
+            callback = self.capturing
+            self.end_capture()
+            callback(event, flags, key)
+            return True
+        chord = Chord(flags, key)
+        if self.prefix and (self.clock() > self.prefix_deadline):
+            self.prefix = ()
+        candidate = self.prefix + (chord,)
+        if (candidate not in self.sequences) and (candidate not in self.prefixes) and self.prefix:
+            # A broken sequence; the key may still start (or be) a binding of its own.
+            candidate = (chord,)
+        if candidate in self.sequences:
+            self.prefix = ()
+            self.bindings[self.sequences[candidate]][1]()
+            return True
+        if candidate in self.prefixes:
+            self.prefix = candidate
+            self.prefix_deadline = self.clock() + SEQUENCE_TIMEOUT
+            return True
+        self.prefix = ()
+        return False
@@ -0,0 +1,229 @@
+# Python libraries
+import operator
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+# Pure Python image resizing and PNG encoding for raw 8-bit RGBA pixel buffers, fast
+# enough to run on screenshots without third party libraries. The heavy lifting happens
+# inside a few C loops of the interpreter: whole planes are packed into one big integer
+# with a 16-bit lane per byte (SWAR), so that additions and shifts process every byte of
+# the image at once, and byte reordering is done with extended slice assignment.
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Byte order of the supported input pixel formats: the RGBA channel (0 red, 1 green,
+# 2 blue, 3 alpha) stored at each byte offset of a pixel.
+CHANNEL_ORDERS = {
+    "RGBA": (0, 1, 2, 3),
+    "BGRA": (2, 1, 0, 3),
+    "ARGB": (3, 0, 1, 2),
+}
+
+
+# Tightly packed 8-bit RGBA pixels (4 bytes per pixel, rows top to bottom).
+class PixelBuffer:
+    def __init__(self, width, height, data):
+        if len(data) != width * height * 4:
+            raise ValueError(f"Expected {width * height * 4} bytes for {width}x{height} RGBA, got {len(data)}")
+        self.width = width
+        self.height = height
+        self.data = bytes(data)
+
+    # Build a buffer from raw pixels with "stride" bytes per row in the byte order "order".
+    @classmethod
+    def from_raw(cls, width, height, data, stride=None, order="RGBA"):
+        row = width * 4
+        stride = row if stride is None else stride
+        if stride != row:
+            view = memoryview(data)
+            data = b"".join(view[y * stride:y * stride + row] for y in range(height))
+        if order != "RGBA":
+            source = data
+            data = bytearray(len(source))
+            for (offset, channel) in enumerate(CHANNEL_ORDERS[order]):
+                data[channel::4] = source[offset::4]
+        return cls(width, height, data)
+
+    # Pixel at (x, y) as an (r, g, b, a) tuple.
+    def pixel(self, x, y):
+        i = 4 * (y * self.width + x)
+        return tuple(self.data[i:i + 4])
+
+
+# Spread bytes into 16-bit little-endian lanes of one integer (room for carries).
+def widen(data):
+    wide = bytearray(2 * len(data))
+    wide[0::2] = data
+    return int.from_bytes(wide, "little")
+
+
+# An integer with "value" in each of "lanes" 16-bit lanes.
+def lane_constant(value, lanes):
+    return int.from_bytes(struct.pack("<H", value) * lanes, "little")
+
+
+# Halve both dimensions, averaging each 2x2 block (an odd last row / column is dropped).
+def downscale_half(pixels):
+    width, height = pixels.width // 2, pixels.height // 2
+    if not (width and height):
+        raise ValueError("Image is too small to halve")
+    row, used = pixels.width * 4, width * 8
+    view = memoryview(pixels.data)
+    top = b"".join(view[(2 * y) * row:(2 * y) * row + used] for y in range(height))
+    bottom = b"".join(view[(2 * y + 1) * row:(2 * y + 1) * row + used] for y in range(height))
+    lanes = len(top)
+    # Vertical sums, then horizontal: lane i gains lane i + 4 (the same channel of the
+    # next pixel). Sums are at most 1020 so lanes never carry into each other.
+    total = widen(top) + widen(bottom)
+    total += total >> 64
+    total += lane_constant(2, lanes)
+    total >>= 2
+    # The shift moved the low bits of each lane into the top of the one below; drop them.
+    total &= lane_constant(0xFF, lanes)
+    averaged = total.to_bytes(2 * lanes, "little")[0::2]
+    # Keep the even pixels, which hold the averages of their pair.
+    data = bytearray(lanes // 2)
+    for channel in range(4):
+        data[channel::4] = averaged[channel::8]
+    return PixelBuffer(width, height, data)
+
+
+# Resize to exactly "width" x "height" by sampling the nearest pixel.
+def resize_nearest(pixels, width, height):
+    source = memoryview(pixels.data).cast("I")
+    columns = [((2 * x + 1) * pixels.width) // (2 * width) for x in range(width)]
+    getter = operator.itemgetter(*columns)
+    if width == 1:
+        pick = lambda row: (getter(row),)
+    else:
+        pick = getter
+    out = array("I")
+    previous_y, previous_row = None, None
+    for y in range(height):
+        source_y = ((2 * y + 1) * pixels.height) // (2 * height)
+        if source_y != previous_y:
+            start = source_y * pixels.width
+            previous_y, previous_row = source_y, pick(source[start:start + pixels.width])
+        out.extend(previous_row)
+    return PixelBuffer(width, height, out.tobytes())
+
+
+# Size that fits "width" x "height" within "max_dimension" (keeping the aspect ratio).
+def fitted_size(width, height, max_dimension):
+    scale = min(1.0, max_dimension / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+# Scale down to the given size: halve (box filter) while at least twice as large, then
+# sample the nearest pixel for the rest.
+def resize(pixels, width, height):
+    while (pixels.width >= 2 * width) and (pixels.height >= 2 * height):
+        pixels = downscale_half(pixels)
+    if (pixels.width, pixels.height) != (width, height):
+        pixels = resize_nearest(pixels, width, height)
+    return pixels
+
+
+# Drop the alpha channel (RGBA to RGB).
+def rgb_bytes(pixels):
+    rgb = bytearray(pixels.width * pixels.height * 3)
+    for channel in range(3):
+        rgb[channel::3] = pixels.data[channel::4]
+    return rgb
+
+
+# Apply the PNG "Up" filter to every row (each byte minus the byte above it, modulo 256)
+# and prefix each row with its filter type byte.
+def filter_up(rows, row_bytes, height):
+    lanes = len(rows)
+    current = widen(rows)
+    above = widen(bytes(row_bytes) + bytes(rows[:lanes - row_bytes]))
+    # Adding 256 to every lane first keeps the per-lane differences from borrowing.
+    difference = (current + lane_constant(0x100, lanes) - above) & lane_constant(0xFF, lanes)
+    filtered = difference.to_bytes(2 * lanes, "little")[0::2]
+    out = bytearray((row_bytes + 1) * height)
+    view = memoryview(filtered)
+    for y in range(height):
+        start = y * (row_bytes + 1)
+        out[start] = 2
+        out[start + 1:start + 1 + row_bytes] = view[y * row_bytes:(y + 1) * row_bytes]
+    return out
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+# Encode as an opaque (RGB) or transparent (RGBA) 8-bit PNG.
+def encode_png(pixels, level=6, alpha=False):
+    if alpha:
+        rows, color_type, channels = pixels.data, 6, 4
+    else:
+        rows, color_type, channels = rgb_bytes(pixels), 2, 3
+    row_bytes = pixels.width * channels
+    header = struct.pack(">IIBBBBB", pixels.width, pixels.height, 8, color_type, 0, 0, 0)
+    body = zlib.compress(filter_up(rows, row_bytes, pixels.height), level)
+    return PNG_SIGNATURE + png_chunk(b"IHDR", header) + png_chunk(b"IDAT", body) + png_chunk(b"IEND", b"")
+
+
+# Fit within "max_dimension" and encode as PNG, scaling down further until the file is
+# at most "max_bytes". Returns (png bytes, width, height).
+def fit_to_budget(pixels, max_bytes, max_dimension=1568, level=6, min_dimension=64):
+    pixels = resize(pixels, *fitted_size(pixels.width, pixels.height, max_dimension))
+    while True:
+        png = encode_png(pixels, level)
+        if (len(png) <= max_bytes) or (max(pixels.width, pixels.height) <= min_dimension):
+            return png, pixels.width, pixels.height
+        # The encoded size shrinks roughly with the pixel count.
+        scale = min(0.9, 0.95 * (max_bytes / len(png)) ** 0.5)
+        width, height = fitted_size(pixels.width, pixels.height, max(min_dimension, int(max(pixels.width, pixels.height) * scale)))
+        pixels = resize(pixels, width, height)
+
+
+# Synthetic screenshot: flat panels with rows of "text" and a gradient strip.
+def synthetic_screenshot(width, height):
+    data = bytearray(b"\xf4\xf4\xf4\xff" * (width * height))
+    row = width * 4
+    for y in range(height):
+        start = y * row
+        if (y // 18) % 2 == 0 and (y % 18) < 12:
+            for x in range(40, width - 40, 9):
+                if (x * 7 + y * 3) % 5 < 3:
+                    data[start + 4 * x:start + 4 * x + 12] = b"\x20\x20\x28\xff" * 3
+        if y > height - 60:
+            shade = bytes([(x * 255) // width for x in range(width)])
+            data[start:start + row:4] = shade
+            data[start + 1:start + row:4] = shade
+    return PixelBuffer(width, height, data)
+
+
+# Time each stage of the pipeline on synthetic screenshots.
+def benchmark(sizes=((1440, 900), (2880, 1800)), repeat=3, max_bytes=1 << 20):
+    for (width, height) in sizes:
+        pixels = synthetic_screenshot(width, height)
+        megapixels = width * height / 1e6
+        stages = [
+            ("downscale_half", lambda: downscale_half(pixels), megapixels),
+            ("resize_nearest 0.7x", lambda: resize_nearest(pixels, int(width * 0.7), int(height * 0.7)), megapixels),
+            ("encode_png", lambda: encode_png(pixels), megapixels),
+            ("fit_to_budget", lambda: fit_to_budget(pixels, max_bytes), megapixels),
+        ]
+        print(f"{width}x{height} ({megapixels:.1f} MP)")
+        for (name, run, amount) in stages:
+            best = min(timed(run) for _ in range(repeat))
+            print(f"  {name:<20} {best * 1000:8.1f} ms  {amount / best:7.1f} MP/s")
+        png, w, h = fit_to_budget(pixels, max_bytes)
+        print(f"  result               {w}x{h}, {len(png) / 1024:.0f} KiB")
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    benchmark()
+    sys.exit(0)
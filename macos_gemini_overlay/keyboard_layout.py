@@ -0,0 +1,122 @@
+# Python libraries
+import ctypes
+import sys
+
+# Local libraries
+from .hotkey_backends import CARBON_PATH
+from .keymap import (
+    KEYCODES,
+    US_CHARACTERS,
+    KeymapCache,
+)
+from .state import LOG_DIR
+
+CORE_FOUNDATION_PATH = "/System/Library/Frameworks/CoreFoundation.framework/CoreFoundation"
+# Distributed notification posted when the user switches to another keyboard layout.
+LAYOUT_CHANGED_NOTIFICATION = "com.apple.Carbon.TISNotifySelectedKeyboardInputSourceChanged"
+kUCKeyActionDisplay = 3
+kUCKeyTranslateNoDeadKeysMask = 1
+kCFStringEncodingUTF8 = 0x08000100
+MAX_CHARACTERS = 8
+
+
+# Load the Text Input Sources and Unicode key layout functions (None if unavailable).
+def load_text_input():
+    if sys.platform != "darwin":
+        return None
+    try:
+        carbon = ctypes.cdll.LoadLibrary(CARBON_PATH)
+        core_foundation = ctypes.cdll.LoadLibrary(CORE_FOUNDATION_PATH)
+    except OSError:
+        return None
+    carbon.TISCopyCurrentKeyboardLayoutInputSource.restype = ctypes.c_void_p
+    carbon.TISCopyCurrentKeyboardLayoutInputSource.argtypes = []
+    carbon.TISGetInputSourceProperty.restype = ctypes.c_void_p
+    carbon.TISGetInputSourceProperty.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    carbon.LMGetKbdType.restype = ctypes.c_uint8
+    carbon.LMGetKbdType.argtypes = []
+    carbon.UCKeyTranslate.restype = ctypes.c_int32
+    carbon.UCKeyTranslate.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint16, ctypes.c_uint16, ctypes.c_uint32, ctypes.c_uint32,
+        ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.c_ulong,
+        ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_uint16),
+    ]
+    core_foundation.CFDataGetBytePtr.restype = ctypes.c_void_p
+    core_foundation.CFDataGetBytePtr.argtypes = [ctypes.c_void_p]
+    core_foundation.CFStringGetCString.restype = ctypes.c_bool
+    core_foundation.CFStringGetCString.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_long, ctypes.c_uint32]
+    core_foundation.CFRelease.restype = None
+    core_foundation.CFRelease.argtypes = [ctypes.c_void_p]
+    return carbon, core_foundation
+
+
+# Loaded on first use.
+TEXT_INPUT = []
+
+
+def text_input():
+    if not TEXT_INPUT:
+        TEXT_INPUT.append(load_text_input())
+    return TEXT_INPUT[0]
+
+
+# Value of the Carbon "kTISProperty..." constant named "name".
+def tis_property(carbon, name):
+    return ctypes.c_void_p.in_dll(carbon, name).value
+
+
+# Id of the active keyboard layout, for example "com.apple.keylayout.German".
+def current_layout_id():
+    libraries = text_input()
+    if libraries is None:
+        return None
+    carbon, core_foundation = libraries
+    source = carbon.TISCopyCurrentKeyboardLayoutInputSource()
+    if not source:
+        return None
+    try:
+        value = carbon.TISGetInputSourceProperty(source, tis_property(carbon, "kTISPropertyInputSourceID"))
+        buffer = ctypes.create_string_buffer(256)
+        if value and core_foundation.CFStringGetCString(value, buffer, len(buffer), kCFStringEncodingUTF8):
+            return buffer.value.decode("utf-8")
+        return None
+    finally:
+        core_foundation.CFRelease(source)
+
+
+# Characters typed by every key of the active layout (without modifiers and dead keys),
+# as a "characters(keycode)" function for keymap.build_table.
+def layout_characters(layout_id):
+    libraries = text_input()
+    if libraries is None:
+        return US_CHARACTERS.get
+    carbon, core_foundation = libraries
+    source = carbon.TISCopyCurrentKeyboardLayoutInputSource()
+    if not source:
+        raise OSError("No keyboard layout input source")
+    try:
+        data = carbon.TISGetInputSourceProperty(source, tis_property(carbon, "kTISPropertyUnicodeKeyLayoutData"))
+        if not data:
+            raise OSError(f"Layout {layout_id!r} has no Unicode key layout data")
+        layout = core_foundation.CFDataGetBytePtr(data)
+        keyboard_type = carbon.LMGetKbdType()
+        characters = {}
+        dead_key_state = ctypes.c_uint32(0)
+        length = ctypes.c_ulong(0)
+        text = (ctypes.c_uint16 * MAX_CHARACTERS)()
+        for keycode in KEYCODES:
+            dead_key_state.value = 0
+            status = carbon.UCKeyTranslate(
+                layout, keycode, kUCKeyActionDisplay, 0, keyboard_type, kUCKeyTranslateNoDeadKeysMask,
+                ctypes.byref(dead_key_state), MAX_CHARACTERS, ctypes.byref(length), text,
+            )
+            if status == 0 and length.value:
+                units = bytes(memoryview(text).cast("B")[:2 * length.value])
+                characters[keycode] = units.decode("utf-16-le", errors="ignore")
+        return characters.get
+    finally:
+        core_foundation.CFRelease(source)
+
+
+# Key labels of the active layout, cached in the log directory.
+KEYMAP = KeymapCache(LOG_DIR / "keymaps", current_layout_id, layout_characters)
@@ -0,0 +1,175 @@
+# Python libraries
+import json
+import os
+import re
+import threading
+
+# Local libraries
+from .hotkeys import MODIFIER_BITS
+
+# Labels for key codes, built once per keyboard layout and cached on disk, so naming a
+# key is a dictionary lookup. The layout specific part (what character a key types) comes
+# from a "characters(keycode)" function: the layout data of the system on macOS (see
+# keyboard_layout.py), or a plain dictionary (US_CHARACTERS, or fixtures elsewhere).
+
+# Bump when the table format or the labelling changes (older cache files are rebuilt).
+TABLE_FORMAT = 1
+# Virtual key codes run from 0 to 127.
+KEYCODES = range(128)
+MODIFIER_NAMES = ("Shift", "Control", "Option", "Command")
+# Keys whose label does not depend on the layout.
+SPECIAL_KEY_NAMES = {
+    36: "Return", 48: "Tab", 49: "Space", 51: "Delete", 53: "Escape",
+    71: "Clear", 76: "Enter", 114: "Help", 115: "Home", 116: "Page Up",
+    117: "Forward Delete", 119: "End", 121: "Page Down",
+    123: "Left Arrow", 124: "Right Arrow", 125: "Down Arrow", 126: "Up Arrow",
+    122: "F1", 120: "F2", 99: "F3", 118: "F4", 96: "F5", 97: "F6",
+    98: "F7", 100: "F8", 101: "F9", 109: "F10", 103: "F11", 111: "F12",
+    105: "F13", 107: "F14", 113: "F15", 106: "F16", 64: "F17", 79: "F18",
+    80: "F19", 90: "F20",
+    # Modifier keys themselves.
+    54: "Right Command", 55: "Command", 56: "Shift", 57: "Caps Lock", 58: "Option",
+    59: "Control", 60: "Right Shift", 61: "Right Option", 62: "Right Control", 63: "Fn",
+    # Volume keys and the JIS input mode keys.
+    72: "Volume Up", 73: "Volume Down", 74: "Mute", 102: "Eisu", 104: "Kana",
+}
+# Keypad keys type the same characters on every layout but are labelled as keypad keys.
+KEYPAD_KEYS = {
+    65: ".", 67: "*", 69: "+", 75: "/", 78: "-", 81: "=", 82: "0", 83: "1", 84: "2",
+    85: "3", 86: "4", 87: "5", 88: "6", 89: "7", 91: "8", 92: "9", 95: ",",
+}
+# Characters typed by the character keys of the US (ANSI) layout, the fallback table.
+US_CHARACTERS = dict(enumerate("asdfhgzxcv"))
+US_CHARACTERS.update({11: "b", 12: "q", 13: "w", 14: "e", 15: "r", 16: "y", 17: "t",
+    18: "1", 19: "2", 20: "3", 21: "4", 22: "6", 23: "5", 24: "=", 25: "9", 26: "7",
+    27: "-", 28: "8", 29: "0", 30: "]", 31: "o", 32: "u", 33: "[", 34: "i", 35: "p",
+    37: "l", 38: "j", 39: "'", 40: "k", 41: ";", 42: "\\", 43: ",", 44: "/", 45: "n",
+    46: "m", 47: ".", 50: "`"})
+US_LAYOUT_ID = "com.apple.keylayout.US"
+
+
+# Label for a typed character: letters upper case (as printed on keys), nothing for
+# control characters.
+def character_label(text):
+    text = "".join(c for c in (text or "") if c.isprintable() and not c.isspace())
+    upper = text.upper()
+    return upper if len(upper) == len(text) else text
+
+
+# Build {keycode: label} for a layout from "characters(keycode)" (the text the key types
+# without modifiers, "" or None when it types nothing). Keys without a label are left out.
+def build_table(characters):
+    table = {}
+    for keycode in KEYCODES:
+        if keycode in SPECIAL_KEY_NAMES:
+            table[keycode] = SPECIAL_KEY_NAMES[keycode]
+        elif keycode in KEYPAD_KEYS:
+            table[keycode] = f"Keypad {KEYPAD_KEYS[keycode]}"
+        else:
+            label = character_label(characters(keycode))
+            if label:
+                table[keycode] = label
+    return table
+
+
+# Label for a key code in "table" (a generic one for keys the layout does not produce).
+def key_label(table, keycode):
+    return table.get(keycode) or f"Key {keycode}"
+
+
+# Names of the modifier keys in CGEventFlags "flags".
+def modifier_names(flags):
+    return [name for (name, (bit, _)) in zip(MODIFIER_NAMES, MODIFIER_BITS) if flags & bit]
+
+
+# Readable trigger, for example "Option + Space" (a list of chords is a sequence).
+def format_trigger(table, trigger):
+    if isinstance(trigger, (list, tuple)) and not hasattr(trigger, "flags"):
+        return ", then ".join(format_trigger(table, chord) for chord in trigger)
+    if isinstance(trigger, dict):
+        flags, keycode = trigger["flags"], trigger["key"]
+    else:
+        flags, keycode = trigger.flags, trigger.key
+    return " + ".join(modifier_names(flags) + [key_label(table, keycode)])
+
+
+# File name for the cached table of a layout.
+def cache_name(layout_id):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", layout_id) + ".json"
+
+
+# Tables per layout, in memory and as JSON files in "directory". "current_layout()"
+# returns the id of the active layout and "characters_for(layout_id)" its characters
+# function (only called when a table is not cached yet). Call invalidate() when the
+# layout changes; the next lookup then finds the table of the new layout.
+class KeymapCache:
+    def __init__(self, directory, current_layout, characters_for):
+        self.directory = os.fspath(directory)
+        self.current_layout = current_layout
+        self.characters_for = characters_for
+        self.tables = {}
+        self.current = None
+        self.lock = threading.Lock()
+
+    def invalidate(self):
+        with self.lock:
+            self.current = None
+
+    # The table of the active layout.
+    def table(self):
+        with self.lock:
+            if self.current is None:
+                try:
+                    layout_id = self.current_layout() or US_LAYOUT_ID
+                except Exception as e:
+                    print("Warning: Could not determine the keyboard layout:", e, flush=True)
+                    layout_id = US_LAYOUT_ID
+                self.current = self._load(layout_id)
+            return self.current
+
+    def label(self, keycode):
+        return key_label(self.table(), keycode)
+
+    def format(self, trigger):
+        return format_trigger(self.table(), trigger)
+
+    # Table for "layout_id" from memory, the cache file, or built (and saved).
+    def _load(self, layout_id):
+        if layout_id in self.tables:
+            return self.tables[layout_id]
+        path = os.path.join(self.directory, cache_name(layout_id))
+        table = read_table(path, layout_id)
+        if table is None:
+            try:
+                table = build_table(self.characters_for(layout_id))
+            except Exception as e:
+                print(f"Warning: Could not read keyboard layout {layout_id!r}, using US labels:", e, flush=True)
+                table = build_table(US_CHARACTERS.get)
+            write_table(path, layout_id, table)
+        self.tables[layout_id] = table
+        return table
+
+
+# Read a cached table (None if missing, stale or unreadable).
+def read_table(path, layout_id):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if (data.get("format") != TABLE_FORMAT) or (data.get("layout") != layout_id):
+            return None
+        return {int(keycode): label for (keycode, label) in data["labels"].items()}
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None
+
+
+# Atomically write a table to the cache.
+def write_table(path, layout_id, table):
+    data = {"format": TABLE_FORMAT, "layout": layout_id, "labels": {str(k): v for (k, v) in sorted(table.items())}}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary, "w") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temporary, path)
+    except OSError as e:
+        print(f"Warning: Could not cache the key labels in {path}:", e, flush=True)
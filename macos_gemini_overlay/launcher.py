@@ -1,7 +1,6 @@
 # Python libraries.
 import getpass
 import os
-import subprocess
 import sys
 import time
 from pathlib import Path
@@ -12,8 +11,10 @@ from Foundation import NSDictionary
 from ApplicationServices import AXIsProcessTrustedWithOptions, kAXTrustedCheckOptionPrompt
 
 # Local libraries
+from .commands import COMMANDS
 from .constants import APP_TITLE
 from .health_checks import reset_crash_counter
+from .profiling import PROFILE_ENV, profiling_requested
 
 
 # Get the executable path.
@@ -30,8 +31,10 @@ def get_executable():
         program_args = [sys.executable, "-m", f"macos_{APP_TITLE.lower()}_overlay"]
     return program_args
 
-# Install the app as a startup application using a Launch Agent.
-def install_startup():
+# Install the app as a startup application using a Launch Agent. Waits for launchctl
+# and returns whether it worked, or with "callback" returns immediately and later calls
+# "callback(installed)" (on the main thread in the application).
+def install_startup(callback=None):
     # Get the absolute path to the macos-*-overlay script
     username = getpass.getuser()
     program_args = get_executable()
@@ -42,38 +45,52 @@ def install_startup():
         "RunAtLoad": True,
         "KeepAlive": True,  # Will be restarted automatically on failure.
     }
+    # Profile every launch by the agent when installed with profiling requested.
+    if profiling_requested():
+        plist["EnvironmentVariables"] = {PROFILE_ENV: "1"}
     launch_agents_dir = Path.home() / "Library" / "LaunchAgents"
     launch_agents_dir.mkdir(parents=True, exist_ok=True)
     plist_path = launch_agents_dir / f"com.{username}.macos{APP_TITLE.lower()}overlay.plist"
     with open(plist_path, "wb") as f:
         plistlib.dump(plist, f)
-    result = os.system(f"launchctl load {plist_path}")
-    if result != 0:
-        print(f"Failed to load Launch Agent with exit code {result}")
-        return False
-    else:
-        print(f"Installed as startup app. Launch Agent created at {plist_path}.")
-        print(f"To disable, run: macos-{APP_TITLE.lower()}-overlay --uninstall-startup")
-        return True
+    def loaded(result):
+        if not result.ok:
+            print(f"Failed to load Launch Agent, {result.describe()}", flush=True)
+            return False
+        else:
+            print(f"Installed as startup app. Launch Agent created at {plist_path}.")
+            print(f"To disable, run: macos-{APP_TITLE.lower()}-overlay --uninstall-startup", flush=True)
+            return True
+    return launchctl(["load", plist_path], loaded, callback)
 
-# Uninstall the app from running at login.
-def uninstall_startup():
+# Uninstall the app from running at login (waiting, or calling "callback" like install_startup).
+def uninstall_startup(callback=None):
     username = getpass.getuser()
     launch_agents_dir = Path.home() / "Library" / "LaunchAgents"
     plist_path = launch_agents_dir / f"com.{username}.macos{APP_TITLE.lower()}overlay.plist"
     if plist_path.exists():
-        try:
-            os.system(f"launchctl unload {plist_path}")
-            print(f"Uninstalled Launch Agent.")
-        except Exception as e:
-            print(f"Failed to uninstall launch agent. Encountered exception when running `launchctl unload {plist_path}`.\n{e}\n")
-        print(f"Removed {plist_path}.")
-        os.remove(plist_path)
-        return True
+        def unloaded(result):
+            if result.ok:
+                print(f"Uninstalled Launch Agent.")
+            else:
+                print(f"Failed to uninstall launch agent, {result.describe()}\n")
+            print(f"Removed {plist_path}.", flush=True)
+            os.remove(plist_path)
+            return True
+        return launchctl(["unload", plist_path], unloaded, callback)
     else:
         print("Launch Agent not found. Nothing to uninstall.")
+        if callback is not None:
+            callback(False)
         return False
 
+# Run launchctl through the command runner and pass its result through "handle(result)",
+# waiting for it, or in the background with the outcome going to "callback".
+def launchctl(args, handle, callback=None):
+    if callback is None:
+        return handle(COMMANDS.run(["launchctl"] + args))
+    COMMANDS.start(["launchctl"] + args, lambda result: callback(handle(result)))
+
 # Check if the current process has Accessibility permissions.
 def check_permissions(ask=True):
     print("\nChecking permission to utilize macOS Accessibility features to listen for the Option+Space keyboard sequence. If permission is not currently granted, a request will be made through the dialogue for the current executor (e.g., Terminal, python3, ...).\n", flush=True)
@@ -86,12 +103,8 @@ def check_permissions(ask=True):
 
 # Spawn a child process to check the latest permission status.
 def get_updated_permission_status():
-    result = subprocess.run(
-        get_executable() + ["--check-permissions"],
-        capture_output=True,
-        text=True
-    )
-    return result.returncode == 0
+    result = COMMANDS.run(get_executable() + ["--check-permissions"])
+    return result.ok
 
 # Wait for permissions to be granted, checking periodically.
 def wait_for_permissions(max_wait_sec=60, wait_interval_sec=5):
@@ -1,12 +1,10 @@
 # Python libraries
-import json
 import time
 from pathlib import Path
 
 # Apple libraries
 from AppKit import (
     NSColor,
-    NSEvent,
     NSFont,
     NSKeyDown,
     NSMakeRect,
@@ -15,56 +13,32 @@ from AppKit import (
     NSTextField,
     NSView,
 )
-from Quartz import (
-    CGEventCreateKeyboardEvent,
-    CGEventKeyboardGetUnicodeString,
-    CGEventGetFlags,
-    CGEventGetIntegerValueField,
-    kCGEventKeyDown,
-    kCGKeyboardEventKeycode,
-    NSEvent,
-    NSAlternateKeyMask,
-    NSCommandKeyMask,
-    NSControlKeyMask,
-    NSShiftKeyMask,
-)
 
 
 # Local libraries
 from .constants import LAUNCHER_TRIGGER, LAUNCHER_TRIGGER_MASK
-from .health_checks import LOG_DIR
-
-# File for storing the custom trigger
-TRIGGER_FILE = LOG_DIR / "custom_trigger.json"
-SPECIAL_KEY_NAMES = {
-    49: "Space", 36: "Return", 53: "Escape",
-    122: "F1", 120: "F2", 99: "F3", 118: "F4",
-    96: "F5", 97: "F6", 98: "F7", 100: "F8",
-    101: "F9", 109: "F10", 103: "F11", 111: "F12",
-    123: "Left Arrow", 124: "Right Arrow",
-    125: "Down Arrow", 126: "Up Arrow"
-}
-handle_new_trigger = None
+from .keyboard_layout import KEYMAP
+from .launcher import check_permissions
+from .state import (
+    STATE,
+    STATE_FILE,
+)
 
-# Load trigger from JSON file if it exists
+# Load the custom trigger from the saved state if there is one
 def load_custom_launcher_trigger():
-    if TRIGGER_FILE.exists():
+    data = STATE.get("launcher_trigger")
+    if data:
         try:
-            with open(TRIGGER_FILE, "r") as f:
-                data = json.load(f)
-                launcher_trigger = {"flags": data["flags"], "key": data["key"]}
-            print(f"Overwriting default with a custom launch trigger:\n  {launcher_trigger}", flush=True)
-            print(f"Disable custom override and return to default by deleting the file:\n  {TRIGGER_FILE}", flush=True)
-            LAUNCHER_TRIGGER.update(launcher_trigger)
-        except (json.JSONDecodeError, KeyError):
-            pass
+            launcher_trigger = {"flags": int(data["flags"]), "key": int(data["key"])}
+        except (KeyError, TypeError, ValueError):
+            return
+        print(f"Overwriting default with a custom launch trigger:\n  {launcher_trigger}", flush=True)
+        print(f"Disable custom override and return to default by removing \"launcher_trigger\" from:\n  {STATE_FILE}", flush=True)
+        LAUNCHER_TRIGGER.update(launcher_trigger)
 
 def set_custom_launcher_trigger(app):
     app.showWindow_(None)
     print("Setting new launcher trigger.", flush=True)
-    # Disable the current trigger
-    LAUNCHER_TRIGGER["flags"] = None
-    LAUNCHER_TRIGGER["key"] = None
     # Get the content view bounds
     content_view = app.window.contentView()
     content_bounds = content_view.bounds()
@@ -134,10 +108,9 @@ def set_custom_launcher_trigger(app):
     # Define the handler for the new trigger
     def custom_handle_new_trigger(event, flags, keycode):
         launcher_trigger = {"flags": flags, "key": keycode}
-        with open(TRIGGER_FILE, "w") as f:
-            json.dump(launcher_trigger, f)
+        STATE.set("launcher_trigger", launcher_trigger)
         LAUNCHER_TRIGGER.update(launcher_trigger)
-        trigger_str = get_trigger_string(event, flags, keycode)
+        trigger_str = get_trigger_string(flags, keycode)
         print("New launcher trigger set:", flush=True)
         print(f"  {launcher_trigger}", flush=True)
         print(f"  {trigger_str}", flush=True)
@@ -145,55 +118,16 @@ def set_custom_launcher_trigger(app):
         trigger_display.setStringValue_(trigger_str)
         # Remove the overlay after 3 seconds
         overlay_view.performSelector_withObject_afterDelay_("removeFromSuperview", None, 1.5)
-        # Reset the handler
-        global handle_new_trigger
-        handle_new_trigger = None
+        # Register the new trigger in place of the old one
+        app.bind_launcher_trigger()
         app.showWindow_(None)
         return None
-    # Set the global handler
-    global handle_new_trigger
-    handle_new_trigger = custom_handle_new_trigger
-
-# Helper function to get modifier names
-def get_modifier_names(flags):
-    modifier_names = []
-    if flags & NSShiftKeyMask:
-        modifier_names.append("Shift")
-    if flags & NSControlKeyMask:
-        modifier_names.append("Control")
-    if flags & NSAlternateKeyMask:
-        modifier_names.append("Option")
-    if flags & NSCommandKeyMask:
-        modifier_names.append("Command")
-    return modifier_names
-
-# Get human-readable string for the trigger
-def get_trigger_string(event, flags, keycode):
-    # Get the modifier names.
-    modifier_names = get_modifier_names(flags)
-    # Get the key name.
-    if keycode in SPECIAL_KEY_NAMES:
-        key_name = SPECIAL_KEY_NAMES[keycode]
-    else:
-        key_name = NSEvent.eventWithCGEvent_(event).characters()
-    # Generate a plain text of the keys.
-    return " + ".join(modifier_names + [key_name]) if modifier_names else key_name
+    # Capturing the next key press needs the event tap (and so Accessibility permission).
+    if not app.hotkeys.capture(custom_handle_new_trigger):
+        trigger_display.setStringValue_("Needs Accessibility permission")
+        overlay_view.performSelector_withObject_afterDelay_("removeFromSuperview", None, 3.0)
+        check_permissions()
 
-# Global event listener for showing/hiding the application and setting new triggers
-def global_show_hide_listener(app):
-    def listener(proxy, event_type, event, refcon):
-        if event_type == kCGEventKeyDown:
-            keycode = CGEventGetIntegerValueField(event, kCGKeyboardEventKeycode)
-            flags = CGEventGetFlags(event) & LAUNCHER_TRIGGER_MASK
-            if (None in set(LAUNCHER_TRIGGER.values())) and handle_new_trigger:
-                print("  received keys, establishing new trigger..", flush=True)
-                handle_new_trigger(event, flags, keycode)
-                return None
-            elif (flags == LAUNCHER_TRIGGER["flags"]) and (keycode == LAUNCHER_TRIGGER["key"]):
-                if app.window.isKeyWindow():
-                    app.hideWindow_(None)
-                else:
-                    app.showWindow_(None)
-                return None
-        return event
-    return listener
+# Get human-readable string for the trigger (labels of the active keyboard layout)
+def get_trigger_string(flags, keycode):
+    return KEYMAP.format({"flags": flags, "key": keycode})
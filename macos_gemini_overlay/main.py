@@ -8,11 +8,18 @@ from .constants import (
     LAUNCHER_TRIGGER,
     LAUNCHER_TRIGGER_MASK,
     PERMISSION_CHECK_EXIT,
+    SETTINGS,
 )
 from .app import (
     AppDelegate,
     NSApplication
 )
+from .hotkey_backends import (
+    default_backends
+)
+from .hotkeys import (
+    select_backend
+)
 from .launcher import (
     check_permissions,
     ensure_accessibility_permissions,
@@ -22,6 +29,14 @@ from .launcher import (
 from .health_checks import (
     health_check_decorator
 )
+from .profiling import (
+    PROFILE_ENV,
+    PROFILE_FLAG,
+    RECORDER,
+)
+from .settings import (
+    load_settings
+)
 
 
 # Main executable for running the application from the command line.
@@ -43,6 +58,15 @@ def main():
         action="store_true",
         help="Check Accessibility permissions only"
     )
+    parser.add_argument(
+        PROFILE_FLAG,
+        action="store_true",
+        help=f"Time the startup phases and profile them until the first page load, writing the results to the log directory (or set {PROFILE_ENV}=1, which --install-startup also does when given this flag)",
+    )
+    parser.add_argument(
+        "--website",
+        help="Load this URL instead of the default website (overrides the \"website\" setting), for example a local stand-in started with: python -m macos_gemini_overlay.standin",
+    )
     args = parser.parse_args()
 
     if args.install_startup:
@@ -58,8 +82,18 @@ def main():
         print("Permissions granted:", is_trusted)
         sys.exit(0 if is_trusted else PERMISSION_CHECK_EXIT)
 
+    # Apply any saved overrides of the optional feature settings.
+    with RECORDER.phase("settings"):
+        load_settings()
+    if args.website:
+        SETTINGS["website"] = args.website
     # Check permissions (make request to user) when launching, but proceed regardless.
-    check_permissions()
+    # Only the event tap needs them, registered hotkeys work without (recording key
+    # presses needs the tap).
+    with RECORDER.phase("permission check"):
+        backend = select_backend(default_backends(), SETTINGS["hotkey_backend"], bool(SETTINGS["keystroke_trace"]))
+        if backend.needs_accessibility:
+            check_permissions()
     # # Ensure permissions before proceeding
     # ensure_accessibility_permissions()
 
@@ -70,6 +104,8 @@ def main():
     print(f"To run at login, use:      macos-{APP_TITLE.lower()}-overlay --install-startup")
     print(f"To remove from login, use: macos-{APP_TITLE.lower()}-overlay --uninstall-startup")
     print()
+    # Ends when the application has finished launching (see AppDelegate).
+    RECORDER.begin("NSApplication setup")
     app = NSApplication.sharedApplication()
     delegate = AppDelegate.alloc().init()
     app.setDelegate_(delegate)
@@ -0,0 +1,127 @@
+# Python libraries
+from urllib.parse import urlsplit
+
+
+# Buttons the keyboard shortcuts click (the first selector that matches wins).
+NEW_CHAT_SELECTORS = ['[aria-label="New chat"]', '[aria-label="New conversation"]', '[data-command="new-conversation"]']
+SIDEBAR_SELECTORS = ['[aria-label="Main menu"]', '[data-test-id="side-nav-menu-button"]']
+SETTINGS_SELECTORS = ['[aria-label="Settings & help"]', '[data-test-id="settings-and-help-button"]']
+# Page side handlers for the message bus, plus reporting of the page background color.
+PAGE_SCRIPT = """
+(function(){
+  const bus = window.__overlayBus;
+  const PROMPT_SELECTOR = '[aria-label="Enter a prompt here"], [data-placeholder="Message Claude"], div[contenteditable="true"]';
+  const SEND_SELECTOR = 'button[aria-label="Send message"], button[aria-label="Send Message"], button[type="submit"]';
+  function prompt(){ return document.querySelector(PROMPT_SELECTOR) || document.querySelector('textarea'); }
+  // Focus the prompt area, answering whether it exists yet.
+  bus.on('prompt.focus', function(){
+    const el = prompt();
+    if (el) { el.focus(); }
+    return !!el;
+  });
+  // Insert text at the cursor of the prompt area (falls back to appending to it), then
+  // send the prompt if "submit" is set.
+  bus.on('prompt.insert', function(payload){
+    const el = prompt();
+    if (!el) { return false; }
+    el.focus();
+    if (payload.text && !document.execCommand('insertText', false, payload.text)) {
+      if ('value' in el) { el.value += payload.text; } else { el.textContent += payload.text; }
+      el.dispatchEvent(new Event('input', {bubbles: true}));
+    }
+    if (!payload.submit) { return true; }
+    // Give the page a moment to enable its send button.
+    return new Promise(function(resolve){
+      setTimeout(function(){
+        const send = document.querySelector(SEND_SELECTOR);
+        if (send && !send.disabled) {
+          send.click();
+        } else {
+          el.dispatchEvent(new KeyboardEvent('keydown', {key: 'Enter', code: 'Enter', keyCode: 13, bubbles: true, cancelable: true}));
+        }
+        resolve(true);
+      }, 50);
+    });
+  });
+  // Attach a file (base64 "data" with "name" and "type") through the upload input, or by
+  // pasting it into the prompt area.
+  bus.on('prompt.attach', function(payload){
+    const binary = atob(payload.data);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) { bytes[i] = binary.charCodeAt(i); }
+    const transfer = new DataTransfer();
+    transfer.items.add(new File([bytes], payload.name, {type: payload.type}));
+    const input = document.querySelector('input[type="file"]');
+    if (input) {
+      input.files = transfer.files;
+      input.dispatchEvent(new Event('change', {bubbles: true}));
+      return true;
+    }
+    const el = prompt();
+    if (!el) { return false; }
+    el.focus();
+    el.dispatchEvent(new ClipboardEvent('paste', {clipboardData: transfer, bubbles: true, cancelable: true}));
+    return true;
+  });
+  // Click the first element matching one of the selectors, answering whether one was found.
+  bus.on('page.click', function(payload){
+    for (const sel of payload.selectors) {
+      const el = document.querySelector(sel);
+      if (el) { el.click(); return true; }
+    }
+    return false;
+  });
+  // Open the settings menu (its button matches one of the selectors), then its "Saved info"
+  // entry, answering whether the entry was found.
+  bus.on('page.saved_info', function(payload){
+    let settings = null;
+    for (const sel of payload.selectors) {
+      settings = document.querySelector(sel);
+      if (settings) { break; }
+    }
+    if (!settings) { return false; }
+    settings.click();
+    return new Promise(function(resolve){
+      setTimeout(function(){
+        let link = document.querySelector('a[href*="/saved-info"]');
+        if (!link) {
+          // Fall back to a menu item whose text includes "Saved info".
+          const items = document.querySelectorAll('a[role="menuitem"], button[role="menuitem"]');
+          for (const el of items) {
+            if (el.textContent && el.textContent.trim().toLowerCase().includes('saved info')) { link = el; break; }
+          }
+        }
+        if (link) { link.click(); }
+        resolve(!!link);
+      }, 50);
+    });
+  });
+  function sendBackgroundColor(){
+    bus.send('page.background', window.getComputedStyle(document.body).backgroundColor);
+  }
+  window.addEventListener('load', sendBackgroundColor);
+  // Tell the overlay once the prompt area exists (typing is buffered natively until then).
+  let ready = false, readyObserver = null;
+  function reportReady(){
+    if (ready || !prompt()) { return; }
+    ready = true;
+    if (readyObserver) { readyObserver.disconnect(); }
+    bus.send('page.ready', true);
+  }
+  reportReady();
+  if (!ready) { readyObserver = bus.observe(document.body, { childList: true, subtree: true }, reportReady); }
+  bus.observe(document.body, { attributes: true, attributeFilter: ['style'] }, sendBackgroundColor);
+})();
+"""
+
+
+# The page to load: the "website" setting when it is an http(s) URL (for example a local
+# stand-in, see standin.py), otherwise "default".
+def website_url(setting, default):
+    if not setting:
+        return default
+    parts = urlsplit(setting)
+    if (parts.scheme not in ("http", "https")) or not parts.netloc:
+        print(f"Warning: Ignoring website {setting!r}, it is not an http(s) URL.", flush=True)
+        return default
+    return setting
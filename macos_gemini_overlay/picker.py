@@ -0,0 +1,163 @@
+# Apple libraries
+import objc
+from AppKit import (
+    NSButton,
+    NSColor,
+    NSFont,
+    NSLineBreakByTruncatingTail,
+    NSMakeRect,
+    NSSearchField,
+    NSTextField,
+    NSView,
+)
+from Foundation import NSObject
+
+
+PICKER_WIDTH = 560
+PICKER_ROWS = 8
+ROW_HEIGHT = 42
+FIELD_HEIGHT = 28
+PADDING = 12
+
+
+# Create a non-editable single line label.
+def make_label(frame, font, color):
+    label = NSTextField.alloc().initWithFrame_(frame)
+    label.setBezeled_(False)
+    label.setDrawsBackground_(False)
+    label.setEditable_(False)
+    label.setSelectable_(False)
+    label.setFont_(font)
+    label.setTextColor_(color)
+    label.cell().setLineBreakMode_(NSLineBreakByTruncatingTail)
+    return label
+
+
+# Keyboard driven picker drawn over the overlay: a search field above a list of results.
+# "query(text)" returns a list of (title, subtitle, value) and "choose(value)" is called
+# with the value of the picked row. Results are refreshed on every keystroke.
+class Picker(NSObject):
+    @objc.python_method
+    def setup(self, app, placeholder, query, choose):
+        self.app = app
+        self.placeholder = placeholder
+        self.query = query
+        self.choose = choose
+        self.results = []
+        self.selected = 0
+        self.overlay_view = None
+        return self
+
+    # Build the views, attach them to the window and focus the search field.
+    @objc.python_method
+    def show(self):
+        self.app.showWindow_(None)
+        content_view = self.app.window.contentView()
+        content_bounds = content_view.bounds()
+        # Shade the whole application like the trigger overlay does.
+        self.overlay_view = NSView.alloc().initWithFrame_(content_bounds)
+        self.overlay_view.setWantsLayer_(True)
+        self.overlay_view.layer().setBackgroundColor_(NSColor.colorWithWhite_alpha_(0.0, 0.5).CGColor())
+        container_height = 3 * PADDING + FIELD_HEIGHT + PICKER_ROWS * ROW_HEIGHT
+        container_x = (content_bounds.size.width - PICKER_WIDTH) / 2
+        container_y = max(0, content_bounds.size.height - container_height - 80)
+        container = NSView.alloc().initWithFrame_(NSMakeRect(container_x, container_y, PICKER_WIDTH, container_height))
+        container.setWantsLayer_(True)
+        container.layer().setBackgroundColor_(self.app.drag_area.layer().backgroundColor())
+        container.layer().setCornerRadius_(10)
+        # Search field along the top of the container.
+        self.field = NSSearchField.alloc().initWithFrame_(
+            NSMakeRect(PADDING, container_height - PADDING - FIELD_HEIGHT, PICKER_WIDTH - 2 * PADDING, FIELD_HEIGHT)
+        )
+        self.field.setPlaceholderString_(self.placeholder)
+        self.field.setFont_(NSFont.systemFontOfSize_(15))
+        self.field.setDelegate_(self)
+        container.addSubview_(self.field)
+        # Result rows (highlight layer, two labels, and an invisible button for clicks).
+        self.rows = []
+        for i in range(PICKER_ROWS):
+            y = container_height - 2 * PADDING - FIELD_HEIGHT - (i + 1) * ROW_HEIGHT
+            row = NSView.alloc().initWithFrame_(NSMakeRect(PADDING, y, PICKER_WIDTH - 2 * PADDING, ROW_HEIGHT))
+            row.setWantsLayer_(True)
+            row.layer().setCornerRadius_(6)
+            title = make_label(NSMakeRect(8, ROW_HEIGHT - 22, PICKER_WIDTH - 2 * PADDING - 16, 18),
+                               NSFont.boldSystemFontOfSize_(13), NSColor.labelColor())
+            subtitle = make_label(NSMakeRect(8, 4, PICKER_WIDTH - 2 * PADDING - 16, 16),
+                                  NSFont.systemFontOfSize_(11), NSColor.secondaryLabelColor())
+            button = NSButton.alloc().initWithFrame_(row.bounds())
+            button.setBordered_(False)
+            button.setTransparent_(True)
+            button.setTag_(i)
+            button.setTarget_(self)
+            button.setAction_("rowClicked:")
+            row.addSubview_(title)
+            row.addSubview_(subtitle)
+            row.addSubview_(button)
+            container.addSubview_(row)
+            self.rows.append((row, title, subtitle))
+        self.overlay_view.addSubview_(container)
+        content_view.addSubview_(self.overlay_view)
+        self.app.window.makeFirstResponder_(self.field)
+        self.refresh()
+
+    # Remove the picker and return focus to the page.
+    @objc.python_method
+    def close(self):
+        if self.overlay_view is not None:
+            self.overlay_view.removeFromSuperview()
+            self.overlay_view = None
+            self.app.window.makeFirstResponder_(self.app.webview)
+
+    # Re-run the query for the current text and redraw the rows.
+    @objc.python_method
+    def refresh(self):
+        try:
+            self.results = list(self.query(self.field.stringValue()))[:PICKER_ROWS]
+        except Exception as e:
+            print("Warning: Picker query failed:", e, flush=True)
+            self.results = []
+        self.selected = min(self.selected, max(0, len(self.results) - 1))
+        self.redraw()
+
+    @objc.python_method
+    def redraw(self):
+        highlight = NSColor.controlAccentColor().colorWithAlphaComponent_(0.35).CGColor()
+        for (i, (row, title, subtitle)) in enumerate(self.rows):
+            row.setHidden_(i >= len(self.results))
+            if i < len(self.results):
+                title.setStringValue_(self.results[i][0])
+                subtitle.setStringValue_(self.results[i][1])
+                row.layer().setBackgroundColor_(highlight if i == self.selected else None)
+
+    # Close the picker and hand the chosen value to the callback.
+    @objc.python_method
+    def pick(self, index):
+        if 0 <= index < len(self.results):
+            value = self.results[index][2]
+            self.close()
+            self.choose(value)
+
+    def rowClicked_(self, sender):
+        self.pick(sender.tag())
+
+    # NSSearchField delegate – called for every edit of the search text.
+    def controlTextDidChange_(self, notification):
+        self.selected = 0
+        self.refresh()
+
+    # NSSearchField delegate – arrow keys move the selection, Return picks, Escape closes.
+    def control_textView_doCommandBySelector_(self, control, text_view, selector):
+        name = selector.decode() if isinstance(selector, bytes) else str(selector)
+        if name == "moveDown:":
+            self.selected = min(self.selected + 1, max(0, len(self.results) - 1))
+            self.redraw()
+        elif name == "moveUp:":
+            self.selected = max(self.selected - 1, 0)
+            self.redraw()
+        elif name == "insertNewline:":
+            self.pick(self.selected)
+        elif name == "cancelOperation:":
+            self.close()
+        else:
+            return False
+        return True
@@ -0,0 +1,191 @@
+# Python libraries
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+from collections import namedtuple
+
+# This module only uses the standard library, so that it can be imported (and started)
+# before the Apple frameworks and be used on any platform.
+
+# Command line flag and environment variable (for the launch agent) that enable profiling.
+PROFILE_FLAG = "--profile-startup"
+PROFILE_ENV = "MACOS_CLAUDE_OVERLAY_PROFILE_STARTUP"
+# Names of the output files written into the profile directory.
+PHASES_FILE = "startup_phases.txt"
+PROFILE_FILE = "startup.prof"
+SPEEDSCOPE_FILE = "startup.speedscope.json"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+# Call paths deeper than this are cut off when converting to speedscope.
+MAX_STACK_DEPTH = 96
+# Call paths carrying less time than this (seconds) are dropped when converting.
+MIN_PATH_SECONDS = 1e-6
+
+Phase = namedtuple("Phase", ["name", "start", "end"])
+
+
+# True if startup profiling was requested on the command line or in the environment.
+def profiling_requested(argv=None, environ=None):
+    argv = sys.argv[1:] if argv is None else argv
+    environ = os.environ if environ is None else environ
+    value = environ.get(PROFILE_ENV, "").strip().lower()
+    return (PROFILE_FLAG in argv) or (value not in ("", "0", "false", "no", "off"))
+
+
+# Records named startup phases (and optionally a cProfile profile) between "start" and
+# "finish". Phases are either timed with the "phase" context manager or, when they begin
+# and end in different callbacks, with "begin" and "end". Does nothing until started.
+class PhaseRecorder:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.enabled = False
+        self.finished = False
+        self.origin = None
+        self.stopped = None
+        self.phases = []
+        self.open = {}
+        self.profiler = None
+
+    # Start recording (the origin of all phase times is now).
+    def start(self, profile=True):
+        if self.enabled or self.finished:
+            return
+        self.enabled = True
+        self.origin = self.clock()
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def begin(self, name):
+        if self.enabled:
+            self.open[name] = self.clock()
+
+    def end(self, name):
+        if self.enabled and (name in self.open):
+            self.phases.append(Phase(name, self.open.pop(name) - self.origin, self.clock() - self.origin))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    # Stop recording. Phases still open are closed now and marked as unfinished.
+    # Returns False if recording was not running.
+    def finish(self):
+        if not self.enabled:
+            return False
+        if self.profiler is not None:
+            self.profiler.disable()
+        for name in list(self.open):
+            self.end(name)
+            self.phases[-1] = self.phases[-1]._replace(name=name + " (unfinished)")
+        self.stopped = self.clock() - self.origin
+        self.enabled = False
+        self.finished = True
+        return True
+
+    # Human readable table of the phases in start order.
+    def table(self):
+        total = self.stopped if self.stopped is not None else max((p.end for p in self.phases), default=0.0)
+        width = max([len(p.name) for p in self.phases] + [5])
+        lines = [f"{'Phase':<{width}}  {'Start ms':>9}  {'Duration ms':>11}  {'Share':>6}"]
+        for p in sorted(self.phases, key=lambda p: p.start):
+            share = (p.end - p.start) / total * 100 if total else 0.0
+            lines.append(f"{p.name:<{width}}  {p.start * 1000:9.1f}  {(p.end - p.start) * 1000:11.1f}  {share:5.1f}%")
+        lines.append(f"{'Total':<{width}}  {0.0:9.1f}  {total * 1000:11.1f}  {100.0:5.1f}%")
+        return "\n".join(lines)
+
+    # Write the phase table, the cProfile dump and its speedscope conversion into
+    # "directory". Returns the paths written.
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, PHASES_FILE)]
+        with open(paths[0], "w") as f:
+            f.write(self.table() + "\n")
+        if self.profiler is not None:
+            paths.append(os.path.join(directory, PROFILE_FILE))
+            self.profiler.dump_stats(paths[-1])
+            paths.append(os.path.join(directory, SPEEDSCOPE_FILE))
+            with open(paths[-1], "w") as f:
+                json.dump(stats_to_speedscope(pstats.Stats(self.profiler), name="Startup"), f)
+        return paths
+
+
+# Readable frame for a pstats function key (file, line, name).
+def frame_for(key):
+    file, line, name = key
+    if file == "~":
+        return {"name": name}
+    return {"name": name, "file": file, "line": line}
+
+
+# Convert pstats statistics into a speedscope "sampled" profile. cProfile only keeps
+# caller/callee totals, not full stacks, so stacks are rebuilt from the roots down: the
+# time of a function reached along a path is split between its own time and its callees
+# in proportion to the totals recorded for each call edge. Recursive edges are skipped.
+def stats_to_speedscope(stats, name="Profile"):
+    raw = stats.stats
+    callees = {}
+    for (callee, (_, _, _, _, callers)) in raw.items():
+        for (caller, edge) in callers.items():
+            callees.setdefault(caller, []).append((callee, edge[3]))
+    frames, frame_index = [], {}
+    samples, weights = [], []
+    def index_of(key):
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            frames.append(frame_for(key))
+        return frame_index[key]
+    roots = [key for (key, value) in raw.items() if not value[4]]
+    # Each entry is (function, time reaching it along this path, stack of frame indexes).
+    work = [(key, raw[key][3], (index_of(key),)) for key in roots]
+    while work:
+        key, seconds, stack = work.pop()
+        _, _, own, total, _ = raw[key]
+        fraction = min(seconds / total, 1.0) if total > 0 else 0.0
+        if own * fraction >= MIN_PATH_SECONDS:
+            samples.append(list(stack))
+            weights.append(own * fraction)
+        for (callee, edge_total) in callees.get(key, ()):
+            child_seconds = edge_total * fraction
+            if child_seconds < MIN_PATH_SECONDS:
+                continue
+            child = index_of(callee)
+            if (child in stack) or (len(stack) >= MAX_STACK_DEPTH):
+                continue
+            work.append((callee, child_seconds, stack + (child,)))
+    end = sum(weights)
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "exporter": "macos-claude-overlay",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": end,
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+# The recorder used for the startup of this process.
+RECORDER = PhaseRecorder()
+
+
+# Convert a saved cProfile dump into speedscope format.
+#   python3 -m macos_gemini_overlay.profiling startup.prof > startup.speedscope.json
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <cProfile dump>", file=sys.stderr)
+        sys.exit(2)
+    json.dump(stats_to_speedscope(pstats.Stats(sys.argv[1]), name=os.path.basename(sys.argv[1])), sys.stdout)
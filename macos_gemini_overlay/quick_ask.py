@@ -0,0 +1,134 @@
+# Python libraries
+from urllib.parse import (
+    parse_qsl,
+    urlencode,
+    urlsplit,
+    urlunsplit,
+)
+
+
+# Message bus type the page sends once its prompt area exists.
+READY_MESSAGE = "page.ready"
+
+IDLE, BUFFERING, HANDING_OFF = "idle", "buffering", "handing_off"
+
+
+# The landing page with "text" prefilled in its prompt (used when the page never got ready).
+def prefill_url(website, text):
+    parts = urlsplit(website)
+    query = [(k, v) for (k, v) in parse_qsl(parts.query) if k != "q"] + [("q", text)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+# Buffers typing in a native field while the page prompt does not exist yet, and hands it
+# over in one call once the page reports it is ready.
+#   idle        -> buffering    on summon() while the page is not ready (show the field)
+#   buffering   -> handing_off  on page_ready(), or on submit() if the page is already ready
+#   handing_off -> idle         when the insert succeeded (hide the field); text typed while
+#                               it was in flight is handed over in a second round first
+#   buffering / handing_off -> idle   falling back to "fallback(text, submit)" when the
+#                               insert failed, or when a submitted buffer is still waiting
+#                               for the page "ready_timeout" seconds after submit()
+# "insert(text, submit, done)" moves text into the page prompt (pressing send if "submit")
+# and calls "done(ok)"; "close(handed_off)" hides the field; "call_later(delay, fn)" runs timers.
+class QuickAsk:
+    def __init__(self, insert, fallback, close, call_later, ready_timeout=10.0):
+        self.insert = insert
+        self.fallback = fallback
+        self.close = close
+        self.call_later = call_later
+        self.ready_timeout = ready_timeout
+        self.state = IDLE
+        self.ready = False
+        self.text = ""
+        self.sent = ""
+        self.submitted = False
+        self.submit_sent = False
+        self.generation = 0
+
+    # Whether the native field should be shown for this summon.
+    def summon(self):
+        if self.state != IDLE:
+            return True
+        if self.ready:
+            return False
+        self.state = BUFFERING
+        self.generation += 1
+        self._clear()
+        return True
+
+    # The field contents changed.
+    def typed(self, text):
+        if self.state != IDLE:
+            self.text = text
+
+    # Enter was pressed in the field.
+    def submit(self):
+        if self.state == IDLE:
+            return
+        self.submitted = True
+        if self.state == BUFFERING:
+            if self.ready:
+                self._hand_off()
+            else:
+                generation = self.generation
+                self.call_later(self.ready_timeout, lambda: self._timed_out(generation))
+
+    # Escape was pressed in the field: drop the buffer.
+    def cancel(self):
+        if self.state == BUFFERING:
+            self._finish(False)
+
+    # The page reported that its prompt area exists.
+    def page_ready(self):
+        self.ready = True
+        if self.state == BUFFERING:
+            self._hand_off()
+
+    # The page is being replaced (a full navigation); its prompt is gone until it reports again.
+    def page_unloaded(self):
+        self.ready = False
+
+    def _hand_off(self):
+        pending = self._pending()
+        submit = self.submitted and not self.submit_sent
+        if not pending and not submit:
+            self._finish(True)
+            return
+        self.state = HANDING_OFF
+        generation = self.generation
+        sent = self.text
+        self.insert(pending, submit, lambda ok: self._inserted(generation, sent, submit, ok))
+
+    # Text not yet moved into the page.
+    def _pending(self):
+        if self.text.startswith(self.sent):
+            return self.text[len(self.sent):]
+        # Edited before what was already sent; only appending can be handed over.
+        return ""
+
+    def _inserted(self, generation, sent, submit, ok):
+        if (generation != self.generation) or (self.state != HANDING_OFF):
+            return
+        if not ok:
+            self.fallback(self.text, self.submitted)
+            self._finish(False)
+            return
+        self.sent = sent
+        self.submit_sent = self.submit_sent or submit
+        self._hand_off()
+
+    def _timed_out(self, generation):
+        if (generation == self.generation) and (self.state == BUFFERING) and self.submitted:
+            self.fallback(self.text, True)
+            self._finish(False)
+
+    def _clear(self):
+        self.text, self.sent = "", ""
+        self.submitted, self.submit_sent = False, False
+
+    def _finish(self, handed_off):
+        self.state = IDLE
+        self.generation += 1
+        self._clear()
+        self.close(handed_off)
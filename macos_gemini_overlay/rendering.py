@@ -0,0 +1,367 @@
+# Python libraries
+import json
+import time
+
+# Local libraries
+from .search_index import MESSAGE_SELECTOR
+
+
+# Message bus types: the page reports its size, the overlay turns the mode on or off,
+# measures the page, and expands collapsed messages (all of them, or those matching text).
+STATS_MESSAGE = "render.stats"
+CONFIGURE_MESSAGE = "render.configure"
+MEASURE_MESSAGE = "render.measure"
+EXPAND_MESSAGE = "render.expand"
+# Class names used by the injected style sheet.
+VISIBILITY_CLASS = "__overlay-cv"
+PLACEHOLDER_CLASS = "__overlay-collapsed"
+# Characters that could end a selector inside the style sheet or the script.
+FORBIDDEN_SELECTOR_CHARACTERS = "{};<>\\"
+# Injected at document end (opt-in). Reports the number of messages whenever it changes,
+# and while enabled:
+#   - gives all but the newest "keep" messages "content-visibility: auto", so the browser
+#     skips their layout and painting while they are off-screen;
+#   - collapses those of them that are further than "margin" viewport heights away into
+#     empty placeholders of the same height (their nodes are kept aside, so the live DOM
+#     shrinks), and restores them when they come near the viewport again;
+#   - restores collapsed messages before find in page (Command+F), printing, and on
+#     request (with a text to look for, scrolling to the first match).
+RENDERING_SCRIPT = """
+(function(){
+  const bus = window.__overlayBus;
+  if (!bus || window.__overlayRendering) { return; }
+  const STATS = %s, CONFIGURE = %s, MEASURE = %s, EXPAND = %s;
+  const VISIBLE = %s, PLACEHOLDER = %s;
+  let config = null, observer = null, timer = null, reported = -1;
+  const tracked = new Set(), collapsed = new Map();
+  const style = document.createElement('style');
+  style.textContent = '.' + VISIBLE + ' { content-visibility: auto; contain-intrinsic-size: auto 400px; }' +
+    ' .' + PLACEHOLDER + ' { overflow: hidden; }';
+  function messages(selector){
+    try { return Array.from(document.querySelectorAll(selector || (config && config.selector) || %s)); }
+    catch (e) { return []; }
+  }
+  function collapse(el, height){
+    if (collapsed.has(el) || !height) { return; }
+    const text = el.innerText || '';
+    const nodes = document.createDocumentFragment();
+    while (el.firstChild) { nodes.appendChild(el.firstChild); }
+    collapsed.set(el, {nodes: nodes, text: text, height: el.style.height});
+    el.style.height = height + 'px';
+    el.classList.add(PLACEHOLDER);
+  }
+  function expand(el){
+    const saved = collapsed.get(el);
+    if (!saved) { return false; }
+    collapsed.delete(el);
+    el.appendChild(saved.nodes);
+    el.style.height = saved.height;
+    el.classList.remove(PLACEHOLDER);
+    return true;
+  }
+  function expandAll(){
+    let count = 0;
+    Array.from(collapsed.keys()).forEach(function(el){ count += expand(el) ? 1 : 0; });
+    return count;
+  }
+  function onIntersection(entries){
+    entries.forEach(function(entry){
+      if (entry.isIntersecting) { expand(entry.target); }
+      else if (entry.target.isConnected) { collapse(entry.target, entry.boundingClientRect.height); }
+    });
+  }
+  // Track the messages that are old enough (and release those that no longer are).
+  function apply(){
+    const list = messages();
+    const old = new Set(list.slice(0, Math.max(0, list.length - config.keep)));
+    tracked.forEach(function(el){
+      if (!old.has(el) || !el.isConnected) {
+        tracked.delete(el);
+        observer.unobserve(el);
+        expand(el);
+        el.classList.remove(VISIBLE);
+      }
+    });
+    old.forEach(function(el){
+      if (tracked.has(el)) { return; }
+      tracked.add(el);
+      el.classList.add(VISIBLE);
+      if (config.collapse) { observer.observe(el); }
+    });
+    collapsed.forEach(function(saved, el){ if (!el.isConnected) { collapsed.delete(el); } });
+  }
+  function disable(){
+    if (observer) { observer.disconnect(); observer = null; }
+    expandAll();
+    tracked.forEach(function(el){ el.classList.remove(VISIBLE); });
+    tracked.clear();
+    style.remove();
+    config = null;
+  }
+  function changed(){
+    timer = null;
+    const count = messages().length;
+    if (count !== reported) {
+      reported = count;
+      bus.send(STATS, {messages: count, url: location.origin + location.pathname});
+    }
+    if (config) { apply(); }
+  }
+  function schedule(){ if (!timer) { timer = setTimeout(changed, 500); } }
+  bus.on(CONFIGURE, function(payload){
+    disable();
+    if (payload && payload.enabled) {
+      config = payload;
+      document.documentElement.appendChild(style);
+      observer = new IntersectionObserver(onIntersection, {rootMargin: (100 * config.margin) + '%% 0px'});
+      apply();
+    }
+    return {messages: messages().length, tracked: tracked.size};
+  });
+  bus.on(EXPAND, function(payload){
+    const query = (payload && payload.text || '').toLowerCase();
+    if (!query) { return expandAll(); }
+    let first = null, count = 0;
+    Array.from(collapsed.entries()).forEach(function(pair){
+      if (pair[1].text.toLowerCase().indexOf(query) >= 0 && expand(pair[0])) {
+        count += 1;
+        first = first || pair[0];
+      }
+    });
+    if (first) { first.scrollIntoView({block: 'center'}); }
+    return count;
+  });
+  // The element that scrolls the conversation (the nearest scrollable ancestor of a message).
+  function scroller(){
+    const list = messages();
+    for (let el = list.length ? list[list.length - 1].parentElement : null; el; el = el.parentElement) {
+      const overflow = getComputedStyle(el).overflowY;
+      if ((overflow === 'auto' || overflow === 'scroll') && el.scrollHeight > el.clientHeight) { return el; }
+    }
+    return document.scrollingElement;
+  }
+  // DOM size and frame times over "duration" milliseconds (while scrolling the
+  // conversation from top to bottom if "scroll" is set; the position is restored).
+  bus.on(MEASURE, function(payload){
+    payload = payload || {};
+    const duration = payload.duration || 1000;
+    const target = payload.scroll ? scroller() : null;
+    const top = target ? target.scrollTop : 0;
+    return new Promise(function(resolve){
+      const frames = [];
+      let start = null, last = null, done = false;
+      function finish(){
+        if (done) { return; }
+        done = true;
+        if (target) { target.scrollTop = top; }
+        frames.sort(function(a, b){ return a - b; });
+        const total = frames.reduce(function(a, b){ return a + b; }, 0);
+        resolve({
+          nodes: document.getElementsByTagName('*').length,
+          messages: messages().length,
+          collapsed: collapsed.size,
+          frames: frames.length,
+          mean_ms: frames.length ? total / frames.length : 0,
+          p95_ms: frames.length ? frames[Math.min(frames.length - 1, Math.floor(0.95 * frames.length))] : 0,
+          slow_frames: frames.filter(function(t){ return t > 25; }).length
+        });
+      }
+      function frame(now){
+        if (done) { return; }
+        if (start === null) { start = now; } else { frames.push(now - last); }
+        last = now;
+        if (target) { target.scrollTop = (target.scrollHeight - target.clientHeight) * Math.min(1, (now - start) / duration); }
+        if (now - start < duration) { requestAnimationFrame(frame); } else { finish(); }
+      }
+      requestAnimationFrame(frame);
+      // No frames are drawn while the page is hidden.
+      setTimeout(finish, duration + 500);
+    });
+  });
+  window.addEventListener('keydown', function(event){
+    if ((event.metaKey || event.ctrlKey) && (event.key === 'f' || event.key === 'F')) { expandAll(); }
+  }, true);
+  window.addEventListener('beforeprint', expandAll);
+  window.__overlayRendering = {
+    // Text of a message, also while it is collapsed (for other injected scripts).
+    text: function(el){ const saved = collapsed.get(el); return saved ? saved.text : el.innerText; },
+    expandAll: expandAll
+  };
+  bus.observe(document.body, {childList: true, subtree: true}, schedule);
+  schedule();
+})();
+""" % tuple(json.dumps(value) for value in (
+    STATS_MESSAGE, CONFIGURE_MESSAGE, MEASURE_MESSAGE, EXPAND_MESSAGE,
+    VISIBILITY_CLASS, PLACEHOLDER_CLASS, MESSAGE_SELECTOR,
+))
+
+OFF, MEASURING, ON = "off", "measuring", "on"
+
+
+# Split a selector list at its top level commas (not those inside brackets, parentheses
+# or quotes).
+def split_selectors(text):
+    parts, depth, quote, current = [], 0, None, []
+    for c in text:
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+        elif c in "([":
+            depth += 1
+        elif c in ")]":
+            depth = max(0, depth - 1)
+        elif c == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(c)
+    parts.append("".join(current).strip())
+    return parts
+
+
+# Check a message selector list from the settings, returning it normalized. Raises
+# ValueError for empty entries, unbalanced quotes or brackets, and characters that do
+# not belong in a selector.
+def validate_selector(text):
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("The message selector is empty")
+    bad = sorted(set(c for c in text if c in FORBIDDEN_SELECTOR_CHARACTERS))
+    if bad:
+        raise ValueError(f"The message selector contains {''.join(bad)!r}")
+    for (opening, closing) in ("()", "[]"):
+        if text.count(opening) != text.count(closing):
+            raise ValueError(f"Unbalanced {opening}{closing} in the message selector")
+    if (text.count('"') % 2) or (text.count("'") % 2):
+        raise ValueError("Unbalanced quotes in the message selector")
+    parts = split_selectors(text)
+    if not all(parts):
+        raise ValueError("The message selector has an empty entry")
+    return ", ".join(parts)
+
+
+# Payload that enables the mode on the page (the selector falls back to the default when
+# invalid).
+def render_config(selector="", keep=10, margin=2.0, collapse=True):
+    try:
+        selector = validate_selector(selector) if selector else MESSAGE_SELECTOR
+    except ValueError as e:
+        print("Warning: Using the default message selector:", e, flush=True)
+        selector = MESSAGE_SELECTOR
+    return {
+        "enabled": True,
+        "selector": selector,
+        "keep": max(0, int(keep)),
+        "margin": max(0.0, float(margin)),
+        "collapse": bool(collapse),
+    }
+
+
+# Relative change from "before" to "after", in percent.
+def change(before, after):
+    return 100.0 * (after - before) / before if before else 0.0
+
+
+# Turns the long conversation mode on for pages with at least "threshold" messages, and
+# off again below half of that (so a conversation near the threshold does not flip).
+# "request(type, payload, callback, timeout)" talks to the page (the message bus) and
+# "call_later(delay, fn)" waits for the page to settle.
+#   off       -> measuring   the page reports "threshold" messages: it is measured first
+#                            (only once per conversation)
+#   measuring -> on          the mode is applied, and the page measured again "settle"
+#                            seconds later; both measurements are kept in "comparisons"
+#   on        -> off         the page reports fewer than half the threshold, or a new page
+#                            loads (page_unloaded)
+class LongConversationMode:
+    def __init__(self, request, call_later, threshold=40, config=None, settle=2.0,
+                 measure_scroll=False, clock=time.monotonic):
+        self.request = request
+        self.call_later = call_later
+        self.threshold = max(1, int(threshold))
+        self.config = render_config() if config is None else config
+        self.settle = settle
+        self.measure_scroll = measure_scroll
+        self.clock = clock
+        self.state = OFF
+        self.generation = 0
+        self.url = None
+        self.measured = set()
+        self.comparisons = []
+        self.activations = 0
+
+    # The page reports its message count (a STATS_MESSAGE payload).
+    def page_stats(self, payload):
+        count = int(payload.get("messages", 0))
+        self.url = payload.get("url")
+        if (self.state == OFF) and (count >= self.threshold):
+            self._start()
+        elif (self.state != OFF) and (count < self.threshold // 2):
+            self.generation += 1
+            self.state = OFF
+            self.request(CONFIGURE_MESSAGE, {"enabled": False}, self._configured, None)
+
+    # A new page replaced the old one (its script starts disabled).
+    def page_unloaded(self):
+        self.generation += 1
+        self.state = OFF
+
+    def _start(self):
+        self.generation += 1
+        generation = self.generation
+        if self.url in self.measured:
+            self.state = ON
+            self.activations += 1
+            self.request(CONFIGURE_MESSAGE, self.config, self._configured, None)
+            return
+        self.measured.add(self.url)
+        self.state = MEASURING
+        self._measure(lambda before: self._enable(generation, before))
+
+    # Measure the page, calling "done(result)" (None on failure).
+    def _measure(self, done):
+        payload = {"duration": 1000, "scroll": self.measure_scroll}
+        def measured(result, error):
+            if error:
+                print("Warning: Could not measure the page:", error, flush=True)
+            done(None if error else result)
+        self.request(MEASURE_MESSAGE, payload, measured, 5.0)
+
+    def _enable(self, generation, before):
+        if (generation != self.generation) or (self.state != MEASURING):
+            return
+        self.state = ON
+        self.activations += 1
+        started = self.clock()
+        def configured(result, error):
+            self._configured(result, error)
+            if (error is None) and (before is not None):
+                self.call_later(self.settle, lambda: self._measure(
+                    lambda after: self._compare(generation, before, after, self.clock() - started)))
+        self.request(CONFIGURE_MESSAGE, self.config, configured, None)
+
+    def _configured(self, result, error):
+        if error:
+            print("Warning: Could not configure long conversation mode:", error, flush=True)
+
+    def _compare(self, generation, before, after, elapsed):
+        if (generation != self.generation) or (after is None):
+            return
+        self.comparisons.append((before, after))
+        print(f"Long conversation mode after {elapsed:.1f} s: {format_comparison(before, after)}", flush=True)
+
+    # Short line for the status bar menu.
+    def summary_line(self):
+        if not self.comparisons:
+            return f"Long conversations: {self.state}, applied {self.activations} times"
+        before, after = self.comparisons[-1]
+        return f"Long conversations: {self.state}, last {format_comparison(before, after)}"
+
+
+# One line comparing two page measurements.
+def format_comparison(before, after):
+    text = (f"DOM nodes {before['nodes']:,} -> {after['nodes']:,} ({change(before['nodes'], after['nodes']):+.0f}%),"
+            f" {after['collapsed']} of {after['messages']} messages collapsed")
+    if before.get("frames") and after.get("frames"):
+        text += f", frame p95 {before['p95_ms']:.1f} -> {after['p95_ms']:.1f} ms"
+    return text
@@ -0,0 +1,259 @@
+# Python libraries
+import argparse
+import random
+import struct
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+# Local libraries
+from .hotkeys import (
+    MODIFIER_BITS,
+    HotkeyManager,
+)
+
+# Record key presses seen by the hotkey backend into a compact binary trace, and replay
+# traces (recorded or synthetic) through HotkeyManager.dispatch to measure its cost.
+# Traces are anonymous: only the time since the previous key, the key code and the
+# modifier keys are kept, never characters.
+#
+# File layout: TRACE_MAGIC, then one record per key press packed as RECORD_FORMAT:
+#   microseconds since the previous record (uint32, saturating), key code (uint16),
+#   modifiers (uint8, one bit per entry of MODIFIER_BITS).
+
+TRACE_MAGIC = b"MCOKEYS1"
+RECORD_FORMAT = struct.Struct("<IHB")
+MAX_DELTA = 0xFFFFFFFF
+# Records buffered in memory before they are written out.
+FLUSH_EVERY = 256
+# Bindings used when replaying from the command line (the defaults of the application,
+# plus a two chord sequence so that the prefix matching is exercised).
+OPTION, CONTROL, COMMAND = MODIFIER_BITS[2][0], MODIFIER_BITS[1][0], MODIFIER_BITS[3][0]
+DEFAULT_BINDINGS = {
+    "launcher": {"flags": OPTION, "key": 49},
+    "screenshot": {"flags": CONTROL | OPTION, "key": 1},
+    "sequence": [{"flags": COMMAND, "key": 40}, {"flags": COMMAND, "key": 8}],
+}
+
+
+# CGEventFlags modifier bits to the compact modifier byte, and back.
+def pack_modifiers(flags):
+    return sum(1 << i for (i, (bit, _)) in enumerate(MODIFIER_BITS) if flags & bit)
+
+
+def unpack_modifiers(packed):
+    return sum(bit for (i, (bit, _)) in enumerate(MODIFIER_BITS) if packed & (1 << i))
+
+
+# Appends key presses to a trace file, buffering them so recording stays cheap.
+class TraceWriter:
+    def __init__(self, path, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(TRACE_MAGIC)
+        self.last = None
+        self.buffer = []
+        self.count = 0
+
+    # Record one key press (the signature of a HotkeyManager recorder).
+    def record(self, flags, key):
+        now = self.clock()
+        delta = 0 if self.last is None else min(MAX_DELTA, int((now - self.last) * 1e6))
+        self.last = now
+        self.buffer.append(RECORD_FORMAT.pack(delta, key & 0xFFFF, pack_modifiers(flags)))
+        self.count += 1
+        if len(self.buffer) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(b"".join(self.buffer))
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+# Read a trace as a list of (seconds since the first key, flags, key).
+def read_trace(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(TRACE_MAGIC):
+        raise ValueError(f"{path} is not a key trace")
+    body = memoryview(data)[len(TRACE_MAGIC):]
+    usable = len(body) - len(body) % RECORD_FORMAT.size
+    events, now = [], 0.0
+    for (delta, key, packed) in RECORD_FORMAT.iter_unpack(body[:usable]):
+        now += delta / 1e6
+        events.append((now, unpack_modifiers(packed), key))
+    return events
+
+
+# Write events (as returned by read_trace) to a new trace file.
+def write_trace(path, events):
+    with open(path, "wb") as f:
+        f.write(TRACE_MAGIC)
+        last = None
+        for (t, flags, key) in events:
+            delta = 0 if last is None else min(MAX_DELTA, max(0, int(round((t - last) * 1e6))))
+            last = t
+            f.write(RECORD_FORMAT.pack(delta, key & 0xFFFF, pack_modifiers(flags)))
+
+
+# Synthetic typing at "rate" keys per second: mostly plain and shifted letters, some
+# shortcuts, and a "hit_rate" share of presses of the bound chords and sequences.
+def synthetic_trace(count, rate=10000.0, bindings=DEFAULT_BINDINGS, hit_rate=0.01, seed=0):
+    rng = random.Random(seed)
+    chords = []
+    for trigger in bindings.values():
+        chords.append([trigger] if isinstance(trigger, dict) else list(trigger))
+    shift, everything = MODIFIER_BITS[0][0], [bit for (bit, _) in MODIFIER_BITS]
+    events, t = [], 0.0
+    while len(events) < count:
+        t += rng.expovariate(rate)
+        if chords and rng.random() < hit_rate:
+            for chord in rng.choice(chords):
+                events.append((t, chord["flags"], chord["key"]))
+                t += 0.5 / rate
+            continue
+        roll = rng.random()
+        if roll < 0.85:
+            flags = 0
+        elif roll < 0.95:
+            flags = shift
+        else:
+            flags = rng.choice(everything) | rng.choice((0, shift))
+        events.append((t, flags, rng.randrange(0, 51)))
+    return events[:count]
+
+
+# Minimal stand-in for the CGEvent a backend passes along with each key press.
+class StubEvent:
+    __slots__ = ("flags", "key", "timestamp")
+
+    def __init__(self, flags, key, timestamp):
+        self.flags = flags
+        self.key = key
+        self.timestamp = timestamp
+
+
+# Clock for the hotkey manager that follows the trace timestamps (so sequence timeouts
+# behave as they did when recorded, at any replay speed).
+class TraceClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# A hotkey manager with "bindings" whose callbacks count the actions they trigger.
+def counting_manager(bindings, clock):
+    actions = Counter()
+    manager = HotkeyManager([], clock=clock)
+    for (name, trigger) in bindings.items():
+        manager.bind(name, trigger, lambda name=name: actions.update((name,)))
+    return manager, actions
+
+
+# Feed "events" through HotkeyManager.dispatch and measure it. A first pass times every
+# call; a second pass runs under tracemalloc to report the memory the dispatcher
+# allocates (its peak and what it keeps). Returns a dictionary of results.
+def replay(events, bindings=DEFAULT_BINDINGS):
+    stubs = [StubEvent(flags, key, t) for (t, flags, key) in events]
+    clock = TraceClock()
+    manager, actions = counting_manager(bindings, clock)
+    dispatch, timer = manager.dispatch, time.perf_counter_ns
+    costs = []
+    consumed = 0
+    for stub in stubs:
+        clock.now = stub.timestamp
+        start = timer()
+        handled = dispatch(stub.flags, stub.key, stub)
+        costs.append(timer() - start)
+        consumed += bool(handled)
+    # Allocation pass on a fresh manager (tracemalloc would distort the timings).
+    clock = TraceClock()
+    manager, _ = counting_manager(bindings, clock)
+    dispatch = manager.dispatch
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for stub in stubs:
+        clock.now = stub.timestamp
+        dispatch(stub.flags, stub.key, stub)
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = [s for s in after.compare_to(before, "filename") if "hotkeys.py" in s.traceback[0].filename]
+    costs.sort()
+    total = sum(costs)
+    duration = events[-1][0] - events[0][0] if len(events) > 1 else 0.0
+    return {
+        "events": len(events),
+        "trace_rate": len(events) / duration if duration else 0.0,
+        "mean_ns": total / max(1, len(costs)),
+        "p50_ns": percentile(costs, 0.50),
+        "p99_ns": percentile(costs, 0.99),
+        "max_ns": costs[-1] if costs else 0,
+        "throughput": len(costs) / (total / 1e9) if total else 0.0,
+        "consumed": consumed,
+        "actions": dict(actions),
+        "peak_bytes": peak,
+        "retained_blocks": sum(s.count_diff for s in retained),
+        "retained_bytes": sum(s.size_diff for s in retained),
+    }
+
+
+# Value at fraction "q" of sorted "values".
+def percentile(values, q):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# Readable report of replay results.
+def format_report(results):
+    actions = ", ".join(f"{name} {count}" for (name, count) in sorted(results["actions"].items())) or "none"
+    return "\n".join([
+        f"Events:          {results['events']} (trace rate {results['trace_rate']:,.0f}/s)",
+        f"Dispatch cost:   mean {results['mean_ns']:,.0f} ns, p50 {results['p50_ns']:,} ns,"
+        f" p99 {results['p99_ns']:,} ns, max {results['max_ns']:,} ns",
+        f"Throughput:      {results['throughput']:,.0f} events/s",
+        f"Consumed keys:   {results['consumed']}",
+        f"Matched actions: {actions}",
+        f"Allocations:     peak {results['peak_bytes']:,} bytes,"
+        f" retained {results['retained_blocks']} blocks / {results['retained_bytes']:,} bytes",
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay key traces through the hotkey dispatcher and report its cost.")
+    parser.add_argument("trace", nargs="?", help="trace recorded with the \"keystroke_trace\" setting (omit for a synthetic trace)")
+    parser.add_argument("--events", type=int, default=100000, help="number of synthetic key presses")
+    parser.add_argument("--rate", type=float, default=10000.0, help="synthetic key presses per second")
+    parser.add_argument("--hit-rate", type=float, default=0.01, help="share of synthetic presses that are bound chords")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="also write the synthetic trace to this file")
+    args = parser.parse_args(argv)
+    if args.trace:
+        events = read_trace(args.trace)
+    else:
+        events = synthetic_trace(args.events, args.rate, hit_rate=args.hit_rate, seed=args.seed)
+        if args.save:
+            write_trace(args.save, events)
+    if not events:
+        print("The trace is empty.")
+        return 1
+    print(format_report(replay(events)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
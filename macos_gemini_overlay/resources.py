@@ -0,0 +1,345 @@
+# Python libraries
+import array
+import ctypes
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+
+# Usage of a single process: resident bytes, cumulative CPU seconds, thread count.
+ProcessUsage = namedtuple("ProcessUsage", ["rss", "cpu", "threads"])
+
+# Columns stored for every sample (the overlay process itself, then all web processes).
+SAMPLE_FIELDS = (
+    "time",
+    "overlay_rss", "overlay_cpu", "overlay_threads",
+    "web_rss", "web_cpu", "web_threads", "web_processes",
+)
+FIELD_INDEX = {name: i for (i, name) in enumerate(SAMPLE_FIELDS)}
+
+
+# Fixed-size ring of samples, stored in one flat array of doubles (row-major).
+class SampleRing:
+    def __init__(self, capacity, width=len(SAMPLE_FIELDS)):
+        self.capacity = max(1, int(capacity))
+        self.width = width
+        self.data = array.array("d", bytes(8 * self.capacity * self.width))
+        self.count = 0
+        self.next = 0
+
+    def __len__(self):
+        return self.count
+
+    # Overwrite the oldest row with a new one.
+    def append(self, row):
+        start = self.next * self.width
+        self.data[start:start + self.width] = array.array("d", row)
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    # Return the row at "index" (0 is the oldest, -1 the newest).
+    def row(self, index):
+        if index < 0:
+            index += self.count
+        if not (0 <= index < self.count):
+            raise IndexError("sample index out of range")
+        start = ((self.next - self.count + index) % self.capacity) * self.width
+        return self.data[start:start + self.width].tolist()
+
+    # Return all rows from oldest to newest.
+    def rows(self):
+        return [self.row(i) for i in range(self.count)]
+
+
+# Process backend that reads a Linux "/proc" tree (for development and testing).
+class ProcBackend:
+    def __init__(self, root="/proc"):
+        self.root = root
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    # Fields of "/proc/<pid>/stat" after the command name (index 0 is the state).
+    def _stat_fields(self, pid):
+        try:
+            with open(os.path.join(self.root, str(pid), "stat"), "rb") as f:
+                return f.read().rpartition(b")")[2].split()
+        except OSError:
+            return None
+
+    # Direct children of "pid" (uses the kernel's children list when available).
+    def children(self, pid):
+        path = os.path.join(self.root, str(pid), "task", str(pid), "children")
+        try:
+            with open(path) as f:
+                return [int(child) for child in f.read().split()]
+        except OSError:
+            pass
+        children = []
+        for name in os.listdir(self.root):
+            if name.isdigit():
+                fields = self._stat_fields(name)
+                if fields and (int(fields[1]) == pid):
+                    children.append(int(name))
+        return children
+
+    # Usage of one process, or None if it has exited.
+    def usage(self, pid):
+        fields = self._stat_fields(pid)
+        if not fields:
+            return None
+        cpu = (int(fields[11]) + int(fields[12])) / self.clock_ticks
+        return ProcessUsage(int(fields[21]) * self.page_size, cpu, int(fields[17]))
+
+
+# "struct proc_taskinfo" from <sys/proc_info.h>.
+class _ProcTaskInfo(ctypes.Structure):
+    _fields_ = [
+        ("pti_virtual_size", ctypes.c_uint64),
+        ("pti_resident_size", ctypes.c_uint64),
+        ("pti_total_user", ctypes.c_uint64),
+        ("pti_total_system", ctypes.c_uint64),
+        ("pti_threads_user", ctypes.c_uint64),
+        ("pti_threads_system", ctypes.c_uint64),
+        ("pti_policy", ctypes.c_int32),
+        ("pti_faults", ctypes.c_int32),
+        ("pti_pageins", ctypes.c_int32),
+        ("pti_cow_faults", ctypes.c_int32),
+        ("pti_messages_sent", ctypes.c_int32),
+        ("pti_messages_received", ctypes.c_int32),
+        ("pti_syscalls_mach", ctypes.c_int32),
+        ("pti_syscalls_unix", ctypes.c_int32),
+        ("pti_csw", ctypes.c_int32),
+        ("pti_threadnum", ctypes.c_int32),
+        ("pti_numrunning", ctypes.c_int32),
+        ("pti_priority", ctypes.c_int32),
+    ]
+
+
+# Process backend for macOS using libproc (no subprocesses, a few syscalls per process).
+class DarwinBackend:
+    PROC_PIDTASKINFO = 4
+    MAX_CHILDREN = 1024
+
+    def __init__(self):
+        self.libc = ctypes.CDLL("/usr/lib/libSystem.B.dylib")
+        # CPU times are reported in mach absolute time units.
+        timebase = (ctypes.c_uint32 * 2)()
+        self.libc.mach_timebase_info(timebase)
+        self.cpu_scale = timebase[0] / timebase[1] / 1e9
+        self._info = _ProcTaskInfo()
+        self._pids = (ctypes.c_int * self.MAX_CHILDREN)()
+
+    # Direct children of "pid".
+    def children(self, pid):
+        count = self.libc.proc_listchildpids(pid, self._pids, ctypes.sizeof(self._pids))
+        return [self._pids[i] for i in range(max(0, count))]
+
+    # Usage of one process, or None if it has exited (or is not inspectable).
+    def usage(self, pid):
+        size = ctypes.sizeof(self._info)
+        if self.libc.proc_pidinfo(pid, self.PROC_PIDTASKINFO, 0, ctypes.byref(self._info), size) < size:
+            return None
+        cpu = (self._info.pti_total_user + self._info.pti_total_system) * self.cpu_scale
+        return ProcessUsage(self._info.pti_resident_size, cpu, self._info.pti_threadnum)
+
+
+# The process backend for the current platform.
+def default_backend():
+    if sys.platform == "darwin":
+        return DarwinBackend()
+    return ProcBackend()
+
+
+# All process ids in the trees rooted at "roots" (each root included once).
+def walk_process_tree(backend, roots):
+    seen = set()
+    stack = list(roots)
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        stack.extend(backend.children(pid))
+    return seen
+
+
+# Total CPU seconds used so far by the processes in the trees rooted at "roots".
+def process_cpu_seconds(backend, roots):
+    total = 0.0
+    for pid in walk_process_tree(backend, roots):
+        usage = backend.usage(pid)
+        if usage is not None:
+            total += usage.cpu
+    return total
+
+
+# Total resident bytes of the processes in the trees rooted at "roots".
+def process_rss_bytes(backend, roots):
+    total = 0
+    for pid in walk_process_tree(backend, roots):
+        usage = backend.usage(pid)
+        if usage is not None:
+            total += usage.rss
+    return total
+
+
+# Periodically samples the overlay process and its web processes in a background thread.
+class ResourceSampler:
+    def __init__(self, backend, pid=None, interval=10.0, capacity=360, metrics_path=None, clock=time.time):
+        self.backend = backend
+        self.pid = os.getpid() if pid is None else pid
+        self.interval = interval
+        self.metrics_path = metrics_path
+        self.clock = clock
+        self.ring = SampleRing(capacity)
+        self.peaks = [0.0] * len(SAMPLE_FIELDS)
+        self.extra_pids = ()
+        self.extra_metrics = []
+        self._last_cpu = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Set additional process trees to account as web processes (WebKit's XPC services are
+    # not children of the overlay, so their ids are reported by the webview).
+    def set_extra_pids(self, pids):
+        self.extra_pids = tuple(pid for pid in pids if pid and (pid != self.pid))
+
+    # Add a source of extra counters for the metrics file: "source()" returns a list of
+    # (name, help text, value) for monotonically increasing values.
+    def add_metrics(self, source):
+        self.extra_metrics.append(source)
+
+    # CPU percentage since the previous sample of "pid" (zero for the first sample).
+    def _cpu_percent(self, pid, cpu, now):
+        previous = self._last_cpu.get(pid)
+        self._last_cpu[pid] = (cpu, now)
+        if (previous is None) or (now <= previous[1]):
+            return 0.0
+        return max(0.0, 100.0 * (cpu - previous[0]) / (now - previous[1]))
+
+    # Take one sample of the whole process tree and record it.
+    def sample_once(self):
+        now = self.clock()
+        row = [0.0] * len(SAMPLE_FIELDS)
+        row[0] = now
+        extra_pids = self.extra_pids
+        pids = walk_process_tree(self.backend, (self.pid,) + extra_pids)
+        for pid in pids:
+            usage = self.backend.usage(pid)
+            if usage is None:
+                continue
+            prefix = "overlay_" if pid == self.pid else "web_"
+            row[FIELD_INDEX[prefix + "rss"]] += usage.rss
+            row[FIELD_INDEX[prefix + "cpu"]] += self._cpu_percent(pid, usage.cpu, now)
+            row[FIELD_INDEX[prefix + "threads"]] += usage.threads
+            if pid != self.pid:
+                row[FIELD_INDEX["web_processes"]] += 1
+        # Forget processes that have exited.
+        for pid in set(self._last_cpu) - pids:
+            del self._last_cpu[pid]
+        with self._lock:
+            self.ring.append(row)
+            for i in range(1, len(row)):
+                self.peaks[i] = max(self.peaks[i], row[i])
+        if self.metrics_path:
+            try:
+                self.write_metrics(self.metrics_path)
+            except OSError as e:
+                print("Warning: Could not write metrics file:", e, flush=True)
+        return row
+
+    # Most recent sample and peaks as dictionaries keyed by field name (None before the first sample).
+    def snapshot(self):
+        with self._lock:
+            if not len(self.ring):
+                return None
+            current = dict(zip(SAMPLE_FIELDS, self.ring.row(-1)))
+            peaks = dict(zip(SAMPLE_FIELDS, self.peaks))
+        return current, peaks
+
+    # Short human-readable lines for the status bar menu.
+    def summary_lines(self):
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return ["Resources: sampling..."]
+        current, peaks = snapshot
+        mb = 1024 * 1024
+        lines = []
+        for (label, group) in (("Overlay", "overlay_"), ("Web", "web_")):
+            lines.append(
+                f"{label}: {current[group + 'rss'] / mb:.0f} MB, {current[group + 'cpu']:.1f}% CPU"
+                f" (peak {peaks[group + 'rss'] / mb:.0f} MB, {peaks[group + 'cpu']:.1f}%)"
+            )
+        threads = current["overlay_threads"] + current["web_threads"]
+        lines.append(f"Threads: {threads:.0f}, web processes: {current['web_processes']:.0f}")
+        return lines
+
+    # Render the latest sample and peaks in Prometheus text exposition format.
+    def metrics_text(self):
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return ""
+        current, peaks = snapshot
+        lines = []
+        def gauge(name, help_text, values, kind="gauge"):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                lines.append(f"{name}{labels} {value:.6g}")
+        for (metric, field, help_text) in (
+            ("overlay_resident_memory_bytes", "rss", "resident memory in bytes."),
+            ("overlay_cpu_percent", "cpu", "CPU usage in percent of one core."),
+            ("overlay_threads", "threads", "number of threads."),
+        ):
+            gauge(metric, "Current " + help_text, [
+                ('{group="overlay"}', current["overlay_" + field]),
+                ('{group="web"}', current["web_" + field]),
+            ])
+            gauge(metric.replace("overlay_", "overlay_peak_", 1), "Peak " + help_text, [
+                ('{group="overlay"}', peaks["overlay_" + field]),
+                ('{group="web"}', peaks["web_" + field]),
+            ])
+        gauge("overlay_web_processes", "Number of web content processes.", [("", current["web_processes"])])
+        gauge("overlay_last_sample_timestamp_seconds", "Time of the last sample.", [("", current["time"])])
+        for source in self.extra_metrics:
+            for (name, help_text, value) in source():
+                gauge(name, help_text, [("", value)], kind="counter")
+        return "\n".join(lines) + "\n"
+
+    # Atomically replace the metrics file (the textfile collector must never see partial files).
+    def write_metrics(self, path):
+        path = os.fspath(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.metrics_text())
+        os.replace(temporary, path)
+
+    # Start sampling in a daemon thread (the first sample is taken immediately).
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    # Stop the sampling thread.
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.sample_once()
+            except Exception as e:
+                print("Warning: Resource sample failed:", e, flush=True)
+            if self._stop.wait(self.interval):
+                break
@@ -0,0 +1,95 @@
+# Python libraries
+import os
+import tempfile
+import threading
+import time
+
+# Apple libraries
+from Foundation import NSURL
+from Quartz import (
+    CGBitmapContextCreate,
+    CGColorSpaceCreateWithName,
+    CGContextDrawImage,
+    CGImageGetHeight,
+    CGImageGetWidth,
+    CGImageSourceCreateImageAtIndex,
+    CGImageSourceCreateWithURL,
+    CGRectMake,
+    kCGColorSpaceSRGB,
+    kCGImageAlphaNoneSkipLast,
+)
+
+# Local libraries
+from .commands import run_command
+from .imaging import (
+    PixelBuffer,
+    fit_to_budget,
+)
+
+
+# Decode an image file into RGBA pixels (in sRGB).
+def load_pixels(path):
+    source = CGImageSourceCreateWithURL(NSURL.fileURLWithPath_(path), None)
+    image = CGImageSourceCreateImageAtIndex(source, 0, None) if source else None
+    if image is None:
+        raise ValueError(f"Could not decode {path}")
+    width, height = CGImageGetWidth(image), CGImageGetHeight(image)
+    data = bytearray(width * height * 4)
+    context = CGBitmapContextCreate(
+        data, width, height, 8, width * 4,
+        CGColorSpaceCreateWithName(kCGColorSpaceSRGB), kCGImageAlphaNoneSkipLast,
+    )
+    CGContextDrawImage(context, CGRectMake(0, 0, width, height), image)
+    return PixelBuffer(width, height, data)
+
+
+# Let the user select a screen region, returning its pixels (None if cancelled).
+def capture_region():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "capture.png")
+        # Interactive selection, without the shutter sound (give the user time to choose).
+        result = run_command(["screencapture", "-i", "-x", "-t", "png", path], timeout=300)
+        if result.error or result.timed_out:
+            print(f"Warning: Screenshot failed, {result.describe()}", flush=True)
+        if not os.path.exists(path):
+            return None
+        return load_pixels(path)
+
+
+# Captures a region and shrinks it to the byte budget on a worker thread, so neither the
+# selection nor the encoding blocks the main thread. "deliver((png, width, height))" (or
+# "deliver(None)" if nothing was captured) is called on the worker thread when done.
+class ScreenshotWorker:
+    def __init__(self, deliver, max_bytes, max_dimension, capture=capture_region):
+        self.deliver = deliver
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.capture = capture
+        self.lock = threading.Lock()
+        self.busy = False
+
+    # Start a capture, unless one is already running (returns whether it was started).
+    def start(self):
+        with self.lock:
+            if self.busy:
+                return False
+            self.busy = True
+        threading.Thread(target=self._run, name="screenshot", daemon=True).start()
+        return True
+
+    def _run(self):
+        result = None
+        try:
+            pixels = self.capture()
+            if pixels is not None:
+                start = time.perf_counter()
+                result = fit_to_budget(pixels, self.max_bytes, self.max_dimension)
+                png, width, height = result
+                print(f"Screenshot {pixels.width}x{pixels.height} -> {width}x{height},"
+                      f" {len(png) // 1024} KiB in {time.perf_counter() - start:.2f} s", flush=True)
+        except Exception as e:
+            print("Warning: Screenshot failed:", e, flush=True)
+        finally:
+            with self.lock:
+                self.busy = False
+        self.deliver(result)
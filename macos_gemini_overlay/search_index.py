@@ -0,0 +1,234 @@
+# Python libraries
+import hashlib
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+# Message bus type for batches of captured conversations.
+CAPTURE_MESSAGE = "conversation.batch"
+# Selectors for rendered messages (user prompts and assistant responses).
+MESSAGE_SELECTOR = '[data-testid="user-message"], .font-claude-message, .font-claude-response'
+# Injected (opt-in) script that posts new or changed messages of the open conversation in batches.
+CAPTURE_SCRIPT = """
+(function(){
+  if (window.__overlayConversationCapture) { return; }
+  window.__overlayConversationCapture = true;
+  const MESSAGE_SELECTOR = %s;
+  const sent = new Map();
+  let timer = null;
+  function digest(text){
+    let h = 0;
+    for (let i = 0; i < text.length; i++) { h = (h * 31 + text.charCodeAt(i)) | 0; }
+    return h + ':' + text.length;
+  }
+  function collect(){
+    timer = null;
+    if (!/^\\/chat\\//.test(location.pathname)) { return; }
+    const url = location.origin + location.pathname;
+    const seen = sent.get(url) || {messages: {}, title: null};
+    sent.set(url, seen);
+    const title = document.title.replace(/\\s*[-|\\u2013]\\s*Claude\\s*$/, '');
+    const messages = [];
+    document.querySelectorAll(MESSAGE_SELECTOR).forEach(function(el, index){
+      // Collapsed messages (long conversation mode) keep their text aside.
+      const text = ((window.__overlayRendering ? window.__overlayRendering.text(el) : el.innerText) || '').trim();
+      if (!text) { return; }
+      const h = digest(text);
+      if (seen.messages[index] !== h) { seen.messages[index] = h; messages.push({index: index, text: text}); }
+    });
+    if (messages.length || (seen.title !== title)) {
+      seen.title = title;
+      window.__overlayBus.send(%s, [{url: url, title: title, messages: messages}]);
+    }
+  }
+  function schedule(){ if (!timer) { timer = setTimeout(collect, 1500); } }
+  window.__overlayBus.observe(document.body, {childList: true, subtree: true, characterData: true}, schedule);
+  window.addEventListener('popstate', schedule);
+  schedule();
+})();
+""" % (json.dumps(MESSAGE_SELECTOR), json.dumps(CAPTURE_MESSAGE))
+
+# Tables for conversations, message digests (deduplication) and the full-text index.
+# Title rows in "search" use the negated conversation id as rowid, message rows the message id.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    url TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    UNIQUE (conversation, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5(
+    title, body, conversation UNINDEXED,
+    prefix='1 2 3', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+# Relative weight of title matches over message matches when ranking.
+TITLE_WEIGHT = 8.0
+
+SearchHit = namedtuple("SearchHit", ["url", "title", "snippet", "score"])
+
+
+# Strip query and fragment so that every conversation has exactly one key.
+def normalize_url(url):
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip("/"), "", ""))
+
+
+# Convert free text into an FTS5 query where every word is a quoted prefix term.
+def build_match_query(text):
+    words = re.findall(r"\w+", text.lower())
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+
+# Local full-text index of conversations stored in SQLite (FTS5).
+class ConversationIndex:
+    def __init__(self, path):
+        self.path = str(path)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+    # Id of the conversation at "url", creating it (and its title row) if needed.
+    def _conversation(self, url, title, now):
+        db = self.connection
+        row = db.execute("SELECT id, title FROM conversations WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            cursor = db.execute("INSERT INTO conversations (url, title, updated) VALUES (?, ?, ?)", (url, title or "", now))
+            conversation = cursor.lastrowid
+            db.execute("INSERT INTO search (rowid, title, body, conversation) VALUES (?, ?, '', ?)", (-conversation, title or "", conversation))
+            return conversation
+        conversation, old_title = row
+        if title and (title != old_title):
+            db.execute("UPDATE conversations SET title = ? WHERE id = ?", (title, conversation))
+            db.execute("DELETE FROM search WHERE rowid = ?", (-conversation,))
+            db.execute("INSERT INTO search (rowid, title, body, conversation) VALUES (?, ?, '', ?)", (-conversation, title, conversation))
+        return conversation
+
+    # Index a batch of records {"url", "title", "messages": [{"index", "text"}]} in one
+    # transaction. Unchanged messages are skipped. Returns the number of messages (re)indexed.
+    def add_batch(self, records, now=None):
+        now = time.time() if now is None else now
+        changed = 0
+        with self._lock:
+            db = self.connection
+            db.execute("BEGIN")
+            try:
+                for record in records:
+                    url = normalize_url(record.get("url") or "")
+                    if not url:
+                        continue
+                    conversation = self._conversation(url, (record.get("title") or "").strip(), now)
+                    touched = False
+                    for message in record.get("messages") or ():
+                        text = (message.get("text") or "").strip()
+                        if not text:
+                            continue
+                        position = int(message.get("index", 0))
+                        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+                        row = db.execute(
+                            "SELECT id, digest FROM messages WHERE conversation = ? AND position = ?",
+                            (conversation, position)
+                        ).fetchone()
+                        if row is None:
+                            message_id = db.execute(
+                                "INSERT INTO messages (conversation, position, digest) VALUES (?, ?, ?)",
+                                (conversation, position, digest)
+                            ).lastrowid
+                        elif row[1] == digest:
+                            continue
+                        else:
+                            message_id = row[0]
+                            db.execute("UPDATE messages SET digest = ? WHERE id = ?", (digest, message_id))
+                            db.execute("DELETE FROM search WHERE rowid = ?", (message_id,))
+                        db.execute(
+                            "INSERT INTO search (rowid, title, body, conversation) VALUES (?, '', ?, ?)",
+                            (message_id, text, conversation)
+                        )
+                        changed += 1
+                        touched = True
+                    if touched:
+                        db.execute("UPDATE conversations SET updated = ? WHERE id = ?", (now, conversation))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return changed
+
+    # Best matching conversations for "text" (prefix matching, BM25 ranking). An empty
+    # query lists the most recently updated conversations.
+    def search(self, text, limit=10):
+        match = build_match_query(text)
+        with self._lock:
+            if not match:
+                rows = self.connection.execute(
+                    "SELECT url, title, '', 0.0 FROM conversations ORDER BY updated DESC LIMIT ?", (limit,)
+                ).fetchall()
+                return [SearchHit(*row) for row in rows]
+            rows = self.connection.execute(
+                "SELECT c.url, c.title, snippet(search, 1, '', '', '…', 12), bm25(search, ?, 1.0) AS score"
+                " FROM search JOIN conversations AS c ON c.id = search.conversation"
+                " WHERE search MATCH ? ORDER BY score LIMIT ?",
+                (TITLE_WEIGHT, match, limit * 8)
+            ).fetchall()
+        # Keep the best hit per conversation, preferring a message snippet over an empty title row.
+        hits = {}
+        for (url, title, snippet, score) in rows:
+            hit = hits.get(url)
+            if hit is None:
+                hits[url] = SearchHit(url, title, snippet, score)
+            elif snippet and not hit.snippet:
+                hits[url] = hit._replace(snippet=snippet)
+        return list(hits.values())[:limit]
+
+    # Number of indexed conversations and messages.
+    def stats(self):
+        with self._lock:
+            conversations = self.connection.execute("SELECT count(*) FROM conversations").fetchone()[0]
+            messages = self.connection.execute("SELECT count(*) FROM messages").fetchone()[0]
+        return conversations, messages
+
+
+# Indexes submitted batches on a background thread so the main thread never waits on disk.
+class BackgroundIndexer:
+    def __init__(self, index):
+        self.index = index
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="conversation-indexer", daemon=True)
+        self.thread.start()
+
+    # Queue a batch of records.
+    def submit(self, records):
+        self.queue.put(records)
+
+    # Block until every queued batch has been indexed.
+    def flush(self):
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            records = self.queue.get()
+            try:
+                self.index.add_batch(records)
+            except Exception as e:
+                print("Warning: Failed to index conversation batch:", e, flush=True)
+            finally:
+                self.queue.task_done()
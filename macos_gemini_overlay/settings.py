@@ -0,0 +1,25 @@
+# Python libraries
+import json
+
+# Local libraries
+from .constants import SETTINGS
+from .state import LOG_DIR
+
+# File for storing overrides of the optional feature settings.
+SETTINGS_FILE = LOG_DIR / "settings.json"
+
+
+# Load settings overrides from the JSON file if it exists (unknown keys are ignored).
+def load_settings():
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            data = json.load(f)
+        overrides = {key: value for (key, value) in data.items() if key in SETTINGS}
+    except FileNotFoundError:
+        return
+    except (json.JSONDecodeError, AttributeError):
+        print(f"Warning: Ignoring malformed settings file:\n  {SETTINGS_FILE}", flush=True)
+        return
+    if overrides:
+        print(f"Overwriting default settings from:\n  {SETTINGS_FILE}\n  {overrides}", flush=True)
+        SETTINGS.update(overrides)
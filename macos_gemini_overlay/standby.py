@@ -0,0 +1,137 @@
+# Python libraries
+import time
+
+
+DISABLED, EMPTY, LOADING, READY, PAUSED = "disabled", "empty", "loading", "ready", "paused"
+
+
+# Keeps a second, off-screen web view with a fresh "new chat" page loaded, so that a new
+# conversation is a swap instead of a page load. Views are opaque to this class:
+#   create()        make a new web view (sharing the process pool and data store)
+#   load(view)      start loading the new chat page into "view"
+#   discard(view)   throw "view" away
+#   install(view)   put "view" on screen in place of the active view (in one step) and
+#                   return the view it replaced
+#   memory_ok()     whether memory use allows keeping a standby view
+#   call_later(delay, fn)
+#
+#   empty   -> loading   fill(): a view is created and starts loading
+#   loading -> ready     loaded(view)
+#   loading -> empty     failed(view): the view is discarded, fill() is retried later
+#   ready   -> loading   take(): the standby is installed and the view it replaced is
+#                        recycled as the next standby; also when the standby is older
+#                        than "max_age" and gets reloaded
+#   any     -> paused    memory_ok() is false at a check: the standby is discarded
+#   paused  -> loading   a later check finds memory_ok() true again
+class StandbyBuffer:
+    def __init__(self, create, load, discard, install, memory_ok, call_later,
+                 check_interval=60.0, retry_delay=30.0, max_age=1800.0, clock=time.monotonic):
+        self.create = create
+        self.load = load
+        self.discard = discard
+        self.install = install
+        self.memory_ok = memory_ok
+        self.call_later = call_later
+        self.check_interval = check_interval
+        self.retry_delay = retry_delay
+        self.max_age = max_age
+        self.clock = clock
+        self.state = EMPTY
+        self.view = None
+        self.loaded_at = None
+        self.swaps = 0
+        self.misses = 0
+        self.pauses = 0
+
+    # Start keeping a standby view, and checking memory and age periodically.
+    def start(self):
+        self.fill()
+        self.call_later(self.check_interval, self._periodic_check)
+
+    # Stop for good, discarding the standby view.
+    def stop(self):
+        self._drop()
+        self.state = DISABLED
+
+    # Whether "view" is the standby view (for routing its navigation callbacks).
+    def owns(self, view):
+        return (view is not None) and (view is self.view)
+
+    # Create and start loading a standby view if there is none.
+    def fill(self):
+        if (self.state != EMPTY) or not self._check_memory():
+            return
+        self._load(self.create())
+
+    def _load(self, view):
+        self.view = view
+        self.state = LOADING
+        self.loaded_at = None
+        self.load(view)
+
+    def loaded(self, view):
+        if self.owns(view) and (self.state == LOADING):
+            self.state = READY
+            self.loaded_at = self.clock()
+
+    def failed(self, view):
+        if self.owns(view) and (self.state in (LOADING, READY)):
+            self._drop()
+            self.state = EMPTY
+            self.call_later(self.retry_delay, self.fill)
+
+    # Swap the ready standby in; returns False (the caller falls back) if none is ready.
+    def take(self):
+        if self.state != READY:
+            self.misses += 1
+            if self.state == EMPTY:
+                self.fill()
+            return False
+        view, self.view = self.view, None
+        self.state = EMPTY
+        previous = self.install(view)
+        self.swaps += 1
+        # The replaced view becomes the next standby (it keeps its process and scripts).
+        if previous is not None:
+            if self._check_memory():
+                self._load(previous)
+            else:
+                self.discard(previous)
+        return True
+
+    def _drop(self):
+        if self.view is not None:
+            view, self.view = self.view, None
+            self.discard(view)
+        self.loaded_at = None
+
+    # Pause (dropping the standby) while memory use is too high; True if it is fine.
+    def _check_memory(self):
+        try:
+            ok = self.memory_ok()
+        except Exception as e:
+            print("Warning: Could not check memory for the standby view:", e, flush=True)
+            ok = True
+        if not ok and self.state != PAUSED:
+            print("Memory limit reached, dropping the standby new chat view.", flush=True)
+            self._drop()
+            self.state = PAUSED
+            self.pauses += 1
+        elif ok and self.state == PAUSED:
+            self.state = EMPTY
+        return ok
+
+    def _periodic_check(self):
+        if self.state == DISABLED:
+            return
+        if self._check_memory():
+            if self.state == EMPTY:
+                self.fill()
+            elif (self.state == READY) and (self.clock() - self.loaded_at > self.max_age):
+                # Refresh a stale page so that the swapped in chat is current.
+                self._load(self.view)
+        self.call_later(self.check_interval, self._periodic_check)
+
+    # Short line for logs.
+    def summary_line(self):
+        return f"Standby new chat: {self.state}, {self.swaps} instant, {self.misses} missed, {self.pauses} paused"
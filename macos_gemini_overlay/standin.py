@@ -0,0 +1,519 @@
+# Python libraries
+import argparse
+import json
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local libraries
+from .bridge import (
+    BUS_HANDLER,
+    BUS_SCRIPT,
+)
+from .page import (
+    NEW_CHAT_SELECTORS,
+    PAGE_SCRIPT,
+    SETTINGS_SELECTORS,
+    SIDEBAR_SELECTORS,
+)
+from .replay import percentile
+from .search_index import MESSAGE_SELECTOR
+
+# A local HTTP stand-in for the website: a synthetic single page app with the elements the
+# overlay's scripts look for (prompt area, send button, "New chat", sidebar and settings
+# buttons, messages), with tunable delays and DOM sizes. Point the overlay at it with
+# "--website http://127.0.0.1:8765/new", or run the benchmark ("--bench"): a harness page
+# loads the app in a frame with the overlay's own bus and page scripts injected (the
+# harness plays the part of the Python side of the bus) and reports time to interactive
+# and shortcut latencies, without network access or a Mac.
+
+# Tunables of the stand-in (delays in milliseconds).
+#   render_delay       from the app script running to the first render (hydration)
+#   bundle_delay       server side delay before the app script is sent
+#   navigation_delay   from a click on a link or "New chat" to the new route rendering
+#   ui_delay           from a click on a menu button to the menu (or sidebar) changing
+#   messages           messages in every conversation ("/chat/<id>")
+#   nodes_per_message  DOM elements per message
+#   sidebar_items      conversation links in the sidebar
+#   seed               seed of the generated text
+StandinConfig = namedtuple("StandinConfig", [
+    "render_delay", "bundle_delay", "navigation_delay", "ui_delay",
+    "messages", "nodes_per_message", "sidebar_items", "seed",
+])
+DEFAULT_CONFIG = StandinConfig(300, 50, 100, 16, 40, 30, 50, 1)
+DEFAULT_PORT = 8765
+# Query parameter that makes a page include the overlay's scripts (as WebKit would inject them).
+INJECT_PARAMETER = "overlay_scripts"
+# Benchmark results, in report order.
+METRICS = (
+    ("time_to_interactive_ms", "Time to interactive"),
+    ("focus_ms", "Focus prompt"),
+    ("insert_ms", "Insert text"),
+    ("open_conversation_ms", "Open conversation"),
+    ("new_chat_ms", "New chat (Cmd+N)"),
+    ("sidebar_ms", "Toggle sidebar"),
+    ("saved_info_ms", "Saved info (Cmd+,)"),
+)
+
+# Stands in for WebKit's script message handler: batches posted by the bus go to the
+# harness in the parent frame (or nowhere, when the page is opened on its own).
+HANDLER_SHIM = """
+(function(){
+  window.webkit = window.webkit || {messageHandlers: {}};
+  window.webkit.messageHandlers[%s] = {postMessage: function(body){
+    if (window.parent !== window && window.parent.__standinReceive) { window.parent.__standinReceive(body); }
+  }};
+})();
+""" % json.dumps(BUS_HANDLER)
+
+# The synthetic app. Every route renders the same shell: sidebar (menu, "New chat",
+# conversation links, settings), the conversation (for "/chat/<id>") or a heading, and the
+# prompt area. Routes change without reloading, like the real site.
+APP_SCRIPT = """
+(function(){
+  const config = window.__standinConfig;
+  const WORDS = ['latency', 'render', 'prompt', 'window', 'overlay', 'message',
+    'cache', 'frame', 'layout', 'thread', 'signal', 'buffer', 'shortcut', 'bench'];
+  const state = {sidebarOpen: true};
+  const root = document.getElementById('root');
+  let seed = config.seed;
+  function random(){ seed = (seed * 1103515245 + 12345) & 0x7fffffff; return seed / 0x7fffffff; }
+  function sentence(words){
+    const out = [];
+    for (let i = 0; i < words; i++) { out.push(WORDS[Math.floor(random() * WORDS.length)]); }
+    return out.join(' ') + '.';
+  }
+  function element(tag, attributes, text){
+    const el = document.createElement(tag);
+    Object.keys(attributes || {}).forEach(function(name){ el.setAttribute(name, attributes[name]); });
+    if (text) { el.textContent = text; }
+    return el;
+  }
+  function later(delay, fn){ if (delay > 0) { setTimeout(fn, delay); } else { fn(); } }
+  function navigate(path){
+    history.pushState({}, '', path);
+    later(config.navigation_delay, render);
+  }
+  function link(path, text, attributes){
+    const a = element('a', Object.assign({href: path}, attributes || {}), text);
+    a.addEventListener('click', function(event){ event.preventDefault(); navigate(path); });
+    return a;
+  }
+  function message(index){
+    const user = (index % 2 === 0);
+    const el = element('div', user ? {'data-testid': 'user-message'} : {'class': 'font-claude-message'});
+    for (let count = 1; count < config.nodes_per_message; count += 2) {
+      const p = element('p', null, sentence(12));
+      if (count + 1 < config.nodes_per_message) { p.appendChild(element('code', null, sentence(2))); }
+      el.appendChild(p);
+    }
+    return el;
+  }
+  function sidebar(){
+    const nav = element('nav', {'data-open': String(state.sidebarOpen)});
+    const menu = element('button', {'aria-label': 'Main menu', 'data-test-id': 'side-nav-menu-button'}, 'Menu');
+    menu.addEventListener('click', function(){
+      later(config.ui_delay, function(){
+        state.sidebarOpen = !state.sidebarOpen;
+        nav.setAttribute('data-open', String(state.sidebarOpen));
+      });
+    });
+    const newChat = element('button', {'aria-label': 'New chat'}, 'New chat');
+    newChat.addEventListener('click', function(){ navigate('/new'); });
+    nav.append(menu, newChat);
+    const list = element('ul');
+    for (let i = 0; i < config.sidebar_items; i++) {
+      const item = element('li');
+      item.appendChild(link('/chat/c' + i, sentence(3), {'data-standin-conversation': String(i)}));
+      list.appendChild(item);
+    }
+    nav.appendChild(list);
+    const settings = element('button', {'aria-label': 'Settings & help', 'data-test-id': 'settings-and-help-button'}, 'Settings');
+    settings.addEventListener('click', function(){
+      later(config.ui_delay, function(){
+        if (nav.querySelector('[role="menu"]')) { return; }
+        const popup = element('div', {role: 'menu'});
+        popup.appendChild(link('/saved-info', 'Saved info', {role: 'menuitem'}));
+        nav.appendChild(popup);
+      });
+    });
+    nav.appendChild(settings);
+    return nav;
+  }
+  function conversation(path){
+    const main = element('main');
+    if (path.indexOf('/chat/') === 0) {
+      for (let i = 0; i < config.messages; i++) { main.appendChild(message(i)); }
+    } else if (path === '/saved-info') {
+      main.appendChild(element('h1', null, 'Saved info'));
+    } else {
+      main.appendChild(element('h1', null, 'How can I help you today?'));
+    }
+    return main;
+  }
+  function composer(){
+    const form = element('form');
+    const prompt = element('div', {'contenteditable': 'true', 'data-placeholder': 'Message Claude'});
+    const query = new URLSearchParams(location.search).get('q');
+    if (query) { prompt.textContent = query; }
+    const send = element('button', {'aria-label': 'Send message', 'type': 'submit'}, 'Send');
+    const file = element('input', {'type': 'file', 'hidden': 'hidden'});
+    function update(){ send.disabled = !prompt.textContent.trim(); }
+    function submit(){
+      const text = prompt.textContent.trim();
+      if (!text) { return; }
+      prompt.textContent = '';
+      update();
+      const main = root.querySelector('main');
+      main.appendChild(element('div', {'data-testid': 'user-message'}, text));
+      later(config.ui_delay, function(){ main.appendChild(element('div', {'class': 'font-claude-message'}, sentence(20))); });
+    }
+    prompt.addEventListener('input', update);
+    prompt.addEventListener('keydown', function(event){
+      if (event.key === 'Enter' && !event.shiftKey) { event.preventDefault(); submit(); }
+    });
+    file.addEventListener('change', function(){
+      Array.from(file.files).forEach(function(f){ form.appendChild(element('span', {'class': 'attachment'}, f.name)); });
+    });
+    form.addEventListener('submit', function(event){ event.preventDefault(); submit(); });
+    form.append(prompt, file, send);
+    update();
+    return form;
+  }
+  function render(){
+    root.replaceChildren(sidebar(), conversation(location.pathname), composer());
+  }
+  window.addEventListener('popstate', render);
+  later(config.render_delay, render);
+})();
+"""
+
+# Benchmark harness: loads the app in a frame once per run, drives it through the bus
+# like the overlay does, and posts the timings to the server.
+HARNESS_SCRIPT = """
+(function(){
+  const RUNS = %s, WARMUP = 1, INJECT = %s, MESSAGE = %s, MESSAGES = %s;
+  const NEW_CHAT = %s, SIDEBAR = %s, SETTINGS = %s;
+  const status = document.getElementById('status');
+  const pending = new Map(), listeners = {};
+  let seq = 1;
+  function now(){ return performance.now(); }
+  // Batches posted by the bus in the frame (replies resolve requests).
+  window.__standinReceive = function(body){
+    const time = now();
+    JSON.parse(body).forEach(function(envelope){
+      if (envelope.reply_to !== undefined && envelope.reply_to !== null) {
+        const waiting = pending.get(envelope.reply_to);
+        if (waiting) { pending.delete(envelope.reply_to); waiting(envelope, time); }
+        return;
+      }
+      (listeners[envelope.type] || []).splice(0).forEach(function(fn){ fn(envelope.payload, time); });
+    });
+  };
+  function nextMessage(type){
+    return new Promise(function(resolve){ (listeners[type] = listeners[type] || []).push(function(payload, time){ resolve(time); }); });
+  }
+  function request(frame, type, payload){
+    return new Promise(function(resolve, reject){
+      const id = seq++;
+      pending.set(id, function(envelope, time){
+        if (envelope.error) { reject(new Error(envelope.error)); } else { resolve({payload: envelope.payload, time: time}); }
+      });
+      frame.contentWindow.__overlayBus.receive([{type: type, seq: id, payload: payload, reply: true}]);
+    });
+  }
+  // Time at which "test(window)" first holds for the frame (checked on every change).
+  function until(frame, test, timeout){
+    return new Promise(function(resolve, reject){
+      const win = frame.contentWindow;
+      let observer = null, timer = null;
+      function finish(time, error){
+        if (observer) { observer.disconnect(); }
+        clearTimeout(timer);
+        if (error) { reject(error); } else { resolve(time); }
+      }
+      function check(){
+        let ok = false;
+        try { ok = test(win); } catch (e) {}
+        if (ok) { finish(now()); }
+      }
+      observer = new win.MutationObserver(check);
+      observer.observe(win.document, {childList: true, subtree: true, attributes: true});
+      timer = setTimeout(function(){ finish(null, new Error('Timed out')); }, timeout || 10000);
+      check();
+    });
+  }
+  async function measure(frame, start, test){
+    const done = until(frame, test);
+    const begin = now();
+    await start();
+    return (await done) - begin;
+  }
+  async function run(){
+    const frame = document.createElement('iframe');
+    frame.width = 1000;
+    frame.height = 700;
+    const ready = nextMessage('page.ready');
+    const begin = now();
+    frame.src = '/new?' + INJECT + '=1';
+    document.body.appendChild(frame);
+    const result = {time_to_interactive_ms: (await ready) - begin};
+    let start = now();
+    result.focus_ms = (await request(frame, 'prompt.focus')).time - start;
+    start = now();
+    result.insert_ms = (await request(frame, 'prompt.insert', {text: 'Benchmark prompt'})).time - start;
+    result.open_conversation_ms = await measure(frame,
+      function(){ return request(frame, 'page.click', {selectors: ['a[data-standin-conversation]']}); },
+      function(win){ return win.document.querySelectorAll(MESSAGE).length >= MESSAGES; });
+    result.dom_nodes = frame.contentDocument.getElementsByTagName('*').length;
+    result.new_chat_ms = await measure(frame,
+      function(){ return request(frame, 'page.click', {selectors: NEW_CHAT}); },
+      function(win){ return win.location.pathname === '/new' && !win.document.querySelector(MESSAGE) && win.document.querySelector('[contenteditable="true"]'); });
+    const open = frame.contentDocument.querySelector('nav').getAttribute('data-open');
+    result.sidebar_ms = await measure(frame,
+      function(){ return request(frame, 'page.click', {selectors: SIDEBAR}); },
+      function(win){ return win.document.querySelector('nav').getAttribute('data-open') !== open; });
+    result.saved_info_ms = await measure(frame,
+      function(){ return request(frame, 'page.saved_info', {selectors: SETTINGS}); },
+      function(win){ return (win.document.querySelector('main h1') || {}).textContent === 'Saved info'; });
+    frame.remove();
+    return result;
+  }
+  async function main(){
+    const runs = [];
+    let error = null;
+    try {
+      for (let i = 0; i < WARMUP + RUNS; i++) {
+        status.textContent = 'Run ' + (i + 1) + ' of ' + (WARMUP + RUNS);
+        const result = await run();
+        if (i >= WARMUP) { runs.push(result); }
+      }
+    } catch (e) {
+      error = String(e && e.message || e);
+    }
+    status.textContent = error ? 'Failed: ' + error : 'Done';
+    await fetch('/__standin/results', {method: 'POST', headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify({runs: runs, error: error, user_agent: navigator.userAgent})});
+  }
+  main();
+})();
+"""
+
+
+# HTML shell of the app for every route (with the overlay's scripts when "inject" is set,
+# at the points where WebKit injects them: document start and end).
+def app_html(config, inject=False):
+    start = '<script src="/__standin/start.js"></script>' if inject else ""
+    end = '<script src="/__standin/end.js"></script>' if inject else ""
+    settings = json.dumps(config._asdict()).replace("</", "<\\/")
+    return f"""<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Claude (stand-in)</title>
+{start}
+<style>
+  body {{ margin: 0; font: 14px -apple-system, sans-serif; display: flex; }}
+  nav {{ width: 260px; height: 100vh; overflow-y: auto; border-right: 1px solid #ddd; }}
+  nav[data-open="false"] {{ width: 48px; overflow: hidden; }}
+  main {{ flex: 1; height: calc(100vh - 120px); overflow-y: auto; padding: 0 24px; }}
+  form {{ position: fixed; bottom: 0; left: 260px; right: 0; height: 100px; }}
+  [contenteditable] {{ min-height: 60px; border: 1px solid #ccc; }}
+</style>
+<script>window.__standinConfig = {settings};</script>
+<script src="/app.js" defer></script>
+</head>
+<body>
+<div id="root"></div>
+{end}
+</body>
+</html>
+"""
+
+
+# The benchmark page.
+def harness_html(config, runs):
+    script = HARNESS_SCRIPT % tuple(json.dumps(value) for value in (
+        runs, INJECT_PARAMETER, MESSAGE_SELECTOR, config.messages,
+        NEW_CHAT_SELECTORS, SIDEBAR_SELECTORS, SETTINGS_SELECTORS,
+    ))
+    # Keep "</script>" in the embedded values from ending the script element.
+    script = script.replace("</", "<\\/")
+    return f"""<!doctype html>
+<html>
+<head><meta charset="utf-8"><title>Overlay benchmark</title></head>
+<body>
+<p id="status">Starting</p>
+<script>{script}</script>
+</body>
+</html>
+"""
+
+
+# Serves the stand-in app, the injected scripts and the benchmark harness, and collects
+# the results the harness posts.
+class StandinServer:
+    def __init__(self, config=DEFAULT_CONFIG, host="127.0.0.1", port=DEFAULT_PORT, runs=10):
+        self.config = config
+        self.runs = runs
+        self.results = []
+        self.received = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), StandinHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="standin", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # Body and content type for a GET of "path" (None if there is no such resource).
+    def resource(self, path, query):
+        if path == "/app.js":
+            time.sleep(self.config.bundle_delay / 1000)
+            return APP_SCRIPT, "application/javascript"
+        if path == "/__standin/start.js":
+            return HANDLER_SHIM + BUS_SCRIPT, "application/javascript"
+        if path == "/__standin/end.js":
+            return PAGE_SCRIPT, "application/javascript"
+        if path == "/__standin/bench":
+            runs = int(query.get("runs", [self.runs])[0])
+            return harness_html(self.config, runs), "text/html; charset=utf-8"
+        if path == "/__standin/config.json":
+            return json.dumps(self.config._asdict()), "application/json"
+        if path.startswith("/__standin/") or path.startswith("/favicon"):
+            return None
+        return app_html(self.config, bool(query.get(INJECT_PARAMETER))), "text/html; charset=utf-8"
+
+    # Results posted by the harness.
+    def record(self, results):
+        self.results.append(results)
+        self.received.set()
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        found = self.server.standin.resource(parts.path, parse_qs(parts.query))
+        if found is None:
+            self.send_error(404)
+            return
+        body, content_type = found
+        self._send(200, body.encode("utf-8"), content_type)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/__standin/results":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            results = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_error(400)
+            return
+        self.server.standin.record(results)
+        self._send(204, b"", "text/plain")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Keep the benchmark output readable.
+    def log_message(self, format, *args):
+        pass
+
+
+# Readable report of the results posted by the harness.
+def format_report(results, config=DEFAULT_CONFIG):
+    runs = results.get("runs") or []
+    lines = [f"Stand-in: {', '.join(f'{k}={v}' for (k, v) in config._asdict().items())}"]
+    if results.get("user_agent"):
+        lines.append(f"Browser:  {results['user_agent']}")
+    if results.get("error"):
+        lines.append(f"Error:    {results['error']}")
+    lines.append(f"Runs:     {len(runs)}")
+    if not runs:
+        return "\n".join(lines)
+    nodes = sorted(run.get("dom_nodes", 0) for run in runs)
+    lines.append(f"DOM size: {percentile(nodes, 0.5):,} elements with a conversation open")
+    lines.append(f"{'':22} {'p50':>9} {'p95':>9} {'max':>9}")
+    for (key, label) in METRICS:
+        values = sorted(run[key] for run in runs if run.get(key) is not None)
+        if values:
+            lines.append(f"{label:22} " + " ".join(f"{v:>6.1f} ms" for v in (
+                percentile(values, 0.5), percentile(values, 0.95), values[-1])))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the website, and optionally benchmark the overlay's page scripts against it.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (0 picks a free one)")
+    for name in StandinConfig._fields:
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=getattr(DEFAULT_CONFIG, name))
+    parser.add_argument("--bench", action="store_true", help="run the benchmark harness and print a report")
+    parser.add_argument("--runs", type=int, default=10, help="benchmark runs (after one warm-up run)")
+    parser.add_argument("--browser", help="command that opens a URL, for example \"chromium --headless=new\" (the URL is appended; without it, open the printed URL yourself)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for benchmark results")
+    parser.add_argument("--output", help="also write the raw benchmark results to this JSON file")
+    args = parser.parse_args(argv)
+    config = StandinConfig(**{name: getattr(args, name) for name in StandinConfig._fields})
+    server = StandinServer(config, args.host, args.port, args.runs).start()
+    if not args.bench:
+        print(f"Serving the stand-in at {server.url}/new\nRun the overlay against it with:\n"
+              f"  macos-claude-overlay --website {server.url}/new", flush=True)
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+        server.stop()
+        return 0
+    url = f"{server.url}/__standin/bench?runs={args.runs}"
+    browser = None
+    if args.browser:
+        browser = subprocess.Popen(shlex.split(args.browser) + [url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        print(f"Open this URL in a browser to run the benchmark:\n  {url}", flush=True)
+    try:
+        finished = server.received.wait(args.timeout)
+    except KeyboardInterrupt:
+        finished = False
+    if browser is not None:
+        browser.terminate()
+        try:
+            browser.wait(10)
+        except subprocess.TimeoutExpired:
+            browser.kill()
+    server.stop()
+    if not finished:
+        print(f"No results after {args.timeout:.0f} s.", flush=True)
+        return 1
+    results = server.results[-1]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": config._asdict(), "results": results}, f, indent=2)
+    print(format_report(results, config))
+    return 1 if results.get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# Python libraries
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+
+# All mutable runtime state (custom trigger, crash counter, window frame) lives in one
+# small JSON file. It is read once, on first use (nothing happens at import), kept in
+# memory, and written back atomically: a short while after a change, at exit, or right
+# away for changes that must survive a crash.
+
+# Persistent directory for logs, settings and state in the user's home folder.
+LOG_DIR = Path.home() / "Library" / "Logs" / "macos-claude-overlay"
+STATE_FILE = LOG_DIR / "state.json"
+# Files replaced by the state file, imported once if it does not exist yet.
+LEGACY_TRIGGER_FILE = LOG_DIR / "custom_trigger.json"
+LEGACY_CRASH_COUNTER_FILE = LOG_DIR / "macos_claude_overlay_crash_counter.txt"
+# Seconds to wait after a change before writing (later changes are written together).
+SAVE_DELAY = 2.0
+DEFAULT_STATE = {
+    # Custom launcher trigger {"flags", "key"} (None for the default).
+    "launcher_trigger": None,
+    # Recent unclean launches {"time", "count"} for crash loop detection.
+    "crash": None,
+    # Window frame as produced by NSWindow.stringWithSavedFrame.
+    "window_frame": None,
+}
+
+
+# Create the log directory (when something is about to be written to it).
+def ensure_log_dir():
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    return LOG_DIR
+
+
+# Read the state kept in separate files by earlier versions.
+def read_legacy_state(trigger_file=LEGACY_TRIGGER_FILE, crash_file=LEGACY_CRASH_COUNTER_FILE):
+    state = {}
+    try:
+        with open(trigger_file, "r") as f:
+            data = json.load(f)
+        state["launcher_trigger"] = {"flags": int(data["flags"]), "key": int(data["key"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    try:
+        with open(crash_file, "r") as f:
+            last_time, count = f.read().strip().split(",")
+        state["crash"] = {"time": float(last_time), "count": int(count)}
+    except (OSError, ValueError):
+        pass
+    return state
+
+
+# In-memory copy of the state file. Safe to use from several threads.
+class StateStore:
+    def __init__(self, path=STATE_FILE, legacy=read_legacy_state, delay=SAVE_DELAY):
+        self.path = Path(path)
+        self.legacy = legacy
+        self.delay = delay
+        self.data = None
+        self.dirty = False
+        self.timer = None
+        self.exit_hook = False
+        self.lock = threading.RLock()
+
+    # Read the file (only the first time), returning the state dictionary.
+    def load(self):
+        with self.lock:
+            if self.data is None:
+                data = {}
+                try:
+                    with open(self.path, "r") as f:
+                        data = json.load(f)
+                    if not isinstance(data, dict):
+                        raise ValueError("not a JSON object")
+                except FileNotFoundError:
+                    data = self.legacy() if self.legacy else {}
+                    if data:
+                        print(f"Moving saved state into:\n  {self.path}", flush=True)
+                        self._changed()
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Ignoring unreadable state file {self.path}:", e, flush=True)
+                    data = {}
+                self.data = {**DEFAULT_STATE, **data}
+            return self.data
+
+    def get(self, key, default=None):
+        value = self.load().get(key)
+        return default if value is None else value
+
+    # Change one entry. It is written after a short delay, or immediately with "flush".
+    def set(self, key, value, flush=False):
+        with self.lock:
+            data = self.load()
+            if data.get(key) != value:
+                data[key] = value
+                self._changed()
+            if flush:
+                self.flush()
+
+    # Remember that there are unsaved changes and schedule the write.
+    def _changed(self):
+        self.dirty = True
+        if not self.exit_hook:
+            atexit.register(self.flush)
+            self.exit_hook = True
+        if self.timer is None:
+            self.timer = threading.Timer(self.delay, self._timer_fired)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _timer_fired(self):
+        with self.lock:
+            self.timer = None
+            self.flush()
+
+    # Write unsaved changes (atomically). Returns whether anything was written.
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                return False
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            text = json.dumps(self.data, indent=1, sort_keys=True)
+            temporary = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(temporary, "w") as f:
+                    f.write(text + "\n")
+                os.replace(temporary, self.path)
+            except OSError as e:
+                print(f"Warning: Could not write state file {self.path}:", e, flush=True)
+                return False
+            self.dirty = False
+            return True
+
+
+# The state of this application.
+STATE = StateStore()
@@ -0,0 +1,353 @@
+# Python libraries
+import collections
+import errno
+import json
+import os
+import socket
+import stat
+import threading
+from collections import namedtuple
+
+
+# Message bus type for response delta events.
+STREAM_MESSAGE = "stream.delta"
+# Selector for assistant response nodes (the last one is the one being generated).
+RESPONSE_SELECTOR = ".font-claude-message, .font-claude-response"
+# Injected script that tracks the active response node and posts only the appended text.
+# Events are numbered per page load ("session") and batched per animation frame by the bus.
+STREAM_SCRIPT = """
+(function(){
+  if (window.__overlayStreamExport) { return; }
+  window.__overlayStreamExport = true;
+  const RESPONSE_SELECTOR = %s;
+  const session = Math.random().toString(36).slice(2);
+  const seen = new WeakSet();
+  let node = null, response = 0, seq = 0, lastText = '', checkQueued = false;
+  document.querySelectorAll(RESPONSE_SELECTOR).forEach(function(el){ seen.add(el); });
+  function push(kind, text){
+    window.__overlayBus.send(%s, {session: session, seq: seq++, response: response, kind: kind, text: text});
+  }
+  function streaming(el){
+    const holder = el.closest('[data-is-streaming]');
+    return !holder || holder.getAttribute('data-is-streaming') === 'true';
+  }
+  function check(){
+    checkQueued = false;
+    const nodes = document.querySelectorAll(RESPONSE_SELECTOR);
+    const last = nodes.length ? nodes[nodes.length - 1] : null;
+    if (last && !seen.has(last)) {
+      if (node) { push('end', ''); }
+      seen.add(last);
+      node = last; response++; lastText = '';
+    }
+    if (!node) { return; }
+    const text = node.isConnected ? node.innerText : lastText;
+    if (text !== lastText) {
+      if (text.startsWith(lastText)) { push('append', text.slice(lastText.length)); }
+      else { push('reset', text); }
+      lastText = text;
+    }
+    if (!node.isConnected || !streaming(node)) { push('end', ''); node = null; }
+  }
+  function queueCheck(){
+    if (checkQueued) { return; }
+    checkQueued = true;
+    if (document.hidden) { setTimeout(check, 100); } else { requestAnimationFrame(check); }
+  }
+  // Not paused by hidden mode: responses generated while the overlay is hidden are still
+  // exported as they arrive.
+  window.__overlayBus.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true, attributeFilter: ['data-is-streaming']}, queueCheck, false);
+})();
+""" % (json.dumps(RESPONSE_SELECTOR), json.dumps(STREAM_MESSAGE))
+
+# A piece of a response in order: "append" (new text), "reset" (the full text after the
+# page rewrote already exported text) or "end" (the response is complete).
+Delta = namedtuple("Delta", ["response", "kind", "text"])
+
+
+# Puts page events back in sequence order and turns them into deltas. Only the text of
+# the current response is kept, as a list of appended chunks (joined only on a reset).
+class DeltaAssembler:
+    def __init__(self, max_out_of_order=256):
+        self.max_out_of_order = max_out_of_order
+        self.session = None
+        self.next_seq = 0
+        self.pending = {}
+        self.response = None
+        self.chunks = []
+        self.skipped = 0
+
+    # Accept a batch of events and return the deltas that are now in order.
+    def feed(self, events):
+        deltas = []
+        for event in events:
+            if event.get("session") != self.session:
+                # A new page load restarts numbering; finish whatever was in progress.
+                deltas.extend(self._drain())
+                if self.response is not None:
+                    deltas.append(Delta(self.response, "end", ""))
+                self.session, self.next_seq, self.pending = event.get("session"), 0, {}
+                self.response, self.chunks = None, []
+            seq = int(event["seq"])
+            if seq >= self.next_seq:
+                self.pending[seq] = event
+        deltas.extend(self._drain())
+        # Give up on a missing event once too many later ones are waiting for it.
+        if len(self.pending) > self.max_out_of_order:
+            self.skipped += min(self.pending) - self.next_seq
+            self.next_seq = min(self.pending)
+            deltas.extend(self._drain())
+        return deltas
+
+    # Consume consecutive pending events starting at the next expected sequence number.
+    def _drain(self):
+        deltas = []
+        while self.next_seq in self.pending:
+            event = self.pending.pop(self.next_seq)
+            self.next_seq += 1
+            response = (self.session, event.get("response"))
+            if response != self.response:
+                if (self.response is not None) and self.chunks:
+                    deltas.append(Delta(self.response, "end", ""))
+                self.response, self.chunks = response, []
+            kind, text = event.get("kind"), event.get("text") or ""
+            if kind == "append" and text:
+                self.chunks.append(text)
+                deltas.append(Delta(response, "append", text))
+            elif kind == "reset":
+                previous = "".join(self.chunks)
+                self.chunks = [text]
+                if text.startswith(previous):
+                    if len(text) > len(previous):
+                        deltas.append(Delta(response, "append", text[len(previous):]))
+                else:
+                    deltas.append(Delta(response, "reset", text))
+            elif kind == "end":
+                deltas.append(Delta(response, "end", ""))
+                self.response, self.chunks = None, []
+        return deltas
+
+
+# Plain text: deltas are appended as is, responses end with a blank line, and a rewritten
+# response is repeated in full on a new line.
+def format_text(delta):
+    if delta.kind == "append":
+        return delta.text
+    if delta.kind == "reset":
+        return "\n" + delta.text
+    return "\n\n"
+
+
+# One JSON object per line, for consumers that want response boundaries and rewrites.
+def format_jsonl(delta):
+    return json.dumps({"response": delta.response[1], "kind": delta.kind, "text": delta.text}) + "\n"
+
+
+FORMATTERS = {"text": format_text, "jsonl": format_jsonl}
+
+
+# Appends to a regular file.
+class FileSink:
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.file = None
+
+    def write(self, data):
+        if self.file is None:
+            self.file = open(self.path, "ab")
+        self.file.write(data)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Writes to a named pipe (created if missing). Data is dropped while no reader is attached,
+# and writes block (on the sink's own thread) while the reader is slower than the stream.
+class FifoSink:
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.fd = None
+        if not os.path.exists(self.path):
+            os.mkfifo(self.path)
+        elif not stat.S_ISFIFO(os.stat(self.path).st_mode):
+            raise ValueError(f"Not a named pipe: {self.path}")
+
+    def write(self, data):
+        if self.fd is None:
+            try:
+                self.fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    return False
+                raise
+            os.set_blocking(self.fd, True)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+        except BrokenPipeError:
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+# Serves the stream to any number of Unix socket subscribers. A subscriber that cannot keep
+# up within "send_timeout" seconds is disconnected so that it never holds back the others.
+class SocketSink:
+    def __init__(self, path, send_timeout=1.0):
+        self.path = os.fspath(path)
+        self.send_timeout = send_timeout
+        self.subscribers = []
+        self.lock = threading.Lock()
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.remove(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen()
+        threading.Thread(target=self._accept, name="stream-export-accept", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            connection.settimeout(self.send_timeout)
+            with self.lock:
+                self.subscribers.append(connection)
+
+    def write(self, data):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for connection in subscribers:
+            try:
+                connection.sendall(data)
+            except OSError:
+                connection.close()
+                with self.lock:
+                    self.subscribers.remove(connection)
+        return bool(subscribers)
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for connection in self.subscribers:
+                connection.close()
+            self.subscribers = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Create a sink from a target such as "file:/path", "fifo:/path" or "unix:/path".
+def parse_target(target):
+    kind, _, path = target.partition(":")
+    sinks = {"file": FileSink, "fifo": FifoSink, "unix": SocketSink}
+    if (kind not in sinks) or (not path):
+        raise ValueError(f"Unknown stream export target {target!r}, expected one of " + ", ".join(f"'{k}:<path>'" for k in sinks))
+    return sinks[kind](os.path.expanduser(path))
+
+
+# Sinks for the "targets" that can be opened; a bad target is reported and skipped so that
+# one mistake in the settings does not stop the others (or the app) from starting.
+def create_sinks(targets):
+    sinks = []
+    for target in targets:
+        try:
+            sinks.append(parse_target(target))
+        except (ValueError, OSError) as e:
+            print(f"Warning: Skipping stream export target {target!r}:", e, flush=True)
+    return sinks
+
+
+# Feeds one sink from a bounded buffer on its own thread. When the buffer is full, new
+# data is dropped (and counted) instead of blocking the caller or the other sinks.
+class SinkWorker:
+    def __init__(self, sink, max_pending_bytes=1 << 20):
+        self.sink = sink
+        self.max_pending_bytes = max_pending_bytes
+        self.buffer = collections.deque()
+        self.pending_bytes = 0
+        self.dropped_bytes = 0
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="stream-export-sink", daemon=True)
+        self.thread.start()
+
+    # Queue data for the sink, returning False if it had to be dropped.
+    def offer(self, data):
+        with self.condition:
+            if self.pending_bytes + len(data) > self.max_pending_bytes:
+                self.dropped_bytes += len(data)
+                return False
+            self.buffer.append(data)
+            self.pending_bytes += len(data)
+            self.condition.notify()
+        return True
+
+    # Wait until everything queued so far has been handed to the sink.
+    def flush(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.buffer and not self.pending_bytes)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+        self.sink.close()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.buffer or self.closed)
+                if not self.buffer:
+                    return
+                data = b"".join(self.buffer)
+                self.buffer.clear()
+            try:
+                self.sink.write(data)
+            except Exception as e:
+                print("Warning: Stream export sink failed:", e, flush=True)
+            with self.condition:
+                self.pending_bytes -= len(data)
+                self.condition.notify_all()
+
+
+# Assembles page events into deltas and fans the formatted text out to every sink.
+# An unknown "output_format" is reported and replaced by "text".
+class StreamExporter:
+    def __init__(self, sinks, output_format="text", max_pending_bytes=1 << 20):
+        self.assembler = DeltaAssembler()
+        if output_format not in FORMATTERS:
+            print(f"Warning: Unknown stream export format {output_format!r}, using 'text'"
+                  f" (expected one of {', '.join(FORMATTERS)})", flush=True)
+            output_format = "text"
+        self.format = FORMATTERS[output_format]
+        self.workers = [SinkWorker(sink, max_pending_bytes) for sink in sinks]
+
+    # Accept a batch of events.
+    def feed(self, events):
+        for delta in self.assembler.feed(events):
+            data = self.format(delta).encode("utf-8")
+            for worker in self.workers:
+                worker.offer(data)
+
+    # Total bytes dropped because a sink could not keep up.
+    def dropped_bytes(self):
+        return sum(worker.dropped_bytes for worker in self.workers)
+
+    def flush(self):
+        for worker in self.workers:
+            worker.flush()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
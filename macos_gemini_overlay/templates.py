@@ -0,0 +1,238 @@
+# Python libraries
+import heapq
+import os
+import re
+import time
+
+
+# File extensions recognized as prompt templates (one template per file).
+TEMPLATE_EXTENSIONS = (".txt", ".md", ".prompt")
+# Template variables look like "{{name}}" or "{{name:default value}}".
+VARIABLE_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][\w-]*)\s*(?::([^}]*))?\}\}")
+# Characters after which a match counts as the start of a word.
+WORD_SEPARATORS = " /-_.:"
+
+
+# Names of the variables used in a template body (in order of first use).
+def template_variables(body):
+    names = []
+    for match in VARIABLE_PATTERN.finditer(body):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+    return names
+
+
+# Fill in variables from "values"; missing ones use their default or are left as written.
+def render_template(body, values):
+    def replace(match):
+        name, default = match.group(1), match.group(2)
+        if name in values:
+            return str(values[name])
+        return default if default is not None else match.group(0)
+    return VARIABLE_PATTERN.sub(replace, body)
+
+
+# 64-bit mask of the characters in "text" (letters and digits get their own bit).
+def char_mask(text):
+    mask = 0
+    for ch in set(text):
+        if "a" <= ch <= "z":
+            mask |= 1 << (ord(ch) - 97)
+        elif "0" <= ch <= "9":
+            mask |= 1 << (ord(ch) - 48 + 26)
+        else:
+            mask |= 1 << (36 + ord(ch) % 28)
+    return mask
+
+
+# Lowercase "text" one character at a time, so positions in the result are positions in
+# "text" (a few characters, such as "İ", lowercase to more than one).
+def fold(text):
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    return "".join(ch.lower()[0] for ch in text)
+
+
+# Flags marking the positions in "key" (the folded "original") that start a word.
+def word_starts(key, original):
+    starts = bytearray(len(key))
+    for i in range(len(key)):
+        if (i == 0) or (key[i - 1] in WORD_SEPARATORS) or (original[i].isupper() and original[i - 1].islower()):
+            starts[i] = 1
+    return starts
+
+
+# Regular expression matching "query" as a subsequence within one line of text where every
+# line starts with a newline. Matches start at that newline, a literal the engine searches
+# for quickly, so there is at most one (the leftmost) per line, and every query character
+# is a group so its position can be scored. Each gap is a possessive negated class that
+# stops at the next query character, which keeps the engine from backtracking.
+def subsequence_pattern(query):
+    parts = ["\n"]
+    for ch in query:
+        parts.append("[^\n" + re.escape(ch) + "]*+(" + re.escape(ch) + ")")
+    return re.compile("".join(parts))
+
+
+# Score a match from the group spans "regs" of a match (higher is better): matched
+# characters that start words, consecutive runs and a match at the very start of the name
+# add to it, gaps subtract.
+def match_score(regs, line_start, starts):
+    score = 16 * (len(regs) - 1)
+    previous = -2
+    for (position, _) in regs[1:]:
+        position -= line_start
+        if starts[position]:
+            score += 8
+        if position == previous + 1:
+            score += 6
+        elif previous >= 0:
+            score -= min(position - previous - 1, 8)
+        previous = position
+    if regs[1][0] == line_start:
+        score += 8
+    return score
+
+
+# Precomputed index over names for fuzzy matching on every keystroke. All keys are kept
+# joined in one string so subsequence matching runs inside the regular expression engine.
+# Character masks narrow the candidates when they are selective, and when the query grows
+# by appending characters only the previous query's matches are searched again.
+class FuzzyIndex:
+    def __init__(self, names):
+        self.names = list(names)
+        self.keys = [fold(name).replace("\n", " ") for name in self.names]
+        self.masks = [char_mask(key) for key in self.keys]
+        self.starts = [word_starts(key, name) for (key, name) in zip(self.keys, self.names)]
+        self.everything = self._joined(range(len(self.keys)))
+        self.single = self._single_character_results()
+        self._last_query = None
+        self._last_matches = None
+
+    def __len__(self):
+        return len(self.names)
+
+    # Joined text of the keys "ids", each preceded by a newline, with a map from the offsets
+    # of those newlines to key ids.
+    def _joined(self, ids):
+        offsets = {}
+        offset = 0
+        for i in ids:
+            offsets[offset] = i
+            offset += len(self.keys[i]) + 1
+        return "".join("\n" + self.keys[i] for i in ids), offsets
+
+    # Matches and ranked results for every one-character query, computed up front because
+    # those match most of the index and are typed on every first keystroke.
+    def _single_character_results(self):
+        results = {}
+        for (i, key) in enumerate(self.keys):
+            starts = self.starts[i]
+            for ch in set(key):
+                position = key.find(ch)
+                score = 16 + 8 * starts[position] + (8 if position == 0 else 0)
+                results.setdefault(ch, []).append((score, -len(key), i))
+        return {ch: ([i for (_, _, i) in scored], sorted(scored, reverse=True)) for (ch, scored) in results.items()}
+
+    # Return the best "limit" names for "query" as (score, name) pairs, best first.
+    def search(self, query, limit=10):
+        query = fold(query).replace(" ", "").replace("\n", "")
+        if not query:
+            self._last_query, self._last_matches = None, None
+            return [(0, name) for name in sorted(self.names, key=str.lower)[:limit]]
+        if len(query) == 1:
+            matches, ranked = self.single.get(query, ([], []))
+            self._last_query, self._last_matches = query, matches
+            return [(score, self.names[i]) for (score, _, i) in ranked[:limit]]
+        if (self._last_query is not None) and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            query_mask = char_mask(query)
+            masks = self.masks
+            candidates = [i for i in range(len(masks)) if query_mask & masks[i] == query_mask]
+        if len(candidates) > len(self.keys) // 2:
+            text, offsets = self.everything
+        else:
+            text, offsets = self._joined(candidates)
+        starts, keys = self.starts, self.keys
+        matches = []
+        scored = []
+        for match in subsequence_pattern(query).finditer(text):
+            regs = match.regs
+            i = offsets[regs[0][0]]
+            matches.append(i)
+            scored.append((match_score(regs, regs[0][0] + 1, starts[i]), -len(keys[i]), i))
+        self._last_query, self._last_matches = query, matches
+        return [(score, self.names[i]) for (score, _, i) in heapq.nlargest(limit, scored)]
+
+
+# Directory of prompt templates, one file per template, named by relative path.
+class TemplateStore:
+    def __init__(self, directory):
+        self.directory = os.fspath(directory)
+        self.paths = {}
+        self.index = FuzzyIndex([])
+
+    # Rescan the directory, rebuilding the index only if the set of templates changed.
+    def refresh(self):
+        paths = {}
+        stack = [self.directory]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                    stack.append(entry.path)
+                elif entry.name.endswith(TEMPLATE_EXTENSIONS) and not entry.name.startswith("."):
+                    name = os.path.splitext(os.path.relpath(entry.path, self.directory))[0]
+                    paths[name.replace(os.sep, "/")] = entry.path
+        if paths.keys() != self.paths.keys():
+            self.index = FuzzyIndex(sorted(paths))
+        self.paths = paths
+        return self
+
+    # Names of the best matching templates for "query".
+    def search(self, query, limit=10):
+        return [name for (_, name) in self.index.search(query, limit)]
+
+    # The body of the template called "name".
+    def load(self, name):
+        with open(self.paths[name], "r", encoding="utf-8") as f:
+            return f.read()
+
+
+# Time fuzzy queries over a synthetic library, one query per simulated keystroke.
+def benchmark(count=5000, queries=("review pr", "sqlopt", "tr jp", "emailfollowup", "xq"), repeat=20):
+    words = ["review", "pull", "request", "summarize", "email", "follow", "up", "translate",
+             "japanese", "sql", "optimize", "refactor", "python", "explain", "code", "bug",
+             "report", "meeting", "notes", "draft", "blog", "outline", "test", "cases"]
+    names = []
+    for i in range(count):
+        folder = words[i % 7]
+        parts = [words[(i * 7 + j * 13) % len(words)] for j in range(2 + i % 3)]
+        names.append(f"{folder}/{'-'.join(parts)}-{i}")
+    start = time.perf_counter()
+    index = FuzzyIndex(names)
+    build = time.perf_counter() - start
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            index.search("")
+            for n in range(1, len(query) + 1):
+                start = time.perf_counter()
+                index.search(query[:n])
+                timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"Fuzzy index over {count} templates (built in {build * 1000:.1f} ms)")
+    print(f"  keystrokes: {len(timings)}")
+    print(f"  median:     {timings[len(timings) // 2] * 1000:.3f} ms")
+    print(f"  p99:        {timings[int(len(timings) * 0.99)] * 1000:.3f} ms")
+    print(f"  max:        {timings[-1] * 1000:.3f} ms")
+    return timings
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,157 @@
+# Python libraries
+import json
+import threading
+import time
+
+
+# Message bus type that tells the page whether the overlay is hidden (payload true / false).
+HIDDEN_MESSAGE = "page.hidden"
+# Injected at document start (after the bus): lets the overlay report the page as hidden
+# through the visibility API, and pauses our own observers and CSS animations meanwhile.
+VISIBILITY_SCRIPT = """
+(function(){
+  const bus = window.__overlayBus;
+  if (!bus || window.__overlayVisibility) { return; }
+  window.__overlayVisibility = true;
+  let forced = false, style = null;
+  const hidden = Object.getOwnPropertyDescriptor(Document.prototype, 'hidden');
+  const state = Object.getOwnPropertyDescriptor(Document.prototype, 'visibilityState');
+  if (hidden && state) {
+    Object.defineProperty(Document.prototype, 'hidden', {configurable: true, enumerable: true,
+      get: function(){ return forced || hidden.get.call(this); }});
+    Object.defineProperty(Document.prototype, 'visibilityState', {configurable: true, enumerable: true,
+      get: function(){ return forced ? 'hidden' : state.get.call(this); }});
+  }
+  bus.on(%s, function(value){
+    value = !!value;
+    if (value === forced) { return true; }
+    forced = value;
+    if (forced) {
+      bus.pause();
+      style = document.createElement('style');
+      style.textContent = '*, *::before, *::after { animation-play-state: paused !important; }';
+      document.documentElement.appendChild(style);
+    } else {
+      if (style) { style.remove(); style = null; }
+      bus.resume();
+    }
+    document.dispatchEvent(new Event('visibilitychange'));
+    return true;
+  });
+})();
+""" % json.dumps(HIDDEN_MESSAGE)
+
+VISIBLE, HIDING, HIDDEN = "visible", "hiding", "hidden"
+
+
+# Human readable duration.
+def format_seconds(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+# Tracks whether the overlay is visible and throttles the page while it is hidden.
+#   visible -> hiding   on hide(); nothing is suspended yet, so quickly toggling the overlay
+#                       does not churn the page, and the CPU rate of the unthrottled hidden
+#                       page is measured as the baseline.
+#   hiding  -> hidden   "grace" seconds later: "suspend()" is called.
+#   hiding  -> visible  on show() within the grace period.
+#   hidden  -> visible  on show(): "resume()" is called and the CPU time saved is estimated
+#                       as baseline rate * hidden time - CPU time used while hidden.
+# "cpu_seconds()" returns the CPU time used so far by the overlay and its web processes and
+# "call_later(delay, fn)" schedules the end of the grace period. hide() and show() run on the
+# main thread, while stats() may also be read from other threads (the resource sampler).
+class HiddenModeController:
+    def __init__(self, suspend, resume, call_later, cpu_seconds, grace=5.0, smoothing=0.3, clock=time.monotonic):
+        self.suspend = suspend
+        self.resume = resume
+        self.call_later = call_later
+        self.cpu_seconds = cpu_seconds
+        self.grace = grace
+        self.smoothing = smoothing
+        self.clock = clock
+        self.state = VISIBLE
+        self.generation = 0
+        self.mark = None
+        self.baseline = None
+        self.hidden_seconds = 0.0
+        self.hidden_cpu = 0.0
+        self.saved_cpu = 0.0
+        self.periods = 0
+        self._lock = threading.Lock()
+
+    # Current time and CPU time.
+    def _measure(self):
+        return self.clock(), self.cpu_seconds()
+
+    def hide(self):
+        if self.state != VISIBLE:
+            return
+        mark = self._measure()
+        with self._lock:
+            self.state = HIDING
+            self.generation += 1
+            self.mark = mark
+            generation = self.generation
+        self.call_later(self.grace, lambda: self._enter(generation))
+
+    # End of the grace period started by hide() number "generation".
+    def _enter(self, generation):
+        if (self.state != HIDING) or (generation != self.generation):
+            return
+        now, cpu = self._measure()
+        with self._lock:
+            if now > self.mark[0]:
+                rate = max(0.0, cpu - self.mark[1]) / (now - self.mark[0])
+                if self.baseline is None:
+                    self.baseline = rate
+                else:
+                    self.baseline += self.smoothing * (rate - self.baseline)
+            self.state = HIDDEN
+            self.mark = (now, cpu)
+        try:
+            self.suspend()
+        except Exception as e:
+            print("Warning: Failed to suspend the hidden page:", e, flush=True)
+
+    def show(self):
+        if self.state == HIDING:
+            with self._lock:
+                self.state = VISIBLE
+                self.generation += 1
+        elif self.state == HIDDEN:
+            now, cpu = self._measure()
+            with self._lock:
+                elapsed, used = max(0.0, now - self.mark[0]), max(0.0, cpu - self.mark[1])
+                self.hidden_seconds += elapsed
+                self.hidden_cpu += used
+                if self.baseline is not None:
+                    self.saved_cpu += max(0.0, self.baseline * elapsed - used)
+                self.periods += 1
+                self.state = VISIBLE
+            try:
+                self.resume()
+            except Exception as e:
+                print("Warning: Failed to resume the page:", e, flush=True)
+
+    # Totals over completed hidden periods (a consistent snapshot, safe to read from any thread).
+    def stats(self):
+        with self._lock:
+            return {
+                "hidden_periods": self.periods,
+                "hidden_seconds": self.hidden_seconds,
+                "hidden_cpu_seconds": self.hidden_cpu,
+                "saved_cpu_seconds": self.saved_cpu,
+                "baseline_cpu_rate": self.baseline or 0.0,
+            }
+
+    # Short line for the status bar menu.
+    def summary_line(self):
+        stats = self.stats()
+        if not stats["hidden_periods"]:
+            return "Hidden mode: no hidden periods yet"
+        return (f"Hidden mode: saved ~{format_seconds(stats['saved_cpu_seconds'])} CPU"
+                f" over {format_seconds(stats['hidden_seconds'])} hidden")
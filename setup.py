@@ -6,6 +6,8 @@ except:
     class DependencyError(Exception): pass
     raise(DependencyError("Missing python package 'setuptools'.\n  pip install --user setuptools"))
 
+import importlib.util
+import json
 import os
 import sys
 
@@ -20,10 +22,30 @@ def read(f_name, empty_lines=False):
             text.append(line)
     return text
 
+# Bake the version metadata into the package that is imported (and shipped), so that
+# importing it reads no files.
+def write_about_module(version, author):
+    path = os.path.join(source_package, "_about.py")
+    with open(path, "w") as f:
+        f.write('# Generated from the "about" directory by setup.py, do not edit.\n')
+        f.write(f"__version__ = {json.dumps(version)}\n")
+        f.write(f"__author__ = {json.dumps(author)}\n")
+
+# Version and author of the imported package (loads its "_version.py" by path, so the
+# package itself and its dependencies are not imported).
+def read_source_about():
+    spec = importlib.util.spec_from_file_location("_version", os.path.join(source_package, "_version.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.read_about()
+
 # Go to the "about" directory in the package directory.
 source_page = "claude"
 package_name = f"macos-{source_page}-overlay"
 package_about = os.path.join(os.path.dirname(os.path.abspath(__file__)), package_name.replace("-","_"), "about")
+# Directory of the package the code is imported from (its "about" directory is the
+# source of the version in "_about.py").
+source_package = os.path.join(os.path.dirname(os.path.abspath(__file__)), "macos_gemini_overlay")
 
 if __name__ == "__main__":
     #      Read in the package description files
@@ -35,6 +57,7 @@ if __name__ == "__main__":
     classifiers = read("classifiers.txt")
     name, email, git_username = read("author.txt")
     requirements = read("requirements.txt")
+    write_about_module(*read_source_about())
     # Call "setup" to formally set up this module.
     if 'py2app' not in sys.argv:
         setup(
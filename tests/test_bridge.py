@@ -0,0 +1,168 @@
+# Python libraries
+import contextlib
+import io
+import json
+import shutil
+import subprocess
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.bridge import (
+    BUS_SCRIPT,
+    RECEIVE_SCRIPT,
+    BusError,
+    Envelope,
+    MessageBus,
+    decode_batch,
+    encode_batch,
+)
+from macos_gemini_overlay.streaming import STREAM_SCRIPT
+from macos_gemini_overlay.throttle import (
+    HIDDEN_MESSAGE,
+    VISIBILITY_SCRIPT,
+)
+
+# Runs the page scripts in node with a minimal stand-in for the DOM: mutation observers
+# record whether they are connected, and "report()" prints that for every observer.
+HARNESS = """
+const observers = [];
+class MutationObserver {
+  constructor(callback){ this.callback = callback; this.connected = false; observers.push(this); }
+  observe(){ this.connected = true; }
+  disconnect(){ this.connected = false; }
+}
+const document = {
+  hidden: false, body: {}, documentElement: {appendChild: function(){}},
+  querySelectorAll: function(){ return []; },
+  createElement: function(){ return {remove: function(){}}; },
+  dispatchEvent: function(){}
+};
+class Document {}
+Object.defineProperty(Document.prototype, 'hidden', {configurable: true, get: function(){ return false; }});
+Object.defineProperty(Document.prototype, 'visibilityState', {configurable: true, get: function(){ return 'visible'; }});
+class Event { constructor(type){ this.type = type; } }
+const window = {webkit: {messageHandlers: {overlayBus: {postMessage: function(){}}}}};
+globalThis.window = window;
+function requestAnimationFrame(fn){ setTimeout(fn, 0); }
+function report(){ return observers.map(function(o){ return o.connected; }); }
+%s
+%s
+%s
+window.__overlayBus.observe(document.body, {}, function(){});
+const results = {before: report()};
+window.__overlayBus.receive([{type: %s, seq: 1, payload: true}]);
+setTimeout(function(){
+  results.hidden = report();
+  window.__overlayBus.receive([{type: %s, seq: 2, payload: false}]);
+  setTimeout(function(){
+    results.shown = report();
+    console.log(JSON.stringify(results));
+  }, 10);
+}, 10);
+"""
+
+
+class EnvelopeCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        envelopes = [
+            Envelope("prompt.insert", 1, {"text": "hi"}, True, None, None),
+            Envelope("prompt.insert", 2, True, False, 1, None),
+            Envelope("page.click", 3, None, False, 2, "No page handler"),
+        ]
+        body = encode_batch(envelopes)
+        self.assertEqual(json.loads(body)[0], {"type": "prompt.insert", "seq": 1, "payload": {"text": "hi"}, "reply": True})
+        self.assertNotIn("reply", json.loads(body)[1])
+        self.assertEqual(decode_batch(body), envelopes)
+
+    def test_malformed_batches(self):
+        for body in ("{", "{}", '[{"seq": 1}]', '[{"type": "x", "seq": "1"}]', "[1]", None):
+            with self.assertRaises(BusError, msg=body):
+                decode_batch(body)
+
+
+class MessageBusTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.sent = []
+        self.soon = []
+        self.later = []
+        self.bus = MessageBus(self.sent.append, self.soon.append, lambda delay, fn: self.later.append((delay, fn)),
+                              default_timeout=5.0, clock=lambda: self.now)
+
+    # Run what was scheduled for the end of the run loop turn, returning the batches sent.
+    def flush(self):
+        while self.soon:
+            self.soon.pop(0)()
+        prefix, suffix = RECEIVE_SCRIPT.split("%s")
+        batches = [decode_batch(script[len(prefix):-len(suffix)]) for script in self.sent]
+        self.sent.clear()
+        return batches
+
+    def test_messages_queued_together_go_out_as_one_batch(self):
+        self.bus.emit("page.hidden", True)
+        self.bus.request("prompt.focus")
+        self.assertEqual(len(self.soon), 1)
+        (batch,) = self.flush()
+        self.assertEqual([(e.type, e.payload, e.reply) for e in batch], [("page.hidden", True, False), ("prompt.focus", None, True)])
+
+    def test_request_reply(self):
+        replies = []
+        seq = self.bus.request("page.click", {"selectors": ["a"]}, lambda result, error: replies.append((result, error)))
+        self.flush()
+        self.bus.receive(encode_batch([Envelope("page.click", 7, True, False, seq, None)]))
+        self.assertEqual(replies, [(True, None)])
+        # A late duplicate, or a reply after the timeout, is ignored.
+        self.bus.receive(encode_batch([Envelope("page.click", 8, False, False, seq, None)]))
+        self.now = 10.0
+        self.bus.expire()
+        self.assertEqual(replies, [(True, None)])
+
+    def test_request_error_and_timeout(self):
+        replies = []
+        failing = self.bus.request("page.click", None, lambda result, error: replies.append(("failing", error)))
+        self.bus.request("prompt.focus", None, lambda result, error: replies.append(("slow", error)), timeout=1.0)
+        self.assertEqual([delay for (delay, _) in self.later], [5.0, 1.0])
+        self.bus.receive(encode_batch([Envelope("page.click", 1, None, False, failing, "No page handler for page.click")]))
+        self.now = 1.0
+        self.later[1][1]()
+        self.assertEqual(replies, [("failing", "No page handler for page.click"), ("slow", "Timed out waiting for a reply to 'prompt.focus'")])
+
+    def test_page_messages_are_dispatched_and_requests_answered(self):
+        received = []
+        self.bus.on("page.background", received.append)
+        self.bus.on("page.double", lambda payload: payload * 2)
+        self.bus.on("page.fail", lambda payload: 1 / 0)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.bus.receive(encode_batch([
+                Envelope("page.background", 0, "rgb(0, 0, 0)", False, None, None),
+                Envelope("page.double", 1, 21, True, None, None),
+                Envelope("page.fail", 2, None, True, None, None),
+                Envelope("page.unknown", 3, None, True, None, None),
+                Envelope("page.unknown", 4, None, False, None, None),
+            ]))
+            self.bus.receive("not json")
+        self.assertEqual(received, ["rgb(0, 0, 0)"])
+        (batch,) = self.flush()
+        self.assertEqual([(e.reply_to, e.payload) for e in batch], [(1, 42), (2, None), (3, None)])
+        self.assertIsNone(batch[0].error)
+        self.assertEqual(batch[1].error, "ZeroDivisionError: division by zero")
+        self.assertEqual(batch[2].error, "No handler for message type 'page.unknown'")
+        self.assertEqual(output.getvalue().count("Warning:"), 3)
+
+
+@unittest.skipUnless(shutil.which("node"), "node is not installed")
+class HiddenModeObserverTest(unittest.TestCase):
+    # Hidden mode pauses the observers of injected scripts, but not the stream export
+    # observer (registered with "pausable" false), so export continues while hidden.
+    def test_stream_export_keeps_observing_while_hidden(self):
+        script = HARNESS % (BUS_SCRIPT, VISIBILITY_SCRIPT, STREAM_SCRIPT, json.dumps(HIDDEN_MESSAGE), json.dumps(HIDDEN_MESSAGE))
+        output = subprocess.run(["node", "-e", script], capture_output=True, text=True, timeout=30, check=True).stdout
+        results = json.loads(output)
+        # The stream export observer first, then an ordinary (pausable) one.
+        self.assertEqual(results["before"], [True, True])
+        self.assertEqual(results["hidden"], [True, False])
+        self.assertEqual(results["shown"], [True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
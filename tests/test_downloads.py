@@ -0,0 +1,198 @@
+# Python libraries
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local libraries
+from macos_gemini_overlay.downloads import (
+    CANCEL,
+    CANCELLED,
+    DONE,
+    FAILED,
+    PART_SUFFIX,
+    PAUSE,
+    PAUSED,
+    RESUME,
+    DownloadManager,
+    RecentUrls,
+    can_refetch,
+)
+
+
+BODY = bytes(range(256)) * 1024
+ETAG = '"v1"'
+
+
+# Serves BODY with range support. "/flaky.bin" drops the connection halfway through its first
+# full response and "/slow.bin" trickles the body out, so downloads can be stopped midway.
+# "/redirect?to=<url>" redirects, and the cookies received by each server are recorded.
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+    cookies = []
+    lock = threading.Lock()
+    flaky_failed = False
+
+    def do_GET(self):
+        with self.lock:
+            self.requests.append((self.path, self.headers.get("Range")))
+            self.cookies.append((self.server.server_address[0], self.headers.get("Cookie")))
+        if self.path.startswith("/redirect?"):
+            self.send_response(302)
+            self.send_header("Location", parse_qs(urlsplit(self.path).query)["to"][0])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path not in ("/file.bin", "/flaky.bin", "/slow.bin"):
+            self.send_error(404)
+            return
+        start = 0
+        byte_range = self.headers.get("Range")
+        if byte_range and (self.headers.get("If-Range") == ETAG):
+            start = int(byte_range.split("=")[1].rstrip("-"))
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(BODY) - start))
+        self.send_header("ETag", ETAG)
+        self.send_header("Accept-Ranges", "bytes")
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+        self.end_headers()
+        body = BODY[start:]
+        try:
+            if (self.path == "/flaky.bin") and not Handler.flaky_failed:
+                Handler.flaky_failed = True
+                self.wfile.write(body[:len(body) // 2])
+            elif self.path == "/slow.bin":
+                for i in range(0, len(body), 4096):
+                    self.wfile.write(body[i:i + 4096])
+                    self.wfile.flush()
+                    time.sleep(0.01)
+            else:
+                self.wfile.write(body)
+        except ConnectionError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Wait for "predicate" to hold (polling, the manager notifies from its own threads).
+def wait_until(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class DownloadManagerTest(unittest.TestCase):
+    # Two servers on different loopback hosts, for redirects from one to the other.
+    @classmethod
+    def setUpClass(cls):
+        cls.servers = []
+        for host in ("127.0.0.1", "127.0.0.2"):
+            server = ThreadingHTTPServer((host, 0), Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            cls.servers.append(server)
+        cls.base = f"http://127.0.0.1:{cls.servers[0].server_port}"
+        cls.other_base = f"http://127.0.0.2:{cls.servers[1].server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in cls.servers:
+            server.shutdown()
+            server.server_close()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.manager = DownloadManager(self.directory.name, chunk_size=4096, max_buffer=16 * 1024, timeout=5)
+        Handler.requests = []
+        Handler.cookies = []
+        Handler.flaky_failed = False
+
+    def read(self, download):
+        with open(download.path, "rb") as f:
+            return f.read()
+
+    def test_completes(self):
+        download = self.manager.add(self.base + "/file.bin")
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, DONE)
+        self.assertEqual(self.read(download), BODY)
+        self.assertEqual(os.listdir(self.directory.name), ["file.bin"])
+        self.assertEqual(download.actions(), ())
+
+    def test_resumes_after_interruption(self):
+        download = self.manager.add(self.base + "/flaky.bin")
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, FAILED)
+        self.assertTrue(os.path.exists(download.path + PART_SUFFIX))
+        self.assertEqual(download.actions(), (RESUME, CANCEL))
+        self.manager.resume(download.id)
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, DONE)
+        self.assertEqual(self.read(download), BODY)
+        self.assertEqual(Handler.requests[-1], ("/flaky.bin", f"bytes={len(BODY) // 2}-"))
+        self.assertEqual(os.listdir(self.directory.name), ["flaky.bin"])
+
+    def test_pause_and_resume(self):
+        download = self.manager.add(self.base + "/slow.bin")
+        wait_until(lambda: download.received > 0)
+        self.assertEqual(download.actions(), (PAUSE, CANCEL))
+        self.manager.pause(download.id)
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, PAUSED)
+        paused_at = download.received
+        self.assertLess(paused_at, len(BODY))
+        self.manager.resume(download.id)
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, DONE)
+        self.assertEqual(self.read(download), BODY)
+        self.assertEqual(Handler.requests[-1], ("/slow.bin", f"bytes={paused_at}-"))
+
+    def test_cancel(self):
+        download = self.manager.add(self.base + "/slow.bin")
+        wait_until(lambda: download.received > 0)
+        self.manager.cancel(download.id)
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, CANCELLED)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_cookies_follow_redirects_on_the_same_host_only(self):
+        headers = {"Cookie": "sessionKey=SECRET"}
+        download = self.manager.add(f"{self.base}/redirect?to={self.other_base}/file.bin", headers=headers)
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, DONE)
+        self.assertEqual(self.read(download), BODY)
+        self.assertEqual(Handler.cookies, [("127.0.0.1", "sessionKey=SECRET"), ("127.0.0.2", None)])
+        Handler.cookies = []
+        download = self.manager.add(f"{self.base}/redirect?to={self.base}/file.bin", headers=headers)
+        self.assertTrue(self.manager.wait(10))
+        self.assertEqual(download.state, DONE)
+        self.assertEqual(Handler.cookies, [("127.0.0.1", "sessionKey=SECRET")] * 2)
+
+    def test_unsafe_urls_are_left_to_webkit(self):
+        unsafe = RecentUrls(limit=2)
+        posted = self.base + "/file.bin?form=1"
+        self.assertTrue(can_refetch(posted, unsafe))
+        unsafe.add(posted)
+        self.assertFalse(can_refetch(posted, unsafe))
+        self.assertTrue(can_refetch(self.base + "/file.bin", unsafe))
+        self.assertFalse(can_refetch("blob:https://example.com/1", unsafe))
+        self.assertFalse(can_refetch("data:text/plain,hi", unsafe))
+        # Only the most recent addresses are remembered.
+        unsafe.add(self.base + "/a")
+        unsafe.add(posted)
+        unsafe.add(self.base + "/b")
+        self.assertEqual(len(unsafe), 2)
+        self.assertIn(posted, unsafe)
+        self.assertNotIn(self.base + "/a", unsafe)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+# Python libraries
+import contextlib
+import io
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.hotkeys import (
+    SEQUENCE_TIMEOUT,
+    Chord,
+    HotkeyManager,
+    select_backend,
+)
+
+
+OPTION, COMMAND = 1 << 19, 1 << 20
+SPACE, K, J = 49, 40, 38
+
+
+# Backend that records what it was asked to do; key presses are delivered with press().
+class FakeBackend:
+    def __init__(self, name, receives_all_keys, available=True, refuse=()):
+        self.name = name
+        self.needs_accessibility = receives_all_keys
+        self.receives_all_keys = receives_all_keys
+        self.is_available = available
+        self.refuse = set(refuse)
+        self.handler = None
+        self.registered = set()
+        self.starts = 0
+
+    def available(self):
+        return self.is_available
+
+    def start(self, handler):
+        self.handler = handler
+        self.starts += 1
+        return True
+
+    def stop(self):
+        self.handler = None
+
+    def register(self, chord):
+        if chord in self.refuse:
+            return False
+        self.registered.add(chord)
+        return True
+
+    def unregister(self, chord):
+        self.registered.discard(chord)
+
+    def press(self, flags, key):
+        return self.handler(flags, key, None)
+
+
+def quietly(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        return fn(*args, **kwargs), output.getvalue()
+
+
+class SelectBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.carbon = FakeBackend("carbon", receives_all_keys=False)
+        self.tap = FakeBackend("tap", receives_all_keys=True)
+        self.backends = [self.carbon, self.tap]
+
+    def test_auto(self):
+        self.assertIs(select_backend(self.backends), self.carbon)
+        self.assertIs(select_backend(self.backends, needs_all_keys=True), self.tap)
+        self.carbon.is_available = False
+        self.assertIs(select_backend(self.backends), self.tap)
+
+    def test_explicit_preference(self):
+        self.assertIs(select_backend(self.backends, "tap"), self.tap)
+        self.carbon.is_available = False
+        backend, output = quietly(select_backend, self.backends, "carbon")
+        self.assertIs(backend, self.tap)
+        self.assertIn("cannot be used here", output)
+
+    def test_unknown_preference_falls_back_to_auto(self):
+        backend, output = quietly(select_backend, self.backends, "carbn")
+        self.assertIs(backend, self.carbon)
+        self.assertIn("Unknown hotkey backend 'carbn'", output)
+
+    def test_nothing_available(self):
+        self.carbon.is_available = self.tap.is_available = False
+        with self.assertRaises(RuntimeError):
+            select_backend(self.backends)
+
+
+class HotkeyManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.carbon = FakeBackend("carbon", receives_all_keys=False)
+        self.tap = FakeBackend("tap", receives_all_keys=True)
+        self.manager = HotkeyManager([self.carbon, self.tap], clock=lambda: self.now)
+        self.calls = []
+
+    def bind(self, name, trigger):
+        self.manager.bind(name, trigger, lambda: self.calls.append(name))
+
+    def start(self):
+        result, _ = quietly(self.manager.start)
+        return result
+
+    def test_single_chords_are_registered_and_dispatched(self):
+        self.bind("toggle", {"flags": OPTION, "key": SPACE})
+        self.assertTrue(self.start())
+        self.assertIs(self.manager.backend, self.carbon)
+        self.assertEqual(self.carbon.registered, {Chord(OPTION, SPACE)})
+        self.assertTrue(self.carbon.press(OPTION, SPACE))
+        self.assertFalse(self.carbon.press(OPTION, K))
+        self.assertEqual(self.calls, ["toggle"])
+        self.manager.unbind("toggle")
+        self.assertEqual(self.carbon.registered, set())
+
+    def test_refused_registration_is_reported(self):
+        self.carbon.refuse.add(Chord(OPTION, SPACE))
+        self.bind("toggle", {"flags": OPTION, "key": SPACE})
+        _, output = quietly(self.manager.start)
+        self.assertIn("Could not register hotkey", output)
+
+    def test_sequences_need_a_backend_that_sees_every_key(self):
+        self.bind("toggle", {"flags": OPTION, "key": SPACE})
+        self.start()
+        _, output = quietly(self.bind, "jump", [{"flags": COMMAND, "key": K}, {"flags": COMMAND, "key": J}])
+        self.assertIs(self.manager.backend, self.tap)
+        self.assertIsNone(self.carbon.handler)
+        self.assertTrue(self.tap.press(COMMAND, K))
+        self.assertEqual(self.calls, [])
+        self.assertTrue(self.tap.press(COMMAND, J))
+        self.assertEqual(self.calls, ["jump"])
+
+    def test_sequence_timeout_and_broken_sequences(self):
+        self.bind("toggle", {"flags": OPTION, "key": SPACE})
+        self.bind("jump", [{"flags": COMMAND, "key": K}, {"flags": COMMAND, "key": J}])
+        self.start()
+        self.assertTrue(self.tap.press(COMMAND, K))
+        self.now += SEQUENCE_TIMEOUT + 0.1
+        self.assertFalse(self.tap.press(COMMAND, J))
+        # A key that breaks the sequence can still be a binding of its own.
+        self.assertTrue(self.tap.press(COMMAND, K))
+        self.assertTrue(self.tap.press(OPTION, SPACE))
+        self.assertEqual(self.calls, ["toggle"])
+        self.assertFalse(self.tap.press(COMMAND, J))
+
+    def test_capture_uses_a_backend_that_sees_every_key(self):
+        self.bind("toggle", {"flags": OPTION, "key": SPACE})
+        self.start()
+        captured = []
+        self.assertTrue(self.manager.capture(lambda event, flags, key: captured.append((flags, key))))
+        self.assertEqual(self.carbon.registered, set())
+        self.assertTrue(self.tap.press(OPTION, SPACE))
+        self.assertEqual(captured, [(OPTION, SPACE)])
+        self.assertEqual(self.calls, [])
+        # Back to the registered hotkeys afterwards.
+        self.assertIsNone(self.tap.handler)
+        self.assertEqual(self.carbon.registered, {Chord(OPTION, SPACE)})
+        self.assertTrue(self.carbon.press(OPTION, SPACE))
+        self.assertEqual(self.calls, ["toggle"])
+
+    def test_recorder_sees_every_dispatched_key(self):
+        self.bind("toggle", {"flags": OPTION, "key": SPACE})
+        recorded = []
+        self.manager.recorder = lambda flags, key: recorded.append((flags, key))
+        self.start()
+        self.assertIs(self.manager.backend, self.tap)
+        self.tap.press(0, K)
+        self.tap.press(OPTION, SPACE)
+        self.assertEqual(recorded, [(0, K), (OPTION, SPACE)])
+        self.assertEqual(self.calls, ["toggle"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+# Python libraries
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.imaging import (
+    CHANNEL_ORDERS,
+    PixelBuffer,
+)
+
+
+class ChannelOrderTest(unittest.TestCase):
+    def test_argb(self):
+        pixels = PixelBuffer.from_raw(1, 1, bytes([1, 2, 3, 4]), order="ARGB")
+        self.assertEqual(pixels.data, bytes([2, 3, 4, 1]))
+
+    def test_bgra(self):
+        pixels = PixelBuffer.from_raw(1, 1, bytes([1, 2, 3, 4]), order="BGRA")
+        self.assertEqual(pixels.data, bytes([3, 2, 1, 4]))
+
+    # Every order read back from raw bytes written in that order gives the original pixels.
+    def test_round_trip(self):
+        width, height = 3, 2
+        rgba = bytes(range(width * height * 4))
+        for (order, channels) in CHANNEL_ORDERS.items():
+            with self.subTest(order=order):
+                raw = bytearray(len(rgba))
+                for (offset, channel) in enumerate(channels):
+                    raw[offset::4] = rgba[channel::4]
+                pixels = PixelBuffer.from_raw(width, height, bytes(raw), order=order)
+                self.assertEqual(pixels.data, rgba)
+
+    def test_stride(self):
+        row = bytes([1, 2, 3, 4, 5, 6, 7, 8])
+        padded = row + b"\0\0\0\0" + row + b"\0\0\0\0"
+        pixels = PixelBuffer.from_raw(2, 2, padded, stride=12, order="ARGB")
+        self.assertEqual(pixels.pixel(1, 1), (6, 7, 8, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# Python libraries
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.keymap import (
+    TABLE_FORMAT,
+    US_CHARACTERS,
+    US_LAYOUT_ID,
+    KeymapCache,
+    build_table,
+    cache_name,
+    character_label,
+    format_trigger,
+)
+
+
+OPTION, COMMAND = 1 << 19, 1 << 20
+
+# Fixture layouts: the US table with the keys that differ on German and French keyboards.
+GERMAN_ID = "com.apple.keylayout.German"
+GERMAN = {**US_CHARACTERS, 6: "y", 16: "z", 33: "ü", 41: "ö", 39: "ä", 27: "ß"}
+FRENCH_ID = "com.apple.keylayout.French"
+FRENCH = {**US_CHARACTERS, 0: "q", 12: "a", 13: "z", 6: "w", 46: ",", 18: "&", 29: "à"}
+LAYOUTS = {US_LAYOUT_ID: US_CHARACTERS, GERMAN_ID: GERMAN, FRENCH_ID: FRENCH}
+
+
+class LabelTest(unittest.TestCase):
+    def test_character_label(self):
+        self.assertEqual(character_label("a"), "A")
+        self.assertEqual(character_label("ß"), "ß")
+        self.assertEqual(character_label("\x10"), "")
+        self.assertEqual(character_label(None), "")
+
+    def test_build_table(self):
+        table = build_table(GERMAN.get)
+        self.assertEqual((table[16], table[6], table[33]), ("Z", "Y", "Ü"))
+        self.assertEqual((table[49], table[82], table[122]), ("Space", "Keypad 0", "F1"))
+        # Keys the layout does not type are left out.
+        self.assertNotIn(10, table)
+
+    def test_format_trigger(self):
+        table = build_table(US_CHARACTERS.get)
+        self.assertEqual(format_trigger(table, {"flags": OPTION, "key": 49}), "Option + Space")
+        sequence = [{"flags": COMMAND, "key": 40}, {"flags": COMMAND, "key": 10}]
+        self.assertEqual(format_trigger(table, sequence), "Command + K, then Command + Key 10")
+
+
+class KeymapCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.layout = US_LAYOUT_ID
+        self.built = []
+
+    def characters_for(self, layout_id):
+        self.built.append(layout_id)
+        return LAYOUTS[layout_id].get
+
+    def cache(self):
+        return KeymapCache(self.directory.name, lambda: self.layout, self.characters_for)
+
+    def path(self, layout_id):
+        return os.path.join(self.directory.name, cache_name(layout_id))
+
+    def test_tables_follow_the_layout(self):
+        keymap = self.cache()
+        self.assertEqual(keymap.label(16), "Y")
+        self.layout = GERMAN_ID
+        # Unchanged until the layout change is reported.
+        self.assertEqual(keymap.label(16), "Y")
+        keymap.invalidate()
+        self.assertEqual(keymap.label(16), "Z")
+        self.assertEqual(keymap.format({"flags": COMMAND, "key": 41}), "Command + Ö")
+        self.layout = US_LAYOUT_ID
+        keymap.invalidate()
+        self.assertEqual(keymap.label(16), "Y")
+        self.assertEqual(self.built, [US_LAYOUT_ID, GERMAN_ID])
+
+    def test_tables_are_cached_on_disk(self):
+        self.layout = FRENCH_ID
+        self.assertEqual(self.cache().label(0), "Q")
+        with open(self.path(FRENCH_ID)) as f:
+            data = json.load(f)
+        self.assertEqual((data["format"], data["layout"], data["labels"]["0"]), (TABLE_FORMAT, FRENCH_ID, "Q"))
+        # A new cache (next launch) reads the file instead of the layout.
+        self.assertEqual(self.cache().label(29), "À")
+        self.assertEqual(self.built, [FRENCH_ID])
+
+    def test_stale_cache_files_are_rebuilt(self):
+        self.layout = GERMAN_ID
+        for data in (
+            {"format": TABLE_FORMAT - 1, "layout": GERMAN_ID, "labels": {"16": "Old"}},
+            {"format": TABLE_FORMAT, "layout": FRENCH_ID, "labels": {"16": "Other"}},
+            {"format": TABLE_FORMAT, "layout": GERMAN_ID},
+            "not an object",
+        ):
+            with open(self.path(GERMAN_ID), "w") as f:
+                json.dump(data, f)
+            self.assertEqual(self.cache().label(16), "Z", data)
+        with open(self.path(GERMAN_ID), "w") as f:
+            f.write("{broken")
+        self.assertEqual(self.cache().label(16), "Z")
+        self.assertEqual(self.built, [GERMAN_ID] * 5)
+        with open(self.path(GERMAN_ID)) as f:
+            self.assertEqual(json.load(f)["format"], TABLE_FORMAT)
+
+    def test_unreadable_layout_falls_back_to_us_labels(self):
+        self.layout = "com.example.keylayout.Broken"
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            keymap = self.cache()
+            self.assertEqual(keymap.label(16), "Y")
+        self.assertIn("using US labels", output.getvalue())
+
+    def test_unknown_layout_id_uses_the_us_table(self):
+        for current_layout in (lambda: None, lambda: 1 / 0):
+            keymap = KeymapCache(self.directory.name, current_layout, self.characters_for)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(keymap.label(12), "Q")
+        self.assertTrue(os.path.exists(self.path(US_LAYOUT_ID)))
+        self.assertEqual(self.built, [US_LAYOUT_ID])
+
+    def test_unwritable_cache_directory(self):
+        blocker = os.path.join(self.directory.name, "file")
+        open(blocker, "w").close()
+        keymap = KeymapCache(os.path.join(blocker, "keymaps"), lambda: GERMAN_ID, self.characters_for)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(keymap.label(16), "Z")
+        self.assertIn("Could not cache the key labels", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# Python libraries
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from collections import namedtuple
+
+# Local libraries
+from macos_gemini_overlay.profiling import (
+    PHASES_FILE,
+    PROFILE_ENV,
+    PROFILE_FILE,
+    PROFILE_FLAG,
+    SPEEDSCOPE_FILE,
+    SPEEDSCOPE_SCHEMA,
+    PhaseRecorder,
+    profiling_requested,
+    stats_to_speedscope,
+)
+
+
+# Something for the profiler to see.
+def busy_work(n=20000):
+    return len("".join(sorted(str(i) for i in range(n))))
+
+
+# Raw pstats data: {function: (calls, primitive calls, own time, total time, {caller: edge})}.
+FakeStats = namedtuple("FakeStats", ["stats"])
+
+
+class ProfilingRequestedTest(unittest.TestCase):
+    def test_flag_and_environment(self):
+        self.assertTrue(profiling_requested([PROFILE_FLAG], {}))
+        self.assertFalse(profiling_requested([], {}))
+        for value in ("1", "yes", "true"):
+            self.assertTrue(profiling_requested([], {PROFILE_ENV: value}), value)
+        for value in ("", "0", "off", " False "):
+            self.assertFalse(profiling_requested([], {PROFILE_ENV: value}), value)
+
+
+class PhaseRecorderTest(unittest.TestCase):
+    def test_phases_and_table(self):
+        now = [10.0]
+        recorder = PhaseRecorder(clock=lambda: now[0])
+        # Nothing is recorded before "start".
+        recorder.begin("ignored")
+        self.assertFalse(recorder.finish())
+        recorder.start(profile=False)
+        with recorder.phase("settings"):
+            now[0] += 0.1
+        recorder.begin("window")
+        now[0] += 0.3
+        recorder.begin("first navigation")
+        recorder.end("window")
+        now[0] += 0.6
+        self.assertTrue(recorder.finish())
+        self.assertEqual([p.name for p in recorder.phases], ["settings", "window", "first navigation (unfinished)"])
+        lines = recorder.table().splitlines()
+        self.assertEqual(lines[0].split(), ["Phase", "Start", "ms", "Duration", "ms", "Share"])
+        self.assertEqual(lines[1].split(), ["settings", "0.0", "100.0", "10.0%"])
+        self.assertEqual(lines[2].split(), ["window", "100.0", "300.0", "30.0%"])
+        self.assertEqual(lines[3].split(), ["first", "navigation", "(unfinished)", "400.0", "600.0", "60.0%"])
+        self.assertEqual(lines[4].split(), ["Total", "0.0", "1000.0", "100.0%"])
+        # A finished recorder cannot be started again.
+        recorder.start()
+        self.assertFalse(recorder.enabled)
+
+    def test_profile_files(self):
+        recorder = PhaseRecorder()
+        recorder.start()
+        with recorder.phase("work"):
+            busy_work()
+        recorder.finish()
+        with tempfile.TemporaryDirectory() as directory:
+            paths = recorder.write(directory)
+            self.assertEqual([os.path.basename(path) for path in paths], [PHASES_FILE, PROFILE_FILE, SPEEDSCOPE_FILE])
+            with open(paths[0]) as f:
+                self.assertTrue(f.read().splitlines()[1].startswith("work "))
+            functions = {name for (_, _, name) in pstats.Stats(paths[1]).stats}
+            self.assertIn("busy_work", functions)
+            with open(paths[2]) as f:
+                document = json.load(f)
+        self.assertSpeedscope(document)
+        names = {frame["name"] for frame in document["shared"]["frames"]}
+        self.assertIn("busy_work", names)
+
+    # The parts of the speedscope file format schema used by a "sampled" profile.
+    def assertSpeedscope(self, document):
+        self.assertEqual(document["$schema"], SPEEDSCOPE_SCHEMA)
+        self.assertIsInstance(document["name"], str)
+        self.assertIsInstance(document["exporter"], str)
+        frames = document["shared"]["frames"]
+        for frame in frames:
+            self.assertIsInstance(frame["name"], str)
+            self.assertLessEqual(set(frame), {"name", "file", "line", "col"})
+            if "line" in frame:
+                self.assertIsInstance(frame["file"], str)
+                self.assertIsInstance(frame["line"], int)
+        self.assertEqual(len(document["profiles"]), 1)
+        profile = document["profiles"][0]
+        self.assertEqual(profile["type"], "sampled")
+        self.assertIn(profile["unit"], ("none", "nanoseconds", "microseconds", "milliseconds", "seconds", "bytes"))
+        self.assertEqual(len(profile["samples"]), len(profile["weights"]))
+        self.assertTrue(profile["samples"])
+        for stack in profile["samples"]:
+            self.assertTrue(all(isinstance(i, int) and 0 <= i < len(frames) for i in stack))
+        self.assertTrue(all(weight > 0 for weight in profile["weights"]))
+        self.assertEqual(profile["startValue"], 0)
+        self.assertAlmostEqual(profile["endValue"], sum(profile["weights"]))
+
+
+class SpeedscopeTest(unittest.TestCase):
+    # main (0.1 s own) calls helper twice (0.2 s + 0.2 s own), helper is recursive once,
+    # and a built-in (file "~") is called from helper.
+    def test_stacks_are_rebuilt_from_call_edges(self):
+        main = ("app.py", 1, "main")
+        helper = ("app.py", 10, "helper")
+        builtin = ("~", 0, "<built-in method len>")
+        stats = FakeStats({
+            main: (1, 1, 0.1, 0.6, {}),
+            helper: (3, 2, 0.4, 0.5, {main: (2, 2, 0.4, 0.5), helper: (1, 0, 0.1, 0.1)}),
+            builtin: (2, 2, 0.1, 0.1, {helper: (2, 2, 0.1, 0.1)}),
+        })
+        document = stats_to_speedscope(stats, name="Test")
+        PhaseRecorderTest.assertSpeedscope(self, document)
+        frames = document["shared"]["frames"]
+        self.assertIn({"name": "<built-in method len>"}, frames)
+        self.assertIn({"name": "main", "file": "app.py", "line": 1}, frames)
+        profile = document["profiles"][0]
+        stacks = {tuple(frames[i]["name"] for i in stack): weight for (stack, weight) in zip(profile["samples"], profile["weights"])}
+        self.assertEqual(set(stacks), {("main",), ("main", "helper"), ("main", "helper", "<built-in method len>")})
+        self.assertAlmostEqual(stacks[("main",)], 0.1)
+        self.assertAlmostEqual(stacks[("main", "helper")], 0.4)
+        self.assertAlmostEqual(stacks[("main", "helper", "<built-in method len>")], 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
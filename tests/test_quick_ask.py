@@ -0,0 +1,174 @@
+# Python libraries
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.quick_ask import (
+    BUFFERING,
+    HANDING_OFF,
+    IDLE,
+    QuickAsk,
+    prefill_url,
+)
+
+
+class PrefillUrlTest(unittest.TestCase):
+    def test_query_is_replaced(self):
+        self.assertEqual(prefill_url("https://claude.ai/new", "hi there"), "https://claude.ai/new?q=hi+there")
+        self.assertEqual(prefill_url("https://claude.ai/new?q=old&x=1", "a&b"), "https://claude.ai/new?x=1&q=a%26b")
+
+
+# QuickAsk wired to recorders; inserts stay in flight until finish_insert() is called.
+class QuickAskTest(unittest.TestCase):
+    def setUp(self):
+        self.inserts = []
+        self.fallbacks = []
+        self.closed = []
+        self.timers = []
+        self.quick_ask = QuickAsk(
+            insert=lambda text, submit, done: self.inserts.append((text, submit, done)),
+            fallback=lambda text, submit: self.fallbacks.append((text, submit)),
+            close=self.closed.append,
+            call_later=lambda delay, fn: self.timers.append((delay, fn)),
+            ready_timeout=5.0,
+        )
+
+    def finish_insert(self, ok=True):
+        text, submit, done = self.inserts[-1]
+        done(ok)
+        return (text, submit)
+
+    def fire_timers(self):
+        timers, self.timers = self.timers, []
+        for (_, fn) in timers:
+            fn()
+
+    def test_ready_page_skips_the_field(self):
+        self.quick_ask.page_ready()
+        self.assertFalse(self.quick_ask.summon())
+        self.assertEqual(self.quick_ask.state, IDLE)
+        # Typing and keys are ignored while idle.
+        self.quick_ask.typed("ignored")
+        self.quick_ask.submit()
+        self.assertEqual((self.inserts, self.timers), ([], []))
+
+    def test_buffer_is_handed_over_when_the_page_gets_ready(self):
+        self.assertTrue(self.quick_ask.summon())
+        self.assertEqual(self.quick_ask.state, BUFFERING)
+        self.quick_ask.typed("Hello")
+        self.assertEqual(self.inserts, [])
+        self.quick_ask.page_ready()
+        self.assertEqual(self.quick_ask.state, HANDING_OFF)
+        self.assertEqual(self.finish_insert(), ("Hello", False))
+        self.assertEqual(self.quick_ask.state, IDLE)
+        self.assertEqual(self.closed, [True])
+        self.assertEqual(self.fallbacks, [])
+
+    def test_summon_again_keeps_the_field(self):
+        self.assertTrue(self.quick_ask.summon())
+        self.quick_ask.typed("draft")
+        self.assertTrue(self.quick_ask.summon())
+        self.assertEqual(self.quick_ask.text, "draft")
+
+    def test_empty_buffer_closes_without_inserting(self):
+        self.quick_ask.summon()
+        self.quick_ask.page_ready()
+        self.assertEqual(self.inserts, [])
+        self.assertEqual(self.closed, [True])
+
+    def test_submit_while_loading_waits_for_the_page(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("What is 2 + 2?")
+        self.quick_ask.submit()
+        self.assertEqual(self.quick_ask.state, BUFFERING)
+        self.assertEqual([delay for (delay, _) in self.timers], [5.0])
+        self.quick_ask.page_ready()
+        self.assertEqual(self.finish_insert(), ("What is 2 + 2?", True))
+        self.assertEqual(self.closed, [True])
+        # The timer of a finished buffer does nothing.
+        self.fire_timers()
+        self.assertEqual(self.fallbacks, [])
+
+    def test_submit_while_loading_falls_back_after_the_timeout(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("slow page")
+        self.quick_ask.submit()
+        self.fire_timers()
+        self.assertEqual(self.fallbacks, [("slow page", True)])
+        self.assertEqual(self.closed, [False])
+        self.assertEqual(self.quick_ask.state, IDLE)
+        # A late "ready" no longer hands anything over.
+        self.quick_ask.page_ready()
+        self.assertEqual(self.inserts, [])
+
+    def test_submit_on_a_ready_page_hands_over_at_once(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("first")
+        self.quick_ask.page_ready()
+        self.finish_insert()
+        # The page went away again (full navigation): the next summon buffers.
+        self.quick_ask.page_unloaded()
+        self.assertTrue(self.quick_ask.summon())
+        self.quick_ask.typed("second")
+        self.quick_ask.ready = True
+        self.quick_ask.submit()
+        self.assertEqual(self.finish_insert(), ("second", True))
+        self.assertEqual(self.timers, [])
+
+    def test_cancel_drops_the_buffer(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("never mind")
+        self.quick_ask.submit()
+        self.quick_ask.cancel()
+        self.assertEqual(self.closed, [False])
+        self.assertEqual(self.quick_ask.state, IDLE)
+        self.fire_timers()
+        self.quick_ask.page_ready()
+        self.assertEqual((self.inserts, self.fallbacks), ([], []))
+
+    def test_cancel_during_hand_off_is_ignored(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("on its way")
+        self.quick_ask.page_ready()
+        self.quick_ask.cancel()
+        self.assertEqual(self.quick_ask.state, HANDING_OFF)
+        self.finish_insert()
+        self.assertEqual(self.closed, [True])
+
+    def test_text_typed_during_hand_off_follows_in_a_second_round(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("Hel")
+        self.quick_ask.page_ready()
+        self.quick_ask.typed("Hello")
+        self.quick_ask.submit()
+        self.assertEqual(self.finish_insert(), ("Hel", False))
+        self.assertEqual(self.quick_ask.state, HANDING_OFF)
+        self.assertEqual(self.finish_insert(), ("lo", True))
+        self.assertEqual(self.closed, [True])
+        self.assertEqual(len(self.inserts), 2)
+
+    def test_failed_insert_falls_back(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("lost prompt")
+        self.quick_ask.submit()
+        self.quick_ask.page_ready()
+        self.finish_insert(ok=False)
+        self.assertEqual(self.fallbacks, [("lost prompt", True)])
+        self.assertEqual(self.closed, [False])
+        self.assertEqual(self.quick_ask.state, IDLE)
+
+    def test_late_reply_of_an_old_round_is_ignored(self):
+        self.quick_ask.summon()
+        self.quick_ask.typed("old")
+        self.quick_ask.page_ready()
+        old_done = self.inserts[-1][2]
+        self.finish_insert()
+        self.quick_ask.page_unloaded()
+        self.quick_ask.summon()
+        self.quick_ask.typed("new")
+        old_done(False)
+        self.assertEqual(self.fallbacks, [])
+        self.assertEqual(self.quick_ask.state, BUFFERING)
+
+
+if __name__ == "__main__":
+    unittest.main()
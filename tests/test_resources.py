@@ -0,0 +1,144 @@
+# Python libraries
+import os
+import tempfile
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.resources import (
+    FIELD_INDEX,
+    ProcBackend,
+    ResourceSampler,
+    SampleRing,
+    process_cpu_seconds,
+    process_rss_bytes,
+    walk_process_tree,
+)
+
+
+# Contents of "/proc/<pid>/stat" (fields after the command name start with the state).
+def stat_line(pid, name, ppid, utime, stime, threads, rss_pages):
+    fields = ["S", ppid] + [0] * 9 + [utime, stime] + [0] * 4 + [threads, 0, 0, 0, rss_pages] + [0] * 10
+    return f"{pid} ({name}) " + " ".join(str(field) for field in fields) + "\n"
+
+
+# A fixture "/proc" tree: 100 is the overlay, 101 and 102 its web processes (102 a child
+# of 101 that is only found by scanning, since 101 has no "children" file), 200 unrelated.
+class ProcFixture:
+    def __init__(self, directory):
+        self.root = directory
+        self.backend = ProcBackend(directory)
+
+    def process(self, pid, ppid, utime=0, stime=0, threads=1, rss_pages=0, name="proc", children=None):
+        os.makedirs(os.path.join(self.root, str(pid), "task", str(pid)), exist_ok=True)
+        with open(os.path.join(self.root, str(pid), "stat"), "w") as f:
+            f.write(stat_line(pid, name, ppid, utime, stime, threads, rss_pages))
+        if children is not None:
+            with open(os.path.join(self.root, str(pid), "task", str(pid), "children"), "w") as f:
+                f.write(" ".join(str(child) for child in children))
+
+    def build(self, tick=0):
+        ticks = self.backend.clock_ticks
+        self.process(100, 1, utime=ticks * (1 + tick), threads=4, rss_pages=10, name="python (overlay)", children=[101])
+        self.process(101, 100, utime=ticks * (2 + 2 * tick), stime=ticks, threads=8, rss_pages=20, name="web content")
+        self.process(102, 101, stime=ticks * (3 + tick), threads=2, rss_pages=30)
+        self.process(200, 1, utime=ticks * 50, threads=1, rss_pages=99)
+
+
+class SampleRingTest(unittest.TestCase):
+    def test_wraps_around(self):
+        ring = SampleRing(3, width=2)
+        self.assertEqual((len(ring), ring.rows()), (0, []))
+        for i in range(5):
+            ring.append([i, 10 * i])
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(ring.rows(), [[2, 20], [3, 30], [4, 40]])
+        self.assertEqual(ring.row(0), [2, 20])
+        self.assertEqual(ring.row(-1), [4, 40])
+        with self.assertRaises(IndexError):
+            ring.row(3)
+        with self.assertRaises(IndexError):
+            ring.row(-4)
+
+
+class ProcBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.fixture = ProcFixture(self.directory.name)
+        self.fixture.build()
+        self.backend = self.fixture.backend
+
+    def test_usage(self):
+        page = self.backend.page_size
+        self.assertEqual(self.backend.usage(100), (10 * page, 1.0, 4))
+        self.assertEqual(self.backend.usage(101), (20 * page, 3.0, 8))
+        self.assertIsNone(self.backend.usage(999))
+
+    def test_process_tree(self):
+        self.assertEqual(self.backend.children(100), [101])
+        self.assertEqual(self.backend.children(101), [102])
+        self.assertEqual(walk_process_tree(self.backend, [100]), {100, 101, 102})
+        self.assertEqual(walk_process_tree(self.backend, [100, 101, 200]), {100, 101, 102, 200})
+        self.assertEqual(process_cpu_seconds(self.backend, [100]), 7.0)
+        self.assertEqual(process_rss_bytes(self.backend, [100]), 60 * self.backend.page_size)
+
+    @unittest.skipUnless(os.path.exists(f"/proc/{os.getpid()}/stat"), "needs /proc")
+    def test_current_process(self):
+        usage = ProcBackend().usage(os.getpid())
+        self.assertGreater(usage.rss, 0)
+        self.assertGreaterEqual(usage.threads, 1)
+
+
+class ResourceSamplerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.fixture = ProcFixture(os.path.join(self.directory.name, "proc"))
+        self.fixture.build()
+        self.now = 1000.0
+        self.sampler = ResourceSampler(self.fixture.backend, pid=100, capacity=4, clock=lambda: self.now)
+
+    def test_samples_and_peaks(self):
+        self.assertIsNone(self.sampler.snapshot())
+        self.assertEqual(self.sampler.metrics_text(), "")
+        self.sampler.sample_once()
+        # One tick later: 1 s of CPU for the overlay, 2 + 1 s for the web processes over 10 s.
+        self.fixture.build(tick=1)
+        self.now += 10.0
+        self.sampler.sample_once()
+        current, peaks = self.sampler.snapshot()
+        page = self.fixture.backend.page_size
+        self.assertEqual(current["overlay_rss"], 10 * page)
+        self.assertEqual(current["web_rss"], 50 * page)
+        self.assertAlmostEqual(current["overlay_cpu"], 10.0)
+        self.assertAlmostEqual(current["web_cpu"], 30.0)
+        self.assertEqual((current["overlay_threads"], current["web_threads"], current["web_processes"]), (4, 10, 2))
+        self.assertAlmostEqual(peaks["web_cpu"], 30.0)
+        self.assertEqual(len(self.sampler.summary_lines()), 3)
+
+    def test_extra_pids_count_as_web_processes(self):
+        self.sampler.set_extra_pids([200, 100, 0])
+        self.assertEqual(self.sampler.extra_pids, (200,))
+        row = self.sampler.sample_once()
+        self.assertEqual(row[FIELD_INDEX["web_processes"]], 3)
+
+    def test_metrics_file(self):
+        self.sampler.add_metrics(lambda: [("overlay_hidden_seconds_total", "Time spent in hidden mode.", 12.5)])
+        self.sampler.sample_once()
+        path = os.path.join(self.directory.name, "metrics", "overlay.prom")
+        self.sampler.write_metrics(path)
+        with open(path) as f:
+            text = f.read()
+        lines = text.splitlines()
+        self.assertIn("# TYPE overlay_resident_memory_bytes gauge", lines)
+        self.assertIn(f'overlay_resident_memory_bytes{{group="overlay"}} {10 * self.fixture.backend.page_size:.6g}', lines)
+        self.assertIn('overlay_peak_threads{group="web"} 10', lines)
+        self.assertIn("overlay_web_processes 2", lines)
+        self.assertIn("# TYPE overlay_hidden_seconds_total counter", lines)
+        self.assertIn("overlay_hidden_seconds_total 12.5", lines)
+        self.assertTrue(text.endswith("\n"))
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["overlay.prom"])
+
+
+if __name__ == "__main__":
+    unittest.main()
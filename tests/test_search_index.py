@@ -0,0 +1,136 @@
+# Python libraries
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.search_index import (
+    BackgroundIndexer,
+    ConversationIndex,
+    build_match_query,
+    normalize_url,
+)
+
+
+CHAT = "https://claude.ai/chat/"
+
+
+def record(name, title, *texts, url_suffix=""):
+    return {
+        "url": CHAT + name + url_suffix,
+        "title": title,
+        "messages": [{"index": i, "text": text} for (i, text) in enumerate(texts)],
+    }
+
+
+class HelpersTest(unittest.TestCase):
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url(CHAT + "abc/?x=1#m5"), CHAT + "abc")
+
+    def test_build_match_query(self):
+        self.assertEqual(build_match_query("Déjà vu"), '"déjà"* "vu"*')
+        self.assertEqual(build_match_query('say "hi" OR NOT'), '"say"* "hi"* "or"* "not"*')
+        self.assertEqual(build_match_query(" ,.- "), "")
+
+
+class ConversationIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.index = ConversationIndex(os.path.join(self.directory.name, "index.sqlite3"))
+        self.addCleanup(self.index.close)
+
+    def urls(self, query, limit=10):
+        return [hit.url for hit in self.index.search(query, limit)]
+
+    def test_indexing_and_ranking(self):
+        changed = self.index.add_batch([
+            record("sql", "Optimizing SQL", "How do I speed up this query?", "Add an index on the join column."),
+            record("trip", "Trip to Kyoto", "Plan three days in Kyoto.", "Day one: temples. We could also index the sights."),
+            record("tune", "Index tuning", "Which columns should I cover?"),
+        ], now=1.0)
+        self.assertEqual(changed, 5)
+        self.assertEqual(self.index.stats(), (3, 5))
+        # Every word has to occur in the same message (or in the title).
+        self.assertEqual(self.urls("kyoto days"), [CHAT + "trip"])
+        self.assertEqual(self.urls("kyoto sights"), [])
+        # One hit per conversation, and title matches weigh more than message matches.
+        self.assertEqual(sorted(self.urls("index")), [CHAT + "sql", CHAT + "trip", CHAT + "tune"])
+        self.assertEqual(self.urls("index")[0], CHAT + "tune")
+        hit = self.index.search("temples")[0]
+        self.assertEqual(hit.title, "Trip to Kyoto")
+        self.assertIn("temples", hit.snippet)
+        self.assertEqual(self.urls("nothing like this"), [])
+
+    def test_prefix_queries(self):
+        self.index.add_batch([record("py", "Python help", "Explain decorators and generators.")])
+        for query in ("dec", "gen", "decorat", "py", "EXPLAIN gener"):
+            self.assertEqual(self.urls(query), [CHAT + "py"], query)
+        # Diacritics are ignored.
+        self.index.add_batch([record("fr", "Café menu", "Crème brûlée")])
+        self.assertEqual(self.urls("creme brul"), [CHAT + "fr"])
+        self.assertEqual(self.urls("cafe"), [CHAT + "fr"])
+
+    def test_reindexing_skips_unchanged_messages(self):
+        first = record("a", "First title", "hello world", "second message")
+        self.assertEqual(self.index.add_batch([first], now=1.0), 2)
+        # The same page captured again, with a query string: nothing changes.
+        again = record("a", "First title", "hello world", "second message", url_suffix="?from=sidebar#end")
+        self.assertEqual(self.index.add_batch([again], now=2.0), 0)
+        self.assertEqual(self.index.stats(), (1, 2))
+        # An edited message replaces its old text, and a new title replaces the old one.
+        edited = record("a", "Renamed", "hello there", "second message", "third message")
+        self.assertEqual(self.index.add_batch([edited], now=3.0), 2)
+        self.assertEqual(self.index.stats(), (1, 3))
+        self.assertEqual(self.urls("world"), [])
+        self.assertEqual(self.urls("first"), [])
+        self.assertEqual(self.urls("there"), [CHAT + "a"])
+        self.assertEqual(self.urls("renamed"), [CHAT + "a"])
+        self.assertEqual(len(self.index.search("message")), 1)
+
+    def test_empty_query_lists_recent_conversations(self):
+        self.index.add_batch([record("old", "Old", "text")], now=1.0)
+        self.index.add_batch([record("new", "New", "text")], now=2.0)
+        self.index.add_batch([record("old", "Old", "text", "more")], now=3.0)
+        self.assertEqual(self.urls(""), [CHAT + "old", CHAT + "new"])
+        self.assertEqual(self.urls("  ?! "), [CHAT + "old", CHAT + "new"])
+        self.assertEqual(self.urls("", limit=1), [CHAT + "old"])
+        self.assertEqual(self.index.search("")[0].snippet, "")
+
+    def test_records_without_url_or_text_are_skipped(self):
+        changed = self.index.add_batch([
+            {"url": "", "title": "No address", "messages": [{"index": 0, "text": "lost"}]},
+            {"url": CHAT + "blank", "title": "", "messages": [{"index": 0, "text": "   "}]},
+        ])
+        self.assertEqual(changed, 0)
+        self.assertEqual(self.index.stats(), (1, 0))
+
+    def test_index_persists(self):
+        path = os.path.join(self.directory.name, "persist.sqlite3")
+        index = ConversationIndex(path)
+        index.add_batch([record("keep", "Kept", "persisted text")])
+        index.close()
+        index = ConversationIndex(path)
+        self.addCleanup(index.close)
+        self.assertEqual([hit.url for hit in index.search("persist")], [CHAT + "keep"])
+
+
+class BackgroundIndexerTest(unittest.TestCase):
+    def test_batches_are_indexed_in_the_background(self):
+        with tempfile.TemporaryDirectory() as directory:
+            index = ConversationIndex(os.path.join(directory, "index.sqlite3"))
+            indexer = BackgroundIndexer(index)
+            indexer.submit([record("a", "A", "first")])
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                indexer.submit([{"url": CHAT + "bad", "messages": [{"index": "x", "text": "oops"}]}])
+                indexer.submit([record("b", "B", "second")])
+                indexer.flush()
+            self.assertIn("Failed to index conversation batch", output.getvalue())
+            self.assertEqual(index.stats(), (2, 2))
+            index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+# Python libraries
+import contextlib
+import io
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.standby import (
+    DISABLED,
+    EMPTY,
+    LOADING,
+    PAUSED,
+    READY,
+    StandbyBuffer,
+)
+
+
+# Stand-in for a web view.
+class FakeView:
+    def __init__(self, name):
+        self.name = name
+        self.loads = 0
+
+    def __repr__(self):
+        return self.name
+
+
+class StandbyBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.memory = [True]
+        self.created = []
+        self.discarded = []
+        self.timers = []
+        self.active = FakeView("active")
+        self.standby = StandbyBuffer(
+            create=self.create,
+            load=self.load,
+            discard=self.discarded.append,
+            install=self.install,
+            memory_ok=lambda: self.memory[0],
+            call_later=lambda delay, fn: self.timers.append((delay, fn)),
+            check_interval=60.0,
+            retry_delay=30.0,
+            max_age=600.0,
+            clock=lambda: self.now,
+        )
+
+    def create(self):
+        view = FakeView(f"view{len(self.created)}")
+        self.created.append(view)
+        return view
+
+    def load(self, view):
+        view.loads += 1
+
+    def install(self, view):
+        previous, self.active = self.active, view
+        return previous
+
+    # Run the timers that are due after "delay" more seconds (new ones wait for the next call).
+    def advance(self, delay):
+        self.now += delay
+        due = [timer for timer in self.timers if timer[0] <= delay]
+        self.timers = [timer for timer in self.timers if timer[0] > delay]
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            for (_, fn) in due:
+                fn()
+        return output.getvalue()
+
+    def test_fill_load_and_take(self):
+        self.assertEqual(self.standby.state, EMPTY)
+        self.standby.start()
+        self.assertEqual(self.standby.state, LOADING)
+        (view,) = self.created
+        self.assertEqual(view.loads, 1)
+        self.assertTrue(self.standby.owns(view))
+        self.assertFalse(self.standby.owns(self.active))
+        # A page that is not the standby does not change anything.
+        self.standby.loaded(self.active)
+        self.assertEqual(self.standby.state, LOADING)
+        self.standby.loaded(view)
+        self.assertEqual(self.standby.state, READY)
+        old = self.active
+        self.assertTrue(self.standby.take())
+        self.assertIs(self.active, view)
+        # The replaced view is recycled as the next standby.
+        self.assertIs(self.standby.view, old)
+        self.assertEqual((self.standby.state, old.loads), (LOADING, 1))
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual((self.standby.swaps, self.standby.misses), (1, 0))
+
+    def test_take_before_ready_is_a_miss(self):
+        self.standby.start()
+        self.assertFalse(self.standby.take())
+        self.assertEqual(self.standby.state, LOADING)
+        self.assertEqual(self.standby.misses, 1)
+
+    def test_failed_load_is_retried(self):
+        self.standby.start()
+        (view,) = self.created
+        self.standby.failed(view)
+        self.assertEqual(self.standby.state, EMPTY)
+        self.assertEqual(self.discarded, [view])
+        # A miss while empty starts filling right away.
+        self.assertFalse(self.standby.take())
+        self.assertEqual(self.standby.state, LOADING)
+        self.advance(30.0)
+        self.assertEqual(len(self.created), 2)
+
+    def test_memory_pressure_pauses_and_resumes(self):
+        self.standby.start()
+        self.standby.loaded(self.created[0])
+        self.memory[0] = False
+        output = self.advance(60.0)
+        self.assertIn("Memory limit reached", output)
+        self.assertEqual(self.standby.state, PAUSED)
+        self.assertEqual(self.discarded, self.created)
+        self.assertEqual(self.standby.pauses, 1)
+        self.assertFalse(self.standby.take())
+        # Still too high: no new view, and the pause is not counted twice.
+        self.assertEqual(self.advance(60.0), "")
+        self.assertEqual((self.standby.state, len(self.created), self.standby.pauses), (PAUSED, 1, 1))
+        self.memory[0] = True
+        self.advance(60.0)
+        self.assertEqual(self.standby.state, LOADING)
+        self.assertEqual(len(self.created), 2)
+        self.standby.loaded(self.created[1])
+        self.assertTrue(self.standby.take())
+
+    def test_replaced_view_is_dropped_under_memory_pressure(self):
+        self.standby.start()
+        self.standby.loaded(self.created[0])
+        old = self.active
+        self.memory[0] = False
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(self.standby.take())
+        self.assertEqual(self.discarded, [old])
+        self.assertEqual((self.standby.state, self.standby.view), (PAUSED, None))
+
+    def test_broken_memory_probe_counts_as_fine(self):
+        def broken():
+            raise OSError("no /proc")
+        self.standby.memory_ok = broken
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.standby.start()
+        self.assertIn("Could not check memory", output.getvalue())
+        self.assertEqual(self.standby.state, LOADING)
+
+    def test_stale_standby_is_reloaded(self):
+        self.standby.start()
+        (view,) = self.created
+        self.standby.loaded(view)
+        self.advance(60.0)
+        self.assertEqual((self.standby.state, view.loads), (READY, 1))
+        self.now += 600.0
+        self.advance(60.0)
+        self.assertEqual((self.standby.state, view.loads), (LOADING, 2))
+        self.assertIs(self.standby.view, view)
+
+    def test_stop(self):
+        self.standby.start()
+        self.standby.stop()
+        self.assertEqual(self.standby.state, DISABLED)
+        self.assertEqual(self.discarded, self.created)
+        self.advance(60.0)
+        self.assertEqual(self.timers, [])
+        self.standby.fill()
+        self.assertEqual(len(self.created), 1)
+        self.assertIn("disabled", self.standby.summary_line())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+# Python libraries
+import contextlib
+import io
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.streaming import (
+    Delta,
+    DeltaAssembler,
+    FileSink,
+    SinkWorker,
+    StreamExporter,
+    create_sinks,
+    format_jsonl,
+)
+
+
+# Page event as sent by STREAM_SCRIPT.
+def event(seq, kind, text="", response=1, session="a"):
+    return {"session": session, "seq": seq, "response": response, "kind": kind, "text": text}
+
+
+class DeltaAssemblerTest(unittest.TestCase):
+    def test_out_of_order_events_are_put_back_in_sequence(self):
+        assembler = DeltaAssembler()
+        self.assertEqual(assembler.feed([event(1, "append", "lo")]), [])
+        self.assertEqual(assembler.feed([event(2, "append", "!"), event(0, "append", "Hel")]), [
+            Delta(("a", 1), "append", "Hel"),
+            Delta(("a", 1), "append", "lo"),
+            Delta(("a", 1), "append", "!"),
+        ])
+        # Duplicates of events already handled are ignored.
+        self.assertEqual(assembler.feed([event(1, "append", "lo")]), [])
+
+    def test_resets(self):
+        assembler = DeltaAssembler()
+        deltas = assembler.feed([
+            event(0, "append", "Hello"),
+            event(1, "reset", "Hello world"),
+            event(2, "reset", "Goodbye"),
+            event(3, "end"),
+        ])
+        self.assertEqual(deltas, [
+            Delta(("a", 1), "append", "Hello"),
+            Delta(("a", 1), "append", " world"),
+            Delta(("a", 1), "reset", "Goodbye"),
+            Delta(("a", 1), "end", ""),
+        ])
+
+    def test_new_response_ends_the_previous_one(self):
+        deltas = DeltaAssembler().feed([event(0, "append", "one"), event(1, "append", "two", response=2)])
+        self.assertEqual(deltas, [
+            Delta(("a", 1), "append", "one"),
+            Delta(("a", 1), "end", ""),
+            Delta(("a", 2), "append", "two"),
+        ])
+
+    def test_session_change_restarts_numbering(self):
+        assembler = DeltaAssembler()
+        assembler.feed([event(0, "append", "old"), event(5, "append", "lost")])
+        deltas = assembler.feed([event(0, "append", "new", session="b")])
+        self.assertEqual(deltas, [
+            Delta(("a", 1), "end", ""),
+            Delta(("b", 1), "append", "new"),
+        ])
+
+    def test_gives_up_on_a_missing_event(self):
+        assembler = DeltaAssembler(max_out_of_order=2)
+        deltas = assembler.feed([event(seq, "append", str(seq)) for seq in (1, 2, 3)])
+        self.assertEqual([delta.text for delta in deltas], ["1", "2", "3"])
+        self.assertEqual(assembler.skipped, 1)
+
+
+# Sink that blocks in write() until released, recording what it was given.
+class BlockingSink:
+    def __init__(self):
+        self.release = threading.Event()
+        self.writing = threading.Event()
+        self.data = []
+        self.closed = False
+
+    def write(self, data):
+        self.writing.set()
+        self.release.wait(10)
+        self.data.append(data)
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+class SinkWorkerTest(unittest.TestCase):
+    def test_drops_data_when_the_buffer_is_full(self):
+        sink = BlockingSink()
+        worker = SinkWorker(sink, max_pending_bytes=10)
+        self.assertTrue(worker.offer(b"12345"))
+        self.assertTrue(sink.writing.wait(10))
+        # The first write is in progress and still counts against the buffer.
+        self.assertTrue(worker.offer(b"678"))
+        self.assertFalse(worker.offer(b"abc"))
+        self.assertEqual(worker.dropped_bytes, 3)
+        sink.release.set()
+        worker.flush()
+        self.assertTrue(worker.offer(b"90"))
+        worker.close()
+        self.assertEqual(b"".join(sink.data), b"1234567890")
+        self.assertTrue(sink.closed)
+
+
+class StreamExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, output_format, events):
+        path = os.path.join(self.directory.name, output_format + ".out")
+        exporter = StreamExporter([FileSink(path)], output_format)
+        exporter.feed(events)
+        exporter.flush()
+        exporter.close()
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_formats(self):
+        events = [event(0, "append", "Hi"), event(1, "reset", "Bye"), event(2, "end")]
+        self.assertEqual(self.export("text", events), "Hi\nBye\n\n")
+        self.assertEqual(self.export("jsonl", events).splitlines()[1], format_jsonl(Delta(("a", 1), "reset", "Bye")).strip())
+
+    def test_unknown_format_falls_back_to_text(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(self.export("yaml", [event(0, "append", "Hi")]), "Hi")
+        self.assertIn("Unknown stream export format 'yaml'", output.getvalue())
+
+    def test_bad_targets_are_skipped(self):
+        regular = os.path.join(self.directory.name, "regular")
+        open(regular, "w").close()
+        good = os.path.join(self.directory.name, "good.txt")
+        targets = [
+            "pipe:/tmp/x",
+            "fifo:" + regular,
+            "unix:" + os.path.join(self.directory.name, "missing", "socket"),
+            "file:" + good,
+        ]
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            sinks = create_sinks(targets)
+        self.assertEqual([type(sink) for sink in sinks], [FileSink])
+        self.assertEqual(output.getvalue().count("Warning: Skipping stream export target"), 3)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+    def test_socket_subscriber_receives_the_stream(self):
+        path = os.path.join(self.directory.name, "stream.sock")
+        (sink,) = create_sinks(["unix:" + path])
+        exporter = StreamExporter([sink])
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+        client.settimeout(10)
+        self.addCleanup(client.close)
+        while not sink.subscribers:
+            time.sleep(0.01)
+        exporter.feed([event(0, "append", "Hi"), event(1, "end")])
+        exporter.flush()
+        exporter.close()
+        received = b""
+        while True:
+            chunk = client.recv(1024)
+            if not chunk:
+                break
+            received += chunk
+        self.assertEqual(received, b"Hi\n\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# Python libraries
+import os
+import tempfile
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.templates import (
+    FuzzyIndex,
+    TemplateStore,
+    fold,
+    render_template,
+    template_variables,
+    word_starts,
+)
+
+
+NAMES = [
+    "review/pull-request",
+    "email/follow-up",
+    "code/explainCode",
+    "sql/optimize-query",
+    "translate/japanese",
+    "notes/meeting-notes",
+    "prompts/reverse-proxy",
+]
+
+
+class TemplateTest(unittest.TestCase):
+    def test_variables(self):
+        body = "Hi {{name}}, about {{ topic : the plan }} and {{name}} again"
+        self.assertEqual(template_variables(body), ["name", "topic"])
+        self.assertEqual(render_template(body, {"name": "Ann"}), "Hi Ann, about  the plan  and Ann again")
+        self.assertEqual(render_template("{{missing}}", {}), "{{missing}}")
+
+
+class FuzzyIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = FuzzyIndex(NAMES)
+
+    def names(self, query, limit=10):
+        return [name for (_, name) in self.index.search(query, limit)]
+
+    def test_empty_query_lists_names_alphabetically(self):
+        self.assertEqual(self.names(""), sorted(NAMES))
+        self.assertEqual(self.names(" ", limit=2), sorted(NAMES)[:2])
+
+    def test_subsequence_matches_only(self):
+        self.assertEqual(self.names("jpn"), ["translate/japanese"])
+        self.assertEqual(self.names("xyz"), [])
+
+    def test_word_starts_rank_first(self):
+        # "pr" starts the words of "pull-request" and "proxy"; in "prompts" it is a prefix.
+        self.assertEqual(self.names("rpr")[0], "review/pull-request")
+        self.assertEqual(self.names("ec")[0], "code/explainCode")
+        self.assertEqual(self.names("Email F")[0], "email/follow-up")
+
+    def test_growing_queries_match_a_fresh_index(self):
+        for query in ("r", "re", "rev", "revp", "revpr", "o", "op", "opt", "n", "no", "not"):
+            self.assertEqual(self.index.search(query), FuzzyIndex(NAMES).search(query), query)
+
+    def test_single_characters_match_every_name_containing_them(self):
+        for ch in "reqxj":
+            self.assertEqual(sorted(self.names(ch)), sorted(n for n in NAMES if ch in n), ch)
+
+    # Lowercasing "İ" gives two characters: positions in the key must still be those of the name.
+    def test_names_that_change_length_when_lowercased(self):
+        self.assertEqual(len(fold("İstanbul notes")), len("İstanbul notes"))
+        key = fold("İstanbulNotes")
+        self.assertEqual(list(word_starts(key, "İstanbulNotes")), [1] + [0] * 7 + [1] + [0] * 4)
+        index = FuzzyIndex(NAMES + ["İstanbul notes"])
+        self.assertEqual(index.search("istn")[0][1], "İstanbul notes")
+        self.assertEqual(index.search("İst")[0][1], "İstanbul notes")
+
+
+class TemplateStoreTest(unittest.TestCase):
+    def test_refresh_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "email"))
+            os.makedirs(os.path.join(directory, ".hidden"))
+            files = {
+                "email/follow-up.md": "Following up on {{topic}}",
+                "İstanbul notes.txt": "Notes",
+                "ignored.json": "{}",
+                ".hidden/secret.txt": "no",
+            }
+            for (name, body) in files.items():
+                with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+                    f.write(body)
+            store = TemplateStore(directory).refresh()
+            self.assertEqual(sorted(store.paths), ["email/follow-up", "İstanbul notes"])
+            self.assertEqual(store.search("ist"), ["İstanbul notes"])
+            self.assertEqual(store.load(store.search("fol")[0]), "Following up on {{topic}}")
+            index = store.index
+            self.assertIs(store.refresh().index, index)
+
+
+if __name__ == "__main__":
+    unittest.main()
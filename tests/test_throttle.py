@@ -0,0 +1,74 @@
+# Python libraries
+import sys
+import threading
+import unittest
+
+# Local libraries
+from macos_gemini_overlay.throttle import HIDDEN, VISIBLE, HiddenModeController
+
+
+# Controller driven by a fake clock: the page uses "rate" CPU seconds per second.
+def make_controller(rate):
+    clock = {"now": 0.0}
+    pending = []
+    controller = HiddenModeController(
+        suspend=lambda: None,
+        resume=lambda: None,
+        call_later=lambda delay, fn: pending.append(fn),
+        cpu_seconds=lambda: clock["now"] * rate,
+        grace=5.0,
+        clock=lambda: clock["now"],
+    )
+    return controller, clock, pending
+
+
+class HiddenModeControllerTest(unittest.TestCase):
+    def test_hidden_period(self):
+        controller, clock, pending = make_controller(rate=0.5)
+        controller.hide()
+        clock["now"] = 5.0
+        pending.pop()()
+        self.assertEqual(controller.state, HIDDEN)
+        clock["now"] = 15.0
+        controller.show()
+        self.assertEqual(controller.state, VISIBLE)
+        stats = controller.stats()
+        self.assertEqual(stats["hidden_periods"], 1)
+        self.assertEqual(stats["hidden_seconds"], 10.0)
+        self.assertEqual(stats["baseline_cpu_rate"], 0.5)
+
+    # stats() is read from the resource sampler thread while the main thread hides and shows
+    # the overlay: every snapshot must be consistent (hidden CPU = rate * hidden time here).
+    def test_stats_are_consistent_across_threads(self):
+        controller, clock, pending = make_controller(rate=0.25)
+        done = threading.Event()
+        torn = []
+
+        def read():
+            while not done.is_set():
+                stats = controller.stats()
+                if stats["hidden_cpu_seconds"] != 0.25 * stats["hidden_seconds"]:
+                    torn.append(stats)
+
+        # Switch threads often, so that the reader lands in the middle of show().
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for _ in range(2000):
+                controller.hide()
+                clock["now"] += 5.0
+                pending.pop()()
+                clock["now"] += 1.0
+                controller.show()
+        finally:
+            done.set()
+            reader.join()
+        self.assertEqual(torn, [])
+        self.assertEqual(controller.stats()["hidden_periods"], 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+# Python libraries
+import os
+import unittest
+
+# Local libraries
+import macos_gemini_overlay
+from macos_gemini_overlay._version import (
+    ABOUT_DIR,
+    read_about,
+)
+
+
+class VersionTest(unittest.TestCase):
+    # The version of the imported package is the one in "about/version.txt" (a stale
+    # generated "_about.py" would fail this).
+    def test_version_matches_about_directory(self):
+        with open(os.path.join(ABOUT_DIR, "version.txt")) as f:
+            expected = f.read().strip()
+        self.assertEqual(read_about()[0], expected)
+        self.assertEqual(macos_gemini_overlay.__version__, expected)
+        self.assertEqual(macos_gemini_overlay.__author__, read_about()[1])
+
+
+if __name__ == "__main__":
+    unittest.main()